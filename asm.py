@@ -2,88 +2,107 @@
 
 # check: SELECT * FROM AsmSequencesInGithubProject WHERE AsmSequencesInGithubProject.ASM_SEQUENCE_ID NOT IN (SELECT ID FROM AsmSequence)
 
-import sqlite3
-import argparse
+import collections
+import contextlib
+import io
 import os
-import subprocess
-import urllib.request, json
-import datetime
 import re
-import time
+import sqlite3
+import subprocess
 import sys
+import time
 
-parser = argparse.ArgumentParser(description='Manipulate the inline assembler database.')
-
-parser = argparse.ArgumentParser()
-parser.add_argument('database', metavar='database', help="path to the sqlite3 database")
-parser.add_argument('command', choices=['categories', 'new-project-entry', 'download-project', 'add-asm-instruction', 'add-asm-sequence', 'add-project-asm-sequence', 'add-project-keywords', 'show-stats'])
-parser.add_argument('--file',help='a file argument')
-parser.add_argument('--instr',help='an instruction argument')
-parser.add_argument('--keywords',help='specify keywords')
-args = parser.parse_args()
-
-conn = sqlite3.connect(args.database)
-c = conn.cursor()
+from errors import InputError
+import mnemonics
+
+# database: path of the database, conn: its connection, cursor: the cursor of the commands, options: Options, state: whether
+# a batch runs ('in_batch', see commit), the caches of the session (see load_id_caches, get_project_id, get_git_url, and
+# invalidate_stale_caches), and the tables that it wrote (see count_table_versions)
+Session = collections.namedtuple('Session', ['database', 'conn', 'cursor', 'options', 'state'])
+
+# offline: only use cached Github metadata, clone: the strategy of gitclone.py, reference: directory with local mirrors of the
+# projects to clone
+Options = collections.namedtuple('Options', ['offline', 'clone', 'reference'])
+
+def open_session(database, offline=False, clone='full', reference=None):
+    """ Opens a database, applies the pending migrations, and returns a session, which the functions of this module take as
+        their first argument. The statements of the connection are recorded if the profiler is enabled. The path of the
+        database is made absolute, so that the paths derived from it (e.g., the report cache) do not depend on the working
+        directory, which the server changes for each request. """
+    import migrations
+    import profiler
+    if database != ':memory:':
+        database = os.path.abspath(database)
+    conn = sqlite3.connect(database, timeout=60)
+    if profiler.enabled:
+        profiler.watch(conn)
+    # WAL lets readers (e.g., show-stats) run while a command writes; with WAL, synchronous=NORMAL only syncs at checkpoints
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -65536')
+    migrations.migrate(conn)
+    written_tables = set()
+    watch_writes(conn, written_tables)
+    return Session(database, conn, conn.cursor(), Options(offline, clone, reference), {'in_batch': False, 'instruction_ids': None, 'sequence_ids': None, 'project_ids': {}, 'origin_urls': {}, 'data_version': None,
+            'written_tables': written_tables, 'versioned_changes': conn.total_changes})
+
+def watch_writes(conn, written_tables):
+    """ Adds the main tables that the statements of a connection insert into, update, or delete from to written_tables.
+        The authorizer of sqlite3 is only called when a statement is prepared, not when a cached statement runs again. """
+    def authorize(action, table, column, database, trigger):
+        if action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE) and database == 'main':
+            written_tables.add(table)
+        return sqlite3.SQLITE_OK
+    conn.set_authorizer(authorize)
+
+def count_table_versions(session):
+    """ Increments the VERSION of the tables that the session wrote in TableVersion, which keys the report cache (see
+        report.table_digest), once per transaction that changed rows. As cached statements are not authorized again (see
+        watch_writes), every table that the session has written so far is counted, so a long-running session (e.g., serve)
+        may invalidate more report units than needed, but never too few. """
+    import migrations
+    if session.conn.total_changes == session.state['versioned_changes'] or not migrations.table_exists(session.conn, 'TableVersion'):
+        return
+    session.cursor.executemany('INSERT INTO main.TableVersion(NAME, VERSION) VALUES (?, 1) ON CONFLICT(NAME) DO UPDATE SET VERSION = VERSION + 1',
+            [(table, ) for table in sorted(session.state['written_tables']) if table != 'TableVersion'])
+    session.state['versioned_changes'] = session.conn.total_changes
 
 dir = os.path.dirname(os.path.realpath(__file__))
 project_dir = os.path.join(dir, 'projects')
-grep_exec = os.path.join(dir, 'grep.sh')
-
-def print_sub_cat(super_id, tabs="\t"):
-   """ display sub categories of a certain id. """
-   rows = c.execute('select * from ApplicationCategory where SUPER_ID =?;', (str(super_id),)).fetchall()
-   for row in rows:
-      print(tabs + row[1])
-      print_sub_cat(row[0], tabs + '\t')
-
-def display_application_cats():
-    """ Recursively displays all application categories. """
-    rows = c.execute('select * from ApplicationCategory where SUPER_ID IS NULL;')
-    for row in rows.fetchall():
-        super_cat = row[1]
-        print(super_cat)
-        print_sub_cat(row[0])
-
-def get_last_commit_hash(path):
-    process = subprocess.Popen(['git', 'rev-parse', 'HEAD'], cwd=path, stdout=subprocess.PIPE)
-    stdout, _ = process.communicate()
-    hash = stdout.decode().strip('\n')
-    return hash
-
-def get_git_commit_count(path):
-    """ Gets the number of commits without merges from a Git repository. """
-    process = subprocess.Popen(['git', 'rev-list', 'HEAD', '--count', '--no-merges'], cwd=path, stdout=subprocess.PIPE)
-    stdout, _ = process.communicate()
-    number = stdout.decode().strip("\n")
-    return int(number)
-
-def get_git_commiter_count(path):
-    """ Gets the number of committers from a Git repository. """
-    process = subprocess.Popen(['git', 'shortlog', '-sn'], cwd=path, stdout=subprocess.PIPE)
-    stdout, _ = process.communicate()
-    committers = stdout.decode("ISO-8859-1")
-    return len(committers.split('\n'))
-
-def get_first_last_commit_date(path):
-    """ Gets the first and repository commit as a timestamp. """
-    # %at specifies a UNIX time stamp
-    process = subprocess.Popen(['git', 'log', '--format=%at'], cwd=path, stdout=subprocess.PIPE)
-    stdout, _ = process.communicate()
-    log = stdout.decode().strip('\n').split('\n')
-    last = int(log[0])
-    first = int(log[-1])
-    return (first, last)
-
-def get_git_url(path):
-    """ Gets the origin URL of a Git repository. """
-    process = subprocess.Popen(['git', 'config', '--get', 'remote.origin.url'], cwd=path, stdout=subprocess.PIPE)
-    stdout, _ = process.communicate()
-    url = stdout.decode().strip("\n")
+
+def display_categories(session, hierarchy='application', counts=False):
+    """ Displays a category hierarchy as a tree (optionally with the number of projects in each subtree) and the cycles of
+        categories that are not part of the tree. """
+    import categorytree
+    tree = categorytree.load(session.conn, hierarchy)
+    if counts:
+        nr_projects = categorytree.subtree_counts(session.conn, tree, hierarchy)
+    for (category_id, depth) in categorytree.walk(tree):
+        if counts:
+            print('%s%s (%d)' % ('\t' * depth, tree.names[category_id], nr_projects[category_id]))
+        else:
+            print('%s%s' % ('\t' * depth, tree.names[category_id]))
+    for cycle in categorytree.find_cycles(tree):
+        print('cycle: ' + ' -> '.join(str(tree.names[category_id]) for category_id in cycle + cycle[:1]))
+
+def check_github_url(url):
     if url.startswith("https://github.com"):
         return url
     else:
-        print(url + " is not a valid url!")
-        exit(-1)
+        raise InputError(url + " is not a valid url!")
+
+def get_git_url(session, path):
+    """ Gets the origin URL of a Git repository. The URL is cached for the session until the .git/config of the repository changes. """
+    import gitmetrics
+    try:
+        mtime = os.stat(os.path.join(path, '.git', 'config')).st_mtime_ns
+    except OSError:
+        mtime = None
+    cached = session.state['origin_urls'].get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, gitmetrics.read_origin_url(path))
+        session.state['origin_urls'][path] = cached
+    return check_github_url(cached[1])
 
 def get_project_dir(url):
     """ Map a Github URL to the local Github project directory. """
@@ -92,73 +111,113 @@ def get_project_dir(url):
     project_dir_name = os.path.join(project_dir, project_dir_name)
     return project_dir_name
 
-def download_project(url, keywords=None):
+def download_project(session, url, keywords=None):
+    import gitclone
+    import profiler
     project_dir_name = get_project_dir(url)
-    process = subprocess.Popen(['git', 'clone', url, project_dir_name], cwd=project_dir)
-    process.communicate()
-    insert_project_entry(os.path.join(project_dir, project_dir_name))
-    add_keywords_to_project(url, keywords)
+    with profiler.phase('clone', url=url):
+        gitclone.clone(url, project_dir_name, session.options.clone, session.options.reference, quiet=False)
+    hits = insert_project_entry(session, os.path.join(project_dir, project_dir_name))
+    add_keywords_to_project(session, url, keywords)
+    return hits
+
+def fetch_project(session, url):
+    """ Clones a project (unless it has already been cloned) and gathers its project entry and inline assembly hits without touching the database.
+        Used by the workers of download_projects. """
+    import gitclone
+    import profiler
+    project_dir_name = get_project_dir(url)
+    with profiler.phase(url, 'project'):
+        if not os.path.isdir(project_dir_name):
+            with profiler.phase('clone', url=url):
+                gitclone.clone(url, project_dir_name, session.options.clone, session.options.reference)
+        (entry, hits) = collect_project_entry(session, project_dir_name, scan_jobs=1)
+    return (entry, format_scan(project_dir_name, hits))
+
+def read_url_list(url_file):
+    """ Reads a file with one Github URL per line, optionally followed by comma-separated keywords. Empty lines and lines starting with # are skipped. """
+    projects = []
+    with open(url_file) as f:
+        for line in f:
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            tokens = line.split(None, 1)
+            projects.append((tokens[0], tokens[1] if len(tokens) > 1 else None))
+    return projects
+
+def download_projects(session, url_file, jobs=4, keywords=None):
+    """ Downloads and analyzes all projects of a URL list on a bounded pool of worker threads.
+        Only the calling thread writes to the database. Failed projects are skipped and written to <url_file>.failed. """
+    import concurrent.futures
+    projects = read_url_list(url_file)
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(fetch_project, session, url): (url, project_keywords) for (url, project_keywords) in projects}
+        for future in concurrent.futures.as_completed(futures):
+            (url, project_keywords) = futures[future]
+            try:
+                (entry, scan_output) = future.result()
+                store_project_entry(session, entry)
+                project_keywords = project_keywords if project_keywords is not None else keywords
+                if project_keywords is not None:
+                    add_keywords_to_project(session, url, project_keywords)
+            except (Exception, SystemExit) as e:
+                rollback(session)
+                reason = str(e) if not isinstance(e, SystemExit) else 'exit status ' + str(e.code)
+                print(url + ' failed: ' + reason)
+                failed.append((url, reason))
+                continue
+            print(scan_output, end='')
+    print('downloaded %d of %d projects' % (len(projects) - len(failed), len(projects)))
+    if len(failed) != 0:
+        with open(url_file + '.failed', 'w') as f:
+            for (url, reason) in failed:
+                f.write(url + '\t' + reason + '\n')
+        print('failed projects are listed in ' + url_file + '.failed')
+
+def loc_columns(loc):
+    """ Returns the (C, C++, header, assembly) values of a language->lines counter. """
+    import linecount
+    return (loc[linecount.C], loc[linecount.CPP], loc[linecount.HEADER], loc[linecount.ASSEMBLY])
 
 def get_c_cpp_h_assembly_loc(path):
-    """ Gets the LOC of header and C files using cloc. """
-    try:
-        process = subprocess.Popen(['cloc', '.'], cwd=path, stdout=subprocess.PIPE)
-    except FileNotFoundError:
-        print("Failed to call cloc (see https://github.com/AlDanial/cloc), please install.")
-        exit(-1)
-    stdout, _ = process.communicate()
-    lines = stdout.decode().split('\n')
-    c_lines = 0
-    h_lines = 0
-    cpp_lines = 0
-    assembly_lines = 0
-    for line in lines:
-        c_match = re.match(r'C \s+\d+\s+\d+\s+\d+\s+(\d+)', line, re.X)
-        if c_match:
-            c_lines = int(c_match.groups()[0])
-        h_match = re.match(r'C/C\+\+\sHeader\s+\d+\s+\d+\s+\d+\s+(\d+)', line, re.X)
-        if h_match:
-            h_lines = int(h_match.groups()[0])
-        cpp_match = re.match(r'C\+\+\s+\d+\s+\d+\s+\d+\s+(\d+)', line, re.X)
-        if cpp_match:
-            cpp_lines = int(cpp_match.groups()[0])
-        assembly_match = re.match(r'Assembly\s+\d+\s+\d+\s+\d+\s+(\d+)', line, re.X)
-        if assembly_match:
-            assembly_lines = int(assembly_match.groups()[0])
-    return (c_lines, cpp_lines, h_lines, assembly_lines)
+    """ Gets the LOC of C, C++, header, and assembly files, counted like cloc (see linecount.py). """
+    import scanner
+    return loc_columns(scanner.scan_tree(path).loc)
 
 def owner_project_from_github_url(url):
     """ Extracts owner and project name from a Github URL. For example, for
         https://github.com/graalvm/sulong it returns the tuple (graalvm, sulong). """
     if not re.match('https://github.com/([a-zA-Z0-9-_]*)/[a-zA-Z0-9-_]*', url):
-        print(str(url) + "is not a valid url!")
-        exit(-1)
+        raise InputError(str(url) + " is not a valid url!")
     elements = url.split('/')
     project_name = elements[-1]
     organization_name = elements[-2]
     return (organization_name, project_name)
 
-def add_asm_instruction(instr, testcase=None):
-    """ Inserts an instruction with a test case into the database. It reads the test case from the provided file and formats it using clang-format-3.6.
-        If a test case for the instruction already exists, it will get updated.
+def add_asm_instruction(session, instr, testcase=None):
+    """ Inserts an instruction with a test case into the database. It reads the test case from the provided file and formats it using clang-format-3.6
+        (unless the formatted file is cached, see testcases.py). If a test case for the instruction already exists, it will get updated.
     """
     if testcase is not None:
-        process = subprocess.Popen(['clang-format-3.6', '--style=LLVM', testcase], stdout=subprocess.PIPE)
-        stdout, _ = process.communicate()
-        formatted_testcase = stdout.decode()
+        import testcases
+        formatted_testcase = testcases.format_file(testcase, testcases.cache_path_for(session.database))
     else:
         formatted_testcase = ''
 
-    result = c.execute('SELECT TEST_CASE from AsmInstruction WHERE INSTRUCTION = ?', (instr,)).fetchone()
+    result = session.cursor.execute('SELECT TEST_CASE from AsmInstruction WHERE INSTRUCTION = ?', (instr,)).fetchone()
     if result is None:
-        c.execute('insert into AsmInstruction(INSTRUCTION, TEST_CASE) VALUES(?, ?)', (instr, formatted_testcase))
+        session.cursor.execute('insert into AsmInstruction(INSTRUCTION, TEST_CASE) VALUES(?, ?)', (instr, formatted_testcase))
+        if session.state['instruction_ids'] is not None:
+            session.state['instruction_ids'][instr] = session.cursor.lastrowid
     else:
         print("update existing test case:")
         print(result[0])
         print("with new one:")
         print(formatted_testcase)
-        c.execute('update AsmInstruction set TEST_CASE=? where INSTRUCTION =?', (formatted_testcase, instr))
-    conn.commit()
+        session.cursor.execute('update AsmInstruction set TEST_CASE=? where INSTRUCTION =?', (formatted_testcase, instr))
+    commit(session)
 
 jump_synonyms = {
         'jz' : ['jz', 'je'],
@@ -170,7 +229,7 @@ jump_synonyms = {
         'jl' : ['jl', 'jnge'],
         'jge' : ['jge', 'jnl'],
         'jle' : ['jle', 'jng'],
-        'jge' : ['jge', 'jnle'],
+        'jg' : ['jg', 'jnle'],
 }
 
 set_synonyms = {
@@ -179,108 +238,299 @@ set_synonyms = {
     'setnz' : ['setne', 'setnz']
 }
 
+instruction_prefixes = ['lock', 'rep', 'repne']
+
+prefix_synonyms = {
+    'repz' : 'repe',
+    'repnz' : 'repne'
+}
+
+# assembler directives that emit instructions as data (these sequences do not use mnemonics)
+data_directives = ['.byte', '.word', '.short', '.value', '.long', '.int', '.quad', '.inst']
+
+def invalid_instruction_reason(instr):
+    """ Returns why an instruction is not in the right format, or None if it is valid. """
+    # Check for x86 instruction prefixes
+    # see http://www.c-jump.com/CIS77/CPU/x86/X77_0240_prefix.htm
+    if instr in instruction_prefixes:
+        return 'The instruction sequence contains the instruction prefix ' + instr + '.\nPlease specifiy the prefix as part of the next instruction, for example, "lock xadd" instead of "lock;xadd".'
+    if instr == 'rep nop':
+        return 'Please insert "rep nop" as pause (MNEMONIC is 0)!'
+    if instr == 'xchg':
+        return 'Please insert "xchg" as "lock xchg"!'
+    # check the interrupt format
+    if re.match('int .*', instr):
+        if not re.match('int \$0x[0-9a-f]{2}', instr):
+            return 'Please use the format "int $0xa3" to specify numbers in int instructions! ' + instr
+    for synonyms in (jump_synonyms, set_synonyms):
+        for main_synonym in synonyms:
+            if instr in synonyms.get(main_synonym) and instr != main_synonym:
+                return 'found ' + instr + '. Please use ' + main_synonym
+    return None
+
 def check_for_invalid_instructions(instrs):
     """ Checks that a list of instruction does not contain any invalid instructions (not the right format) """
     for instr in instrs:
-        # Check for x86 instruction prefixes
-        # see http://www.c-jump.com/CIS77/CPU/x86/X77_0240_prefix.htm
-        if instr in ['lock', 'rep', 'repne']:
-            print('The instruction sequence contains the instruction prefix ' + instr + '.')
-            print('Please specifiy the prefix as part of the next instruction, for example, "lock xadd" instead of "lock;xadd".')
-            exit(-1)
-        if instr == 'rep nop':
-            print('Please insert "rep nop" as pause (MNEMONIC is 0)!')
-            exit(-1)
-        if instr == 'xchg':
-            print('Please insert "xchg" as "lock xchg"!')
-            exit(-1)
-        # check the interrupt format
-        if re.match('int .*', instr):
-            if not re.match('int \$0x[0-9a-f]{2}', instr):
-                print('Please use the format "int $0xa3" to specify numbers in int instructions! ' + instr)
-                exit(-1)
-        for main_synonym in jump_synonyms:
-            secondary_synonyms = jump_synonyms.get(main_synonym)
-            if instr in secondary_synonyms and instr is not main_synonym:
-                print('found ' + instr + '. Please use ' + main_synonym)
-                exit(-1)
-        for main_synonym in set_synonyms:
-            secondary_synonyms = set_synonyms.get(main_synonym)
-            if instr in secondary_synonyms and instr is not main_synonym:
-                print('found ' + instr + '. Please use ' + main_synonym)
-                exit(-1)
-
-def add_asm_sequence(instrs, testcase, note=''):
-    """ Inserts an ordered list of assembly instruction and creates the individual assembly instructions if they do not exist yet. """
-    result = c.execute('SELECT ID from AsmSequence WHERE INSTRUCTIONS=?', (instrs, )).fetchone()
-    if result is not None:
+        reason = invalid_instruction_reason(instr)
+        if reason is not None:
+            raise InputError(reason)
+
+def main_synonym(instr):
+    for synonyms in (jump_synonyms, set_synonyms):
+        for main in synonyms:
+            if instr in synonyms.get(main):
+                return main
+    return instr
+
+def normalize_instructions(mnemonics):
+    """ Rewrites the mnemonics of an asm template (see mnemonics.py) so that they pass check_for_invalid_instructions.
+        Prefixes are folded into the next instruction, "rep nop" becomes pause, xchg becomes lock xchg, interrupt numbers
+        use the "int $0x.." format, and jumps and sets use their main synonym. Assembler directives other than data
+        directives are dropped. """
+    instrs = []
+    prefix = None
+    for instr in mnemonics:
+        tokens = instr.split(' ')
+        tokens[0] = prefix_synonyms.get(tokens[0], tokens[0])
+        if tokens[0].startswith('.') and tokens[0] not in data_directives:
+            continue
+        if tokens[0] in instruction_prefixes and len(tokens) == 1:
+            prefix = tokens[0]
+            continue
+        if prefix is not None:
+            tokens = [prefix] + tokens
+            prefix = None
+        instr = ' '.join(tokens)
+        if tokens[0] in data_directives:
+            instr = tokens[0]
+        elif instr == 'rep nop':
+            instr = 'pause'
+        elif instr == 'xchg':
+            instr = 'lock xchg'
+        elif instr == 'int3':
+            instr = 'int $0x03'
+        elif tokens[0] == 'int' and len(tokens) == 2:
+            number = tokens[1].lstrip('$')
+            try:
+                instr = 'int $0x%02x' % int(number, 16 if number.startswith('0x') else 10)
+            except ValueError:
+                pass
+        instrs.append(main_synonym(instr))
+    if prefix is not None:
+        instrs.append(prefix)
+    return instrs
+
+def uses_mnemonics(mnemonics):
+    """ Returns 0 if the instructions of an asm template are (partly) specified as data (.byte) or as "rep; nop", and 1 otherwise. """
+    for i in range(len(mnemonics)):
+        if mnemonics[i].split(' ')[0] in data_directives or mnemonics[i] == 'rep nop':
+            return 0
+        if mnemonics[i] == 'rep' and i + 1 < len(mnemonics) and mnemonics[i + 1] == 'nop':
+            return 0
+    return 1
+
+def load_id_caches(session):
+    """ Loads the IDs of all instructions and sequences once per session; intern_instruction and intern_sequence keep them up to date. """
+    if session.state['instruction_ids'] is None:
+        session.state['instruction_ids'] = dict(session.cursor.execute('SELECT INSTRUCTION, ID FROM AsmInstruction'))
+        session.state['sequence_ids'] = dict(session.cursor.execute('SELECT INSTRUCTIONS, ID FROM AsmSequence'))
+
+def reset_id_caches(session):
+    """ Empties the caches of the instruction, sequence, and project IDs. """
+    session.state['instruction_ids'] = None
+    session.state['sequence_ids'] = None
+    session.state['project_ids'] = {}
+
+def invalidate_stale_caches(session):
+    """ Empties the ID caches if another connection committed changes since the last call (PRAGMA data_version does not change
+        with the commits of the session's own connection). """
+    data_version = session.conn.execute('PRAGMA data_version').fetchone()[0]
+    if data_version != session.state['data_version']:
+        reset_id_caches(session)
+        session.state['data_version'] = data_version
+
+def commit(session):
+    """ Commits the current transaction (and counts the versions of the tables it wrote, see count_table_versions) unless a
+        batch is running, which commits once after all of its commands. """
+    if not session.state['in_batch']:
+        count_table_versions(session)
+        session.conn.commit()
+
+def rollback(session):
+    """ Rolls back the current transaction; the ID caches might contain rows of it and are loaded again on next use. """
+    session.conn.rollback()
+    reset_id_caches(session)
+
+def intern_instruction(session, instr):
+    """ Returns the ID of an instruction and inserts it (without a test case) if it does not exist yet, without committing. """
+    load_id_caches(session)
+    instruction_id = session.state['instruction_ids'].get(instr)
+    if instruction_id is None:
+        session.cursor.execute('insert into AsmInstruction(INSTRUCTION, TEST_CASE) VALUES(?, ?)', (instr, ''))
+        instruction_id = session.cursor.lastrowid
+        session.state['instruction_ids'][instr] = instruction_id
+    return instruction_id
+
+def intern_sequence(session, instrs, instr_list, testcase='', note=''):
+    """ Returns the ID of a sequence and inserts it together with its instructions (instr_list) if it does not exist yet, without committing. """
+    load_id_caches(session)
+    sequence_id = session.state['sequence_ids'].get(instrs)
+    if sequence_id is None:
+        instr_ids = [intern_instruction(session, instr) for instr in instr_list]
+        session.cursor.execute('insert into AsmSequence(COMPOUND_TEST_CASE, NOTE, INSTRUCTIONS) VALUES (?, ?, ?)', (testcase, note, instrs))
+        sequence_id = session.cursor.lastrowid
+        session.state['sequence_ids'][instrs] = sequence_id
+        session.cursor.executemany('insert into AsmSequenceInstruction(INSTRUCTION_NUMBER, ASM_SEQUENCE_ID, ASM_INSTRUCTION_ID) VALUES(?, ?, ?)',
+                [(i, sequence_id, instr_id) for (i, instr_id) in enumerate(instr_ids)])
+    return sequence_id
+
+def insert_asm_sequence(session, instrs, testcase, note=''):
+    """ Inserts an ordered list of assembly instruction and creates the individual assembly instructions if they do not exist yet, without committing.
+        Returns the ID of the sequence. """
+    load_id_caches(session)
+    if instrs in session.state['sequence_ids']:
         print("asm sequence already exists! skiping insertion")
-        return
+        return session.state['sequence_ids'][instrs]
     instr_list = instrs.replace(',', ';').split(';')
     check_for_invalid_instructions(instr_list)
-    instr_ids = []
     for instr in instr_list:
         print(instr)
-        result = c.execute('SELECT ID from AsmInstruction WHERE INSTRUCTION = ?', (instr,)).fetchone()
-        if result is None:
-            add_asm_instruction(instr)
-            result = c.execute('SELECT ID from AsmInstruction WHERE INSTRUCTION = ?', (instr,)).fetchone()
-        instr_ids += result
-    i = 0
-    c.execute('insert into AsmSequence(COMPOUND_TEST_CASE, NOTE, INSTRUCTIONS) VALUES (?, ?, ?)', (testcase, note, instrs))
-    sequence_id = c.execute('SELECT last_insert_rowid()').fetchone()[0]
-    for instruction_id in instr_ids:
-        c.execute('insert into AsmSequenceInstruction(INSTRUCTION_NUMBER, ASM_SEQUENCE_ID, ASM_INSTRUCTION_ID) VALUES(?, ?, ?)', (i, sequence_id, instruction_id))
-        i += 1
-    conn.commit()
-
-def add_asm_sequence_in_project(sequence, filepath):
+    return intern_sequence(session, instrs, instr_list, testcase, note)
+
+def add_asm_sequence(session, instrs, testcase, note=''):
+    """ Inserts an ordered list of assembly instruction and creates the individual assembly instructions if they do not exist yet. """
+    insert_asm_sequence(session, instrs, testcase, note)
+    commit(session)
+
+def add_asm_sequence_in_project(session, sequence, filepath):
     splitted_path = filepath.split(os.sep)
     if splitted_path[0] != 'projects':
-        print("please specify the path relative to the projects directory!")
-        exit(-1)
+        raise InputError("please specify the path relative to the projects directory!")
     dir = os.path.dirname(os.path.realpath(__file__))
     absolute_path = os.path.join(dir, 'projects/' + splitted_path[1])
-    github = get_git_url(absolute_path)
+    github = get_git_url(session, absolute_path)
     print(github)
-    project_id = get_project_id(github)
-    add_asm_sequence(sequence, '')
-    sequence_id = c.execute('SELECT ID from AsmSequence WHERE INSTRUCTIONS = ?', (sequence,)).fetchone()[0]
+    project_id = get_project_id(session, github)
+    sequence_id = insert_asm_sequence(session, sequence, '')
     project_file = os.sep.join(splitted_path[2:])
-    c.execute('insert into AsmSequencesInGithubProjectUnfiltered(IN_FILE, GITHUB_PROJECT_ID, ASM_SEQUENCE_ID) VALUES(?, ?, ?)', (project_file, project_id, sequence_id))
-    conn.commit()
-
-def get_project_id(github_url):
-    return c.execute('select ID from GithubProjectUnfiltered where GITHUB_URL=?', (github_url, )).fetchone()[0]
-
-def insert_project_keyword(keyword):
+    session.cursor.execute('insert into AsmSequencesInGithubProjectUnfiltered(IN_FILE, GITHUB_PROJECT_ID, ASM_SEQUENCE_ID) VALUES(?, ?, ?)', (project_file, project_id, sequence_id))
+    commit(session)
+
+def collect_project_sequences(dirname, files=None):
+    """ Scans the C/C++ files of a project directory (or only the given files) for inline assembly and returns a
+        dictionary that maps (file, instruction sequence) to [number of occurrences, code of the first occurrence, mnemonic]. """
+    import scanner
+    paths = [dirname] if files is None else [os.path.join(dirname, f) for f in files]
+    hits = []
+    for path in paths:
+        if os.path.exists(path):
+            hits += scanner.scan(path)
+    return sequences_from_hits(dirname, hits)
+
+def sequences_from_hits(dirname, hits):
+    """ Groups the hits of a project directory by file and normalized instruction sequence (see collect_project_sequences). """
+    sequences = {}
+    for hit in hits:
+        raw = mnemonics.template_mnemonics(hit.template)
+        instrs = normalize_instructions(raw)
+        reasons = [reason for reason in map(invalid_instruction_reason, instrs) if reason is not None]
+        if len(reasons) != 0:
+            print('%s:%d: skipping %s (%s)' % (hit.file, hit.line, hit.code, reasons[0].split('\n')[0]))
+            continue
+        key = (os.path.relpath(hit.file, dirname), ';'.join(instrs))
+        if key in sequences:
+            sequences[key][0] += 1
+        else:
+            sequences[key] = [1, hit.code, uses_mnemonics(raw)]
+    return sequences
+
+def insert_asm_sequences(session, sequences):
+    """ Inserts the instruction sequences (strings of ;-separated instructions) that do not exist yet, without committing.
+        Returns a dictionary that maps each sequence to its ID. """
+    return {sequence: intern_sequence(session, sequence, sequence.split(';')) for sequence in sequences}
+
+def store_project_sequences(session, project_id, sequences, files=None):
+    """ Replaces the sequences of a project (or only those in the given files) by the ones from collect_project_sequences in one transaction.
+        The manual columns (USAGE_COMMENT and HAS_FALLBACK) of a sequence that is still found in the same file are kept. """
+    if files is None:
+        manual = session.cursor.execute('SELECT IN_FILE, ASM_SEQUENCE_ID, USAGE_COMMENT, HAS_FALLBACK FROM AsmSequencesInGithubProjectUnfiltered WHERE GITHUB_PROJECT_ID = ?', (project_id, )).fetchall()
+        session.cursor.execute('DELETE FROM AsmSequencesInGithubProjectUnfiltered WHERE GITHUB_PROJECT_ID = ?', (project_id, ))
+    else:
+        manual = []
+        for f in files:
+            manual += session.cursor.execute('SELECT IN_FILE, ASM_SEQUENCE_ID, USAGE_COMMENT, HAS_FALLBACK FROM AsmSequencesInGithubProjectUnfiltered WHERE GITHUB_PROJECT_ID = ? AND IN_FILE = ?', (project_id, f)).fetchall()
+        session.cursor.executemany('DELETE FROM AsmSequencesInGithubProjectUnfiltered WHERE GITHUB_PROJECT_ID = ? AND IN_FILE = ?', [(project_id, f) for f in files])
+    sequence_ids = insert_asm_sequences(session, set(sequence for (_, sequence) in sequences))
+    rows = [(f, project_id, sequence_ids[sequence], code, mnemonic, count) for ((f, sequence), (count, code, mnemonic)) in sorted(sequences.items())]
+    session.cursor.executemany('insert into AsmSequencesInGithubProjectUnfiltered(IN_FILE, GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, CODE, MNEMONIC, NR_OCCURRENCES) VALUES(?, ?, ?, ?, ?, ?)', rows)
+    session.cursor.executemany('UPDATE AsmSequencesInGithubProjectUnfiltered SET USAGE_COMMENT = ?, HAS_FALLBACK = ? WHERE GITHUB_PROJECT_ID = ? AND IN_FILE = ? AND ASM_SEQUENCE_ID = ?',
+            [(usage_comment, has_fallback, project_id, f, sequence_id) for (f, sequence_id, usage_comment, has_fallback) in manual])
+    commit(session)
+
+def analyze_project(session, project):
+    """ Extracts the inline assembly sequences of a project (given by its Github URL or its directory) and replaces its stored sequences. """
+    import profiler
+    if project.startswith('https://'):
+        url = project
+        dirname = get_project_dir(url)
+    else:
+        dirname = project
+        url = get_git_url(session, dirname)
+    project_id = get_project_id(session, url)
+    with profiler.phase(url, 'project'):
+        with profiler.phase('scan'):
+            sequences = collect_project_sequences(dirname)
+        with profiler.phase('store sequences') as details:
+            store_project_sequences(session, project_id, sequences)
+            details['rows'] = len(sequences)
+    print('%s: %d sequences (%d unique) in %d files' % (url, sum(count for (count, _, _) in sequences.values()), len(set(sequence for (_, sequence) in sequences)), len(set(f for (f, _) in sequences))))
+
+def get_project_id(session, github_url):
+    """ Returns the ID of a project, which is cached for the session (see reset_id_caches). """
+    project_ids = session.state['project_ids']
+    if github_url not in project_ids:
+        project_ids[github_url] = session.cursor.execute('select ID from GithubProjectUnfiltered where GITHUB_URL=?', (github_url, )).fetchone()[0]
+    return project_ids[github_url]
+
+def insert_project_keyword(session, keyword):
     """ Inserts a project keyword if it does not exist. Returns the keyword id of the (potentially inserted) keyword. """
-    keyword_id = c.execute('SELECT ID from ApplicationCategory WHERE NAME = ?', (keyword, )).fetchone()
+    keyword_id = session.cursor.execute('SELECT ID from ApplicationCategory WHERE NAME = ?', (keyword, )).fetchone()
     if keyword_id is None:
-        c.execute('insert into ApplicationCategory(NAME) VALUES (?)', (keyword, ))
-        return c.execute('SELECT last_insert_rowid()').fetchone()[0]
+        session.cursor.execute('insert into ApplicationCategory(NAME) VALUES (?)', (keyword, ))
+        return session.cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
     else:
         return keyword_id[0]
 
-def print_query_as_command(command, query, roundn=False, percentage=False):
-    print_as_command(command, c.execute(query).fetchone()[0], roundn, percentage)
-
-def print_as_command(command, content, roundn=False, percentage=False):
+def format_command(command, content, roundn=False, percentage=False):
     formats = '%.1f' if roundn or percentage else '%s'
     if percentage:
         formats = formats + '\%%'
-    print(('\\newcommand{\\%s}{' + formats + '}') % (command, content, ))
+    return ('\\newcommand{\\%s}{' + formats + '}') % (command, content, )
+
+def print_as_command(command, content, roundn=False, percentage=False):
+    print(format_command(command, content, roundn, percentage))
+
+def query_command(command, query, comment=None, roundn=False, percentage=False, inputs=()):
+    """ Returns the report unit of a LaTeX command whose content is the result of a query, optionally preceded by a comment line. """
+    import report
+    def compute(cursor):
+        return cursor.execute(query).fetchone()[0]
+    def latex(content):
+        return ('' if comment is None else comment + '\n') + format_command(command, content, roundn, percentage) + '\n'
+    return report.Unit(command, [query] + list(inputs), compute, latex, comment)
 
 def escape_latex(str):
     return str.replace('#', '\#').replace('$', '\$').replace('_', '\_')
 
-def print_tabular_start(name, columns, caption, nr_projects=None):
+def with_nr_projects(caption, nr_projects=None):
     if nr_projects is None or nr_projects == 1:
-        append = ''
+        return caption
     else:
-        append = ' (with at least ' + str(nr_projects) + ' projects using them)'
+        return caption + ' (with at least ' + str(nr_projects) + ' projects using them)'
+
+def print_tabular_start(name, columns, caption, nr_projects=None):
     print("\\newcommand{\\%s}{" % name)
-    print("\captionof{table}{%s}" % (caption + append,))
+    print("\captionof{table}{%s}" % (with_nr_projects(caption, nr_projects),))
     print("\\begin{tabular}{l", end='')
     for i in range(columns-1): print(" l", end='')
     print("}")
@@ -292,14 +542,10 @@ def print_tabular_end(label):
 \\label{%s}}""" % (label,))
 
 def print_table_start(name, columns, caption, nr_projects=None):
-    if nr_projects is None or nr_projects == 1:
-        append = ''
-    else:
-        append = ' (with at least ' + str(nr_projects) + ' projects using them)'
     print("\\newcommand{\\%s}{" % name)
     print("\\begin{table}[]")
     print("\\small")
-    print("\\caption{%s}" % (caption + append))
+    print("\\caption{%s}" % with_nr_projects(caption, nr_projects))
     print("\\centering")
     print("\\begin{tabular}{l", end='')
     for i in range(columns-1): print("|l", end='')
@@ -310,60 +556,68 @@ def print_table_end(label):
 \\label{%s}
 \\end{table}}""" % label)
 
-def print_instruction_table(nr_instructions=2):
-    # print latex table
-    nr_entries = c.execute('SELECT COUNT(*) FROM InstructionFrequencies WHERE count >= ' + str(nr_instructions)).fetchone()[0]
-    columns = 3
-    max_column_entries = int((nr_entries+ nr_entries%columns) / columns)
-    entries = [''] * max_column_entries
-    print("""\\newcommand{\\instructiontable}{
+def instruction_table(nr_instructions=2):
+    """ Returns the report unit of the table of instructions that were contained in at least nr_instructions projects. """
+    import report
+    query = 'SELECT * FROM InstructionFrequencies WHERE count >= ' + str(nr_instructions) + ' ORDER BY count desc;'
+    caption = 'Instruction table with instructions that were contained in at least ' + str(nr_instructions) + ' projects'
+    def compute(cursor):
+        rows = [[row[1], row[2], row[3]] for row in cursor.execute(query)]
+        return {'caption': caption, 'columns': ['instruction', '# projects', '% projects'], 'rows': rows}
+    def print_table(data):
+        nr_entries = len(data['rows'])
+        columns = 3
+        max_column_entries = int((nr_entries+ nr_entries%columns) / columns)
+        entries = [''] * max_column_entries
+        print("""\\newcommand{\\instructiontable}{
 \\begin{table*}
 \\small{}
-\\caption{Instruction table with instructions that were contained in at least """ + str(nr_instructions) + """ projects}
+\\caption{""" + data['caption'] + """}
 \\label{tbl:common-instructions}
 \\begin{tabular}{l r r """ + ("|l r r" * (columns-1)) + """}
 \\toprule{}
 instruction & \\# projects & \\% projects""" + (' & instruction & \\# projects & \\% projects' * (columns-1)) + """ \\\\
 \\midrule{}%
 """)
-    i = 0
-    for row in c.execute('SELECT * FROM InstructionFrequencies WHERE count >= ' + str(nr_instructions) + ' ORDER BY count desc;'):
-        if i >= max_column_entries:
-            entries[i % max_column_entries] += ' & '
-        entries[i % max_column_entries] += "%s & %s & %.1f" % (escape_latex(row[1]), row[2], row[3])
-        i += 1
-    j = 1
-    for entry in entries:
-        print(entry + '\\\\')
-        if j != len(entries):
-            print('\cmidrule(lr){1-' + str(columns*3) +'}')
-        j += 1
-    print("""\\bottomrule{}
+        i = 0
+        for row in data['rows']:
+            if i >= max_column_entries:
+                entries[i % max_column_entries] += ' & '
+            entries[i % max_column_entries] += "%s & %s & %.1f" % (escape_latex(row[0]), row[1], row[2])
+            i += 1
+        j = 1
+        for entry in entries:
+            print(entry + '\\\\')
+            if j != len(entries):
+                print('\cmidrule(lr){1-' + str(columns*3) +'}')
+            j += 1
+        print("""\\bottomrule{}
 \\end{tabular}
 \\end{table*}}""")
-
-def print_mnemonic_table(nr_projects=5):
-    """ Prints the table of project-unique instruction sequences that contain non-mnemonic instructions. """
-    print_tabular_start("mnemonictable", columns=2, caption="Instruction sequences that did not use mnemonics", nr_projects=nr_projects)
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute('SELECT INSTRUCTIONS, COUNT (DISTINCT AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID) count, 100.0*COUNT (DISTINCT AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID)/(SELECT COUNT(*) FROM GithubProjectWithCheckedInlineAsm) FROM AsmSequencesInAnalyzedGithubProjects, AsmSequence WHERE MNEMONIC = 0 AND AsmSequencesInAnalyzedGithubProjects.ASM_SEQUENCE_ID = AsmSequence.ID GROUP BY AsmSequence.ID HAVING count >= ? ORDER BY count DESC;', (nr_projects,)):
-        print("%s & %.1f \\\\" % (escape_latex(row[0]), row[2]))
-    print_tabular_end("tbl:no-mnemonics")
-
-def print_domain_table(nr_projects=7):
-    print("""\\newcommand{\\domaintable}{\\begin{table}[]
-\\small{}
-\\caption{Domains of projects that used inline assembly (each domain containing at least """ + str(nr_projects) + """ projects)}
-\\centering
-\\begin{tabular}{p{1.8cm} r r p{4.2cm}}
-\\toprule{}
-domain & \\multicolumn{2}{c}{projects} & description \\\\\\cmidrule(){2-3}
- & \\# & \% & \\\\
-\midrule{}
-""")
-    i = 0
-    for row in c.execute('SELECT COUNT(*) as count, MAIN_CATEGORY, COUNT(*) * 100.0/(SELECT COUNT(*) FROM GithubProjectWithInlineAsm) as perc FROM GithubProjectWithInlineAsm GROUP BY MAIN_CATEGORY HAVING count >= ? ORDER BY count DESC', (nr_projects, )):
+    return report.Unit('instructiontable', [query], compute, report.printed(print_table), caption)
+
+def mnemonic_table(nr_projects=5):
+    """ Returns the report unit of the table of project-unique instruction sequences that contain non-mnemonic instructions. """
+    import report
+    query = 'SELECT INSTRUCTIONS, COUNT (DISTINCT AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID) count, 100.0*COUNT (DISTINCT AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID)/(SELECT COUNT(*) FROM GithubProjectWithCheckedInlineAsm) FROM AsmSequencesInAnalyzedGithubProjects, AsmSequence WHERE MNEMONIC = 0 AND AsmSequencesInAnalyzedGithubProjects.ASM_SEQUENCE_ID = AsmSequence.ID GROUP BY AsmSequence.ID HAVING count >= ? ORDER BY count DESC;'
+    caption = with_nr_projects('Instruction sequences that did not use mnemonics', nr_projects)
+    def compute(cursor):
+        rows = [[row[0], row[2]] for row in cursor.execute(query, (nr_projects,))]
+        return {'caption': caption, 'columns': ['instruction', '% projects'], 'rows': rows}
+    def print_table(data):
+        print_tabular_start("mnemonictable", columns=2, caption=data['caption'])
+        print("instruction & \% projects \\\\")
+        print("\\midrule{}%")
+        for row in data['rows']:
+            print("%s & %.1f \\\\" % (escape_latex(row[0]), row[1]))
+        print_tabular_end("tbl:no-mnemonics")
+    return report.Unit('mnemonictable', [query], compute, report.printed(print_table), caption)
+
+def domain_table(nr_projects=7):
+    import report
+    query = 'SELECT COUNT(*) as count, MAIN_CATEGORY, COUNT(*) * 100.0/(SELECT COUNT(*) FROM GithubProjectWithInlineAsm) as perc FROM GithubProjectWithInlineAsm GROUP BY MAIN_CATEGORY HAVING count >= ? ORDER BY count DESC'
+    caption = 'Domains of projects that used inline assembly (each domain containing at least ' + str(nr_projects) + ' projects)'
+    def compute(cursor):
         replacements = {
             'TODO' : 'misc',
         }
@@ -379,195 +633,507 @@ domain & \\multicolumn{2}{c}{projects} & description \\\\\\cmidrule(){2-3}
             'math library' : 'scientific applications, math libraries',
             'TODO' : 'projects not assigned to any domain'
         }
-        if i != 0:
-            print('\cmidrule(lr){1-4}')
-        i += 1
-        name = replacements.get(row[1], row[1])
-        descr = descriptions.get(row[1], '')
-        print("%s & %s & %.1f & %s \\\\" % (name, row[0], row[2], descr))
-    print("\\bottomrule{}")
-    print_table_end("tbl:domains")
-
-def print_lock_table(nr_projects=4):
-    print_tabular_start(name="locktable", columns=2, caption="Instructions for atomics", nr_projects=nr_projects)
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute('SELECT * FROM InstructionFrequencies WHERE INSTRUCTION LIKE "lock%" AND count >= ?', (nr_projects, )):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="tbl:lock")
-
-def print_set_byte_table(nr_projects=1):
-    print_tabular_start(name="settable", columns=2, caption="Instructions that set a value based on a flag", nr_projects=nr_projects)
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute('SELECT * FROM InstructionFrequencies WHERE INSTRUCTION LIKE "set%" AND count >= ?', (nr_projects, )):
-        synonyms = set_synonyms.get(row[1])
-        if synonyms is None:
-            label = row[1]
-        else:
-            label = "/".join(synonyms)
-        print("%s & %.1f \\\\" % (label, row[3]))
-    print_tabular_end(label="tbl:settable")
-
-def print_rep_table(nr_projects=1):
-    print_tabular_start(name="repttable", columns=2, caption="Instructions with \code{rep} prefixes", nr_projects=nr_projects)
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute('SELECT * FROM InstructionFrequencies WHERE (INSTRUCTION LIKE "rep%" or INSTRUCTION LIKE "cld") AND count >= ?', (nr_projects, )):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="tbl:repttable")
-
-def print_control_flow_table(nr_projects=4):
-    print_tabular_start(name="controlflowtable", columns=2, caption="Instructions for control flow", nr_projects=nr_projects)
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute('SELECT * FROM InstructionFrequencies WHERE (INSTRUCTION LIKE "j%" OR INSTRUCTION IN ("cmp", "test")) AND count >= ?', (nr_projects, )):
-        synonyms = jump_synonyms.get(row[1])
-        if synonyms is None:
-            label = row[1]
-        else:
-            label = "/".join(synonyms)
-        print("%s & %.1f \\\\" % (label, row[3]))
-    print_tabular_end(label="tbl:controlflow")
-
-def print_arithmetic_table(nr_projects=1):
-    print_tabular_start(name="arithmetictable", columns=2, caption="Instructions for arithmetics", nr_projects=nr_projects)
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('xor', 'add', 'or', 'sub', 'and', 'inc', 'dec', 'mul', 'adc', 'dec', 'neg', 'lea') AND count >= ?", (nr_projects, )):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="tbl:arithmetic")
-
-def print_fence_table():
-    print_tabular_start("fencetable", columns=2, caption="Instruction for fences")
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('mfence', 'lfence', 'sfence')"):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="fence-instructions")
-
-def print_hash_table():
-    print_tabular_start("hashtable", columns=2, caption="Instructions for hash functions")
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('rol', 'ror', 'shl', 'crc32')"):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="hashes")
-    
-def print_endianness_table():
-    print_tabular_start("tableendian", columns=2, caption="Instructions for endianness conversion")
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('lock xchg', 'rol', 'ror', 'bswap')"):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="bswap-intrinsics")
-
-def print_timing_table():
-    print_tabular_start(name="timingtable", columns=2, caption="Instructions for timing")
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('rdtsc', 'rdtscp', 'cpuid')"):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="timer-instructions")
-
-def print_move_data_table():
-    print_tabular_start(name="datatable", columns=2, caption="Instructions to move around data")
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('mov', 'push', 'pop', 'pushf', 'popf')"):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="tbl:mov")
-
-def print_feature_detection_table():
-    print_tabular_start(name="featuretable", columns=2, caption="Instructions for feature detection")
-    print("instruction & \% projects \\\\")
-    print("\\midrule{}%")
-    for row in c.execute("SELECT * FROM InstructionFrequencies WHERE INSTRUCTION IN ('cpuid', 'xgetbv')"):
-        print("%s & %.1f \\\\" % (row[1], row[3]))
-    print_tabular_end(label="cpuid-instruction")
-
-def print_most_common_files_table(limit=10):
-    print("""\\newcommand{\\mostcommonfilestable}{
-\\captionof{table}{The """ + str(limit) + """ most common file names that contained inline assembly and their average numbers of instructions}
+        rows = [[replacements.get(row[1], row[1]), row[0], row[2], descriptions.get(row[1], '')] for row in cursor.execute(query, (nr_projects, ))]
+        return {'caption': caption, 'columns': ['domain', '# projects', '% projects', 'description'], 'rows': rows}
+    def print_table(data):
+        print("""\\newcommand{\\domaintable}{\\begin{table}[]
+\\small{}
+\\caption{""" + data['caption'] + """}
+\\centering
+\\begin{tabular}{p{1.8cm} r r p{4.2cm}}
+\\toprule{}
+domain & \\multicolumn{2}{c}{projects} & description \\\\\\cmidrule(){2-3}
+ & \\# & \% & \\\\
+\midrule{}
+""")
+        i = 0
+        for row in data['rows']:
+            if i != 0:
+                print('\cmidrule(lr){1-4}')
+            i += 1
+            print("%s & %s & %.1f & %s \\\\" % tuple(row))
+        print("\\bottomrule{}")
+        print_table_end("tbl:domains")
+    return report.Unit('domaintable', [query], compute, report.printed(print_table), caption)
+
+def instruction_percentage_table(name, caption, label, condition, nr_projects=None, synonyms={}):
+    """ Returns the report unit of a table of the instructions in InstructionFrequencies that satisfy a condition (and that are
+        used by at least nr_projects projects) with the percentage of projects that use them. Instructions with synonyms are
+        labeled with all synonyms. """
+    import report
+    query = 'SELECT * FROM InstructionFrequencies WHERE ' + condition + ('' if nr_projects is None else ' AND count >= ?')
+    params = () if nr_projects is None else (nr_projects, )
+    caption = with_nr_projects(caption, nr_projects)
+    def compute(cursor):
+        rows = []
+        for row in cursor.execute(query, params):
+            instruction_synonyms = synonyms.get(row[1])
+            rows.append([row[1] if instruction_synonyms is None else "/".join(instruction_synonyms), row[3]])
+        return {'caption': caption, 'columns': ['instruction', '% projects'], 'rows': rows}
+    def print_table(data):
+        print_tabular_start(name, columns=2, caption=data['caption'])
+        print("instruction & \% projects \\\\")
+        print("\\midrule{}%")
+        for row in data['rows']:
+            print("%s & %.1f \\\\" % tuple(row))
+        print_tabular_end(label)
+    return report.Unit(name, [query], compute, report.printed(print_table), caption)
+
+def most_common_files_table(limit=10):
+    import report
+    query = "SELECT file_name, COUNT(DISTINCT GITHUB_PROJECT_ID) as count, AVG(inline_assembly_count) FROM FileNamesWithInlineAssembly GROUP BY file_name ORDER BY count DESC, file_name ASC LIMIT " + str(limit)
+    caption = 'The ' + str(limit) + ' most common file names that contained inline assembly and their average numbers of instructions'
+    def compute(cursor):
+        rows = [list(row) for row in cursor.execute(query)]
+        return {'caption': caption, 'columns': ['file name', 'projects', 'instr.'], 'rows': rows}
+    def print_table(data):
+        print("""\\newcommand{\\mostcommonfilestable}{
+\\captionof{table}{""" + data['caption'] + """}
 \\begin{tabular}{p{1.7cm} r r | p{1.2cm} r r}
 \\toprule{}
 file name & projects & instr. & file name & projects & instr. \\\\
 \\midrule{}%
 """)
-    lines = [''] * (limit//2)
-    i = 0
-    for row in c.execute("SELECT file_name, COUNT(DISTINCT GITHUB_PROJECT_ID) as count, AVG(inline_assembly_count) FROM FileNamesWithInlineAssembly GROUP BY file_name ORDER BY count DESC, file_name ASC LIMIT " + str(limit)):
-        idx = i % (limit//2)
-        if lines[idx] != '':
-            lines[idx] += '&'
-        lines[idx] += "%s & %d & %.1f" % (escape_latex(row[0]), row[1], row[2])
-        i += 1
-    for line in lines:
-        print(line + "\\\\")
-    print_tabular_end(label="tbl:mostcommonfiles")
-    
-def database_integrity_tests():
-    if c.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered WHERE ASM_SEQUENCE_ID NOT IN (SELECT ID FROM AsmSequence)').fetchone()[0] != 0:
-        print('Dangling AsmSequence entry!')
-        exit(-1)
+        lines = [''] * (limit//2)
+        i = 0
+        for row in data['rows']:
+            idx = i % (limit//2)
+            if lines[idx] != '':
+                lines[idx] += '&'
+            lines[idx] += "%s & %d & %.1f" % (escape_latex(row[0]), row[1], row[2])
+            i += 1
+        for line in lines:
+            print(line + "\\\\")
+        print_tabular_end(label="tbl:mostcommonfiles")
+    return report.Unit('mostcommonfilestable', [query], compute, report.printed(print_table), caption)
+
+def project_count_commands():
+    """ Returns the report unit of the commands with the number of projects that contain each instruction. """
+    import report
+    query = 'SELECT * FROM InlineAssemblyInstructionsInProjects ORDER BY count desc;'
+    comment = '% how often an instruction appears in different projects'
+    def compute(cursor):
+        rows = [[row[1], row[2]] for row in cursor.execute(query)]
+        return {'caption': 'Number of projects that contain an instruction', 'columns': ['instruction', '# projects'], 'rows': rows}
+    def print_commands(data):
+        print(comment)
+        replacements = {
+            '' : 'noInstr', # compiler/memory barrier
+            '#' : 'comment', # asm comment
+            'int$0x03' : 'intdebug', # debug interrupt
+            'int$0x80' : 'intsystemcall', # system call interrupt
+            'crc32' : 'crc',
+            'cvtsd2si' : 'cvtsdtosi',
+            'ud2' : 'ud',
+            '<name>' : 'declarativeName',
+            '<register>' : 'register'
+        }
+        for (instruction, count) in data['rows']:
+            instr_name = instruction.replace(' ', '')
+            instr_name = replacements.get(instr_name, instr_name)
+            print_as_command(instr_name + 'ProjectCount', count)
+    return report.Unit('projectCounts', [query], compute, report.printed(print_commands), comment)
+
+def database_integrity_tests(session):
+    if session.cursor.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered WHERE ASM_SEQUENCE_ID NOT IN (SELECT ID FROM AsmSequence)').fetchone()[0] != 0:
+        raise InputError('Dangling AsmSequence entry!')
     # not supported by the Python sqlite3 bindings?
     #if c.execute('SELECT * FROM AsmSequencesInGithubProjectUnfiltered WHERE CODE REGEXP "rep([; \t\n])*nop" AND MNEMONIC = 1').fetchone()[0] != 0:
-    if c.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered WHERE MNEMONIC = 1 AND (CODE LIKE "%rep; nop%" or CODE LIKE "%rep;nop%")').fetchone()[0] != 0:
-        print('rep nop with MNEMONIC = 0')
-        exit(-1)
-    if c.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered WHERE CODE LIKE "%.byte%" AND MNEMONIC = 1').fetchone()[0] != 0:
-        print('.byte with MNEMONIC = 0')
-        exit(-1)
-    if c.execute('SELECT COUNT(*) FROM AsmInstruction WHERE INSTRUCTION LIKE "j%" AND CONTROL_FLOW = 0').fetchone()[0] != 0:
-        print('jump instruction with CONTROL_FLOW = 0')
-        exit(-1)
+    if session.cursor.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered WHERE MNEMONIC = 1 AND (CODE LIKE "%rep; nop%" or CODE LIKE "%rep;nop%")').fetchone()[0] != 0:
+        raise InputError('rep nop with MNEMONIC = 0')
+    if session.cursor.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered WHERE CODE LIKE "%.byte%" AND MNEMONIC = 1').fetchone()[0] != 0:
+        raise InputError('.byte with MNEMONIC = 0')
+    if session.cursor.execute('SELECT COUNT(*) FROM AsmInstruction WHERE INSTRUCTION LIKE "j%" AND CONTROL_FLOW = 0').fetchone()[0] != 0:
+        raise InputError('jump instruction with CONTROL_FLOW = 0')
+
+# (output file, header, column of GithubProjectCompletelyAnalyzed, format) of the scatter plots of a project metric against the
+# number of inline assembly snippets per project
+scatter_plot_metrics = [
+    ('scatterplot_git_commits.csv', 'nr_commits', 'GIT_NR_COMMITS', '%d'),
+    ('scatterplot_git_nr_committers.csv', 'nr_commiters', 'GIT_NR_COMMITTERS', '%d'),
+    ('scatterplot_git_stargazers.csv', 'github_stargazers', 'GITHUB_NR_STARGAZERS', '%d'),
+    ('scatterplot_first_commit_date.csv', 'first_commit_date', 'GIT_FIRST_COMMIT_DATE', '%s'),
+    ('scatterplot_macro_assembly.csv', 'macro_assembly_loc', 'CLOC_LOC_ASSEMBLY', '%s'),
+    ('scatterplot_github_nr_forks.csv', 'github_nr_forks', 'GITHUB_NR_FORKS', '%s'),
+]
+
+def parse_scatter_plot_metrics(session, metrics):
+    """ Parses a comma-separated list of project columns (e.g., GITHUB_NR_OPEN_ISSUES,CLOC_LOC_C) into additional scatter plot metrics. """
+    columns = set(row[1] for row in session.cursor.execute('PRAGMA table_info(GithubProjectCompletelyAnalyzed)'))
+    parsed = []
+    for column in metrics.split(','):
+        column = column.strip()
+        if column not in columns:
+            raise InputError(column + " is not a column of GithubProjectCompletelyAnalyzed!")
+        parsed.append(('scatterplot_' + column.lower() + '.csv', column.lower(), column, '%s'))
+    return parsed
+
+def create_scatter_plot_data(session, output_dir, metrics=scatter_plot_metrics):
+    """ Writes one CSV file per metric with the metric and the number of inline assembly snippets of each analyzed project.
+        All metrics are selected by a single aggregation, whose rows are written to all files. If output_dir is None, the
+        aggregation runs without writing files. """
+    files = [] if output_dir is None else [open(os.path.join(output_dir, file_name), 'w') for (file_name, _, _, _) in metrics]
+    try:
+        for (f, (_, header, _, _)) in zip(files, metrics):
+            f.write(header + ';nr_inline_snippets\n')
+        columns = ', '.join(column for (_, _, column, _) in metrics)
+        for row in session.cursor.execute('SELECT ' + columns + ', SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
+            nr_snippets = row[-1]
+            for (i, (f, (_, _, _, value_format))) in enumerate(zip(files, metrics)):
+                f.write((value_format + ';%d\n') % (row[i], nr_snippets))
+    finally:
+        for f in files:
+            f.close()
+
+def cumulative_distribution(session, query, params=(), max_value=None):
+    """ Computes a cumulative distribution from a single grouped query that returns (value, count) rows.
+        Returns a list of (value, percentage of the counts with a value <= value) for value = 1, ..., max_value
+        (by default the largest value returned by the query). """
+    counts = dict(session.cursor.execute(query, params).fetchall())
+    total = sum(counts.values())
+    if max_value is None:
+        max_value = max(counts) if len(counts) != 0 else 0
+    distribution = []
+    cumulative = sum(count for (value, count) in counts.items() if value < 1)
+    for value in range(1, max_value + 1):
+        cumulative += counts.get(value, 0)
+        distribution.append((value, 100.0 * cumulative / total if total != 0 else None))
+    return distribution
+
+def write_cumulative_distribution(file_name, header, distribution):
+    with open(file_name, 'w+') as f:
+        f.write(header + '\n')
+        for (value, percentage) in distribution:
+            f.write(str(value) + ';' + str(percentage) + '\n')
+
+# views that show_stats reads repeatedly; they are materialized once per run
+stats_views = [
+    'GithubProjectWithInlineAsm',
+    'GithubProjectWithCheckedInlineAsm',
+    'GithubProjectCompletelyAnalyzed',
+    'GithubProjectNotCompletelyAnalyzed',
+    'AsmSequencesInAnalyzedGithubProjects',
+    'AsmSequencesWithInstructionCountsInAnalyzedGithubProjects',
+    'UniqueSequencesPerProject',
+    'AsmInstructionsInAnalyzedGithubProjects',
+    'InstructionFrequencies',
+    'InlineAssemblyInstructionsInProjects',
+    'FileNamesWithInlineAssembly',
+]
+
+stats_indexes = [
+    'CREATE INDEX IF NOT EXISTS temp.StatsSequencesProject ON AsmSequencesInAnalyzedGithubProjects(GITHUB_PROJECT_ID)',
+    'CREATE INDEX IF NOT EXISTS temp.StatsUniqueSequencesProject ON UniqueSequencesPerProject(GITHUB_PROJECT_ID)',
+    'CREATE INDEX IF NOT EXISTS temp.StatsInstructionsProject ON AsmInstructionsInAnalyzedGithubProjects(INSTRUCTION, GITHUB_PROJECT_ID)',
+]
+
+def materialize_stats_views(session):
+    """ Copies the views in stats_views into temporary tables of the same name. As SQLite resolves unqualified names in
+        the temp schema first, all following queries of this connection read the copies instead of re-evaluating the
+        views. The category tables are created by the first report unit that reads them (see materialize_project_categories).
+        Only temporary tables are written, and no transaction is begun, so the main database stays unlocked for other
+        writers and the transaction of the caller is left alone. Tables left over from an earlier run that failed are
+        replaced. """
+    views = set(row[0] for row in session.cursor.execute("SELECT name FROM main.sqlite_master WHERE type = 'view'"))
+    for view in stats_views:
+        if view in views:
+            session.cursor.execute('DROP TABLE IF EXISTS temp.%s' % view)
+            session.cursor.execute('CREATE TEMP TABLE IF NOT EXISTS %s AS SELECT * FROM main.%s' % (view, view))
+    for index in stats_indexes:
+        session.cursor.execute(index)
+    session.cursor.execute('DROP TABLE IF EXISTS temp.StatsInstructionCategories')
+    session.cursor.execute('DROP TABLE IF EXISTS temp.StatsProjectCategories')
+
+def drop_stats_views(session):
+    """ Drops the temporary tables created by materialize_stats_views. """
+    for (name, ) in session.cursor.execute("SELECT name FROM temp.sqlite_master WHERE type = 'table'").fetchall():
+        session.cursor.execute('DROP TABLE temp.%s' % name)
+
+# matches the queries of show_stats, including those that materialize views
+explained_query_regex = re.compile(r'^\s*(?:CREATE TEMP TABLE (?:IF NOT EXISTS )?\w+ AS\s+)?(SELECT\b.*)', re.S | re.I)
+
+def is_full_table_scan(detail):
+    """ Returns whether a line of EXPLAIN QUERY PLAN describes a scan of a table (rather than of an index, a subquery, or the schema). """
+    return detail.startswith('SCAN ') and ' USING ' not in detail and not detail.startswith('SCAN (') and 'sqlite_master' not in detail and detail != 'SCAN CONSTANT ROW'
+
+def explain_stats(session):
+    """ Runs the queries of show_stats (without writing its files) and prints those whose query plan contains a full table
+        scan together with the scans. """
+    import profiler
+    statements = []
+    # sqlite3 has only one trace callback, so the one of the profiler is chained and restored
+    previous = profiler.trace_callback(session.conn)
+    def trace(statement):
+        statements.append(statement)
+        if previous is not None:
+            previous(statement)
+    session.conn.set_trace_callback(trace)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            show_stats(session, None, use_cache=False)
+    finally:
+        session.conn.set_trace_callback(previous)
+    # the plans refer to the temporary tables, so create them again
+    materialize_stats_views(session)
+    materialize_project_categories(session.cursor)
+    queries = []
+    for statement in statements:
+        match = explained_query_regex.match(statement)
+        if match is not None and match.group(1) not in queries:
+            queries.append(match.group(1))
+    nr_scanning = 0
+    for query in queries:
+        scans = [row[3] for row in session.cursor.execute('EXPLAIN QUERY PLAN ' + query) if is_full_table_scan(row[3])]
+        if len(scans) != 0:
+            nr_scanning += 1
+            print(' '.join(query.split()))
+            for scan in scans:
+                print('\t' + scan)
+    drop_stats_views(session)
+    print('%d of %d queries scan complete tables' % (nr_scanning, len(queries)))
+
+# (category, command, instructions) of the instruction groups of show-stats; instructions that end with % are prefixes
+instruction_groups = [
+    ('control flow', 'percentageProjectsWithControlFlowInstructions', ('j%', 'cmp', 'test')),
+    ('fence', 'percentageProjectsWithFenceInstructions', ('mfence', 'lfence', 'sfence')),
+    ('bit scan', 'percentageBitScanInstructions', ('bsr', 'bsf')),
+    ('hash', 'percentageHashInstructions', ('rol', 'ror', 'shl', 'crc32')),
+    ('time', 'percentageProjectsWithTimeInstructions', ('cpuid', 'rdtsc', '')),
+    ('atomic', 'percentageProjectsWithAtomicInstructions', ('lock%', )),
+    ('arithmetic', 'percentageProjectsWithArithmeticInstructions', ('xor', 'add', 'or', 'sub', 'and', 'inc', 'dec', 'mul', 'adc', 'neg', 'lea')),
+    ('pause', 'percentageProjectsWithPauseInstructions', ('pause', )),
+    ('compiler barrier', 'percentageProjectsWithCompilerBarriers', ('', )),
+    ('endianness', 'percentageProjectsWithEndiannessInstructions', ('lock xchg', 'rol', 'ror', 'bswap')),
+    ('prefetch', 'percentageProjectsWithPrefetch', ('prefetch', )),
+    ('random number', 'percentageProjectsWithRandomNumber', ('rdrand', )),
+    ('nop', 'percentageProjectsWithNop', ('nop', )),
+    ('set', 'percentageProjectsWithSet', ('set%', )),
+    ('rep', 'percentageProjectsWithRep', ('rep%', 'cld')),
+    ('feature detection', 'percentageProjectsWithFeatureDetection', ('cpuid', 'xgetbv')),
+    ('aes', 'percentageProjectsWithAES', ('aesdec', 'aesdeclast', 'aesenc', 'aesenclast', 'aesimc', 'aeskeygena')),
+    ('debug interrupt', 'percentageProjectsWithDebugInterrupt', ('int $0x03', )),
+    ('simd', 'percentageProjectsWithSIMD', ('pxor', 'movdqa', 'movdqu', 'psrlq', 'pclmulqdq', 'pshufd', 'pslldq', 'psllq', 'psrldq')),
+    ('move', 'percentageProjectsWithMoves', ('mov', 'push', 'pop', 'pushf', 'popf')),
+]
+
+# (category, command, instructions added to those of the previous step) of the instructions that need to be implemented to
+# support increasingly many projects
+implementation_steps = [
+    ('implementation: none', 'percentageNoInstructionImplemented', ()),
+    ('implementation: time', 'percentageTimeInstructionsImplemented', ('rdtsc', 'rdtscp')),
+    ('implementation: feature detection', 'percentageFeatureInstructionsImplemented', ('cpuid', 'xgetbv')),
+    ('implementation: barrier', 'percentageBarrierInstructionsImplemented', ('', 'prefetch', 'nop', 'int $0x03', 'pause', 'mfence', 'sfence', 'lfence', 'ud2')),
+    ('implementation: byte manipulation', 'percentageByteManipulationInstructionsImplemented', ('bsr', 'bsf', 'or', 'xor', 'neg', 'bswap', 'shl', 'rol', 'ror')),
+    ('implementation: lock', 'percentageLockInstructionsImplemented', ('lock xchg', 'lock cmpxchg', 'lock xadd', 'lock add', 'lock dec', 'lock inc')), #('lock xchg', 'lock cmpxchg', 'lock xadd', 'lock add', 'lock dec', 'lock inc', 'lock xor', 'lock neg', 'lock btc', 'lock btr')
+    ('implementation: mov', 'percentageMovInstructionsImplemented', ('mov', 'push', 'pop')),
+    ('implementation: crc', 'percentageCrcInstructionsImplemented', ('crc32',)),
+    ('implementation: set', 'percentageSetInstructionsImplemented', ('setz', 'setc', 'setnz', 'stc')),
+    ('implementation: arithmetic', 'percentageArithmeticInstructionsImplemented', ('add', 'sub', 'mul', 'adc', 'lea', 'inc', 'dec', 'div', 'imul', 'sbb')),
+    ('implementation: rdrand', 'rdrandInstructionsImplemented', ('rdrand',)),
+    ('implementation: control flow', 'percentageControlFlowInstructionsImplemented', ('jmp', 'jnc')), #%, 'test', 'jz', 'jnz', 'jl', 'ja', 'jbe', 'je', 'jne', 'jb', 'jnc')
+    ('implementation: string', 'percentageStringInstructionsImplemented', ('rep movs', )),
+]
+
+# the category of the instructions that none of the implementation steps adds
+not_implemented_category = 'implementation: missing'
+
+def instruction_category_names():
+    """ Returns the names of the instruction categories; the ID of a category (its index) is its bit in the category bitmaps
+        of the projects (see materialize_stats_views). The implementation steps come last, so that a project is supported after
+        step k if its bitmap has no bit above that of step k. """
+    return [category for (category, _, _) in instruction_groups] + [category for (category, _, _) in implementation_steps] + [not_implemented_category]
+
+def implementation_step_bit(step):
+    return len(instruction_groups) + step
+
+def instruction_matches(instruction, patterns):
+    return any(instruction.startswith(pattern[:-1]) if pattern.endswith('%') else instruction == pattern for pattern in patterns)
+
+def instruction_category_memberships(cursor):
+    """ Returns the (category ID, instruction ID) pairs of all instructions according to instruction_groups and
+        implementation_steps. Each instruction is in exactly one implementation category. """
+    memberships = []
+    for (instruction_id, instruction) in cursor.execute('SELECT ID, INSTRUCTION FROM AsmInstruction').fetchall():
+        for (category_id, (_, _, patterns)) in enumerate(instruction_groups):
+            if instruction_matches(instruction, patterns):
+                memberships.append((category_id, instruction_id))
+        steps = [step for (step, (_, _, added)) in enumerate(implementation_steps) if instruction_matches(instruction, added)]
+        memberships.append((implementation_step_bit(steps[0] if len(steps) != 0 else len(implementation_steps)), instruction_id))
+    return memberships
+
+def materialize_project_categories(cursor):
+    """ Creates StatsInstructionCategories, the categories of each instruction (see instruction_category_memberships), and
+        StatsProjectCategories, the bitmap of the categories that each analyzed project uses, unless they exist. They are
+        created by the report units that read them, so that the fingerprint of these units (see report.fingerprint) covers
+        the categories, and cached units do not compute them. """
+    import json
+    if cursor.execute("SELECT COUNT(*) FROM temp.sqlite_master WHERE name = 'StatsProjectCategories'").fetchone()[0] != 0:
+        return
+    # created by a single statement from a JSON array, as inserting the rows would begin a transaction
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS StatsInstructionCategories AS SELECT json_extract(value, '$[0]') AS INSTRUCTION_CATEGORY_ID, json_extract(value, '$[1]') AS ASM_INSTRUCTION_ID FROM json_each(?)",
+            (json.dumps(instruction_category_memberships(cursor)), ))
+    # the categories of a project are distinct powers of two, so their distinct sum is their bitwise or
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS StatsProjectCategories AS SELECT GITHUB_PROJECT_ID, IFNULL(SUM(DISTINCT 1 << INSTRUCTION_CATEGORY_ID), 0) AS CATEGORIES FROM AsmInstructionsInAnalyzedGithubProjects LEFT JOIN StatsInstructionCategories ON StatsInstructionCategories.ASM_INSTRUCTION_ID = AsmInstructionsInAnalyzedGithubProjects.ASM_INSTRUCTION_ID GROUP BY GITHUB_PROJECT_ID')
+
+# the tables that StatsProjectCategories (see materialize_project_categories) is computed from
+stats_project_categories_inputs = ['AsmInstructionsInAnalyzedGithubProjects', 'AsmInstruction']
+
+def instruction_category_counts(cursor):
+    """ Aggregates the category bitmaps of the projects in a single query. Returns the number of projects with a bitmap, the
+        number of projects that use each instruction group, the number of projects that are supported after each
+        implementation step, and the numbers of checked, not completely analyzed, and all projects with inline assembly. """
+    columns = ['COUNT(*)']
+    columns += ['TOTAL((CATEGORIES >> %d) & 1)' % bit for bit in range(len(instruction_groups))]
+    columns += ['TOTAL((CATEGORIES >> %d) = 0)' % implementation_step_bit(step + 1) for step in range(len(implementation_steps))]
+    columns += ['(SELECT COUNT(*) FROM GithubProjectWithCheckedInlineAsm)', '(SELECT COUNT(*) FROM GithubProjectNotCompletelyAnalyzed)', '(SELECT COUNT(*) FROM GithubProjectWithInlineAsm)']
+    materialize_project_categories(cursor)
+    row = [int(value) for value in cursor.execute('SELECT ' + ', '.join(columns) + ' FROM StatsProjectCategories').fetchone()]
+    nr_groups = len(instruction_groups)
+    return (row[0], row[1:1 + nr_groups], row[1 + nr_groups:-3], row[-3], row[-2], row[-1])
+
+def instruction_group_commands():
+    """ Returns the report unit of the percentages of checked projects that use each instruction group. """
+    import report
+    def compute(cursor):
+        (_, group_counts, _, nr_checked_projects, _, _) = instruction_category_counts(cursor)
+        rows = [[command, category, 100.0 * count / nr_checked_projects] for ((category, command, _), count) in zip(instruction_groups, group_counts)]
+        return {'caption': 'Percentage of projects that use an instruction group', 'columns': ['command', 'category', '% projects'], 'rows': rows}
+    def print_commands(data):
+        for (command, _, percentage) in data['rows']:
+            print_as_command(command, percentage, percentage=True)
+    return report.Unit('instructionGroups', stats_project_categories_inputs + ['GithubProjectWithCheckedInlineAsm'], compute, report.printed(print_commands), None)
+
+def implementation_commands():
+    """ Returns the report unit of the percentages of projects whose instructions are all implemented after each
+        implementation step. """
+    import report
+    def compute(cursor):
+        (nr_projects, _, supported_counts, _, nr_not_analyzed, nr_projects_with_inline_asm) = instruction_category_counts(cursor)
+        rows = []
+        instructions = ()
+        for ((_, command, added), nr_supported) in zip(implementation_steps, supported_counts):
+            instructions = instructions + added
+            rows.append([command, ','.join('"' + instr + '"' for instr in instructions), 100-(nr_projects - nr_supported) * 100.0 / nr_projects])
+        total = 100-((nr_projects - supported_counts[-1]) + nr_not_analyzed) * 100.0 / nr_projects_with_inline_asm
+        return {'caption': 'Percentage of projects whose instructions are all implemented', 'columns': ['command', 'instructions', '% projects'], 'rows': rows,
+                'nrImplementedInstructions': len(instructions), 'percentageImplementedTotal': total}
+    def print_commands(data):
+        for (command, instruction_list, percentage) in data['rows']:
+            print('%', instruction_list)
+            print_as_command(command, percentage, percentage=True)
+        print_as_command('nrImplementedInstructions', data['nrImplementedInstructions'])
+        print_as_command('percentageImplementedTotal', data['percentageImplementedTotal'], percentage=True)
+    return report.Unit('implementation', stats_project_categories_inputs + ['GithubProjectNotCompletelyAnalyzed', 'GithubProjectWithInlineAsm'], compute, report.printed(print_commands), None)
+
+def report_units(checked_down_to_stars='850'):
+    """ Returns the units of the show-stats report (commands.tex) in order. """
+    import report
+    units = [
+        instruction_table(),
+        mnemonic_table(),
+        domain_table(),
+        instruction_percentage_table("locktable", "Instructions for atomics", "tbl:lock", 'INSTRUCTION LIKE "lock%"', nr_projects=4),
+        instruction_percentage_table("settable", "Instructions that set a value based on a flag", "tbl:settable", 'INSTRUCTION LIKE "set%"', nr_projects=1, synonyms=set_synonyms),
+        instruction_percentage_table("controlflowtable", "Instructions for control flow", "tbl:controlflow", '(INSTRUCTION LIKE "j%" OR INSTRUCTION IN ("cmp", "test"))', nr_projects=4, synonyms=jump_synonyms),
+        instruction_percentage_table("repttable", "Instructions with \code{rep} prefixes", "tbl:repttable", '(INSTRUCTION LIKE "rep%" or INSTRUCTION LIKE "cld")', nr_projects=1),
+        instruction_percentage_table("arithmetictable", "Instructions for arithmetics", "tbl:arithmetic", "INSTRUCTION IN ('xor', 'add', 'or', 'sub', 'and', 'inc', 'dec', 'mul', 'adc', 'dec', 'neg', 'lea')", nr_projects=1),
+        instruction_percentage_table("fencetable", "Instruction for fences", "fence-instructions", "INSTRUCTION IN ('mfence', 'lfence', 'sfence')"),
+        instruction_percentage_table("hashtable", "Instructions for hash functions", "hashes", "INSTRUCTION IN ('rol', 'ror', 'shl', 'crc32')"),
+        instruction_percentage_table("tableendian", "Instructions for endianness conversion", "bswap-intrinsics", "INSTRUCTION IN ('lock xchg', 'rol', 'ror', 'bswap')"),
+        instruction_percentage_table("timingtable", "Instructions for timing", "timer-instructions", "INSTRUCTION IN ('rdtsc', 'rdtscp', 'cpuid')"),
+        instruction_percentage_table("datatable", "Instructions to move around data", "tbl:mov", "INSTRUCTION IN ('mov', 'push', 'pop', 'pushf', 'popf')"),
+        instruction_percentage_table("featuretable", "Instructions for feature detection", "cpuid-instruction", "INSTRUCTION IN ('cpuid', 'xgetbv')"),
+        most_common_files_table(),
+        project_count_commands(),
+        # SELECT COUNT(*) / (SELECT COUNT(*)*1.0 FROM GithubProject WHERE GITHUB_NR_STARGAZERS > 1000) FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS > 1000
+        query_command('mloc', 'SELECT SUM(CLOC_LOC_H+CLOC_LOC_C)/1000000 FROM GithubProject;', '% total LOC of .c and .h files'),
+        query_command('nrProjects', 'SELECT COUNT(*) FROM GithubProject;', '% total number of projects'),
+        query_command('nrUniqueInstructions', 'SELECT COUNT(*) FROM InstructionFrequencies WHERE percentage > 0', '% total number of unique instructions'),
+        query_command('githubStarsPopularity', 'SELECT ' + checked_down_to_stars, '% checked down to # stars'),
+        query_command('nrSelectedProjectsByPopularity', 'SELECT COUNT(*) FROM GithubProject WHERE GithubProject.GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars, '% checked projects by popularity'),
+        query_command('nrSelectedProjectsByDomain', 'SELECT COUNT(*) FROM GithubProject WHERE GithubProject.GITHUB_NR_STARGAZERS < ' + checked_down_to_stars, '% checked projects by domain'),
+
+        report.text('\n%############ statistics about checked projects\n'),
+        query_command('nrCheckedProjects', 'SELECT COUNT(*) FROM GithubProjectCompletelyAnalyzed', '% number of projects where we checked the usage of inline assembly'),
+        query_command('percentageCheckedProjects', 'SELECT COUNT(*) * 100.00 / (SELECT COUNT(*) FROM GithubProject) FROM GithubProjectCompletelyAnalyzed', '% percentage of all projects where we checked the usage of inline assembly', percentage=True),
+        query_command('nrProjectsWithInlineAssembly', 'SELECT COUNT(*) FROM GithubProjectWithInlineAsm', '% number of projects projects that use inline assembly'),
+        query_command('nrCheckedProjectsWithInlineAssembly', 'SELECT COUNT(*) - ((SELECT COUNT(*) FROM GithubProjectNotCompletelyAnalyzed)) FROM GithubProjectWithInlineAsm', '% number of checked projects (i.e., excluding those where we did not analyze the single instruction sequences) that use inline assembly'),
+        query_command('percentageProjectsWithInlineAsm', 'SELECT COUNT(*)*100.00 / (SELECT COUNT(*) FROM GithubProject) FROM GithubProjectWithInlineAsm', '% percentage of projects that contain one or more inline assembly sequences', percentage=True),
+        query_command('percentageCheckedProjectsWithInlineAsm', 'SELECT 100-COUNT(*)*100.00 / (SELECT COUNT(*) FROM GithubProjectWithInlineAsm) FROM GithubProjectNotCompletelyAnalyzed', '% percentage of checked projects of projects that have inline assembly sequences (checked + unchecked)', percentage=True),
+        query_command('percentageProjectsWithInlineAssemblyByPopularity', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars +') FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars, '% percentage of popular projects that use inline assembly', percentage=True),
+        query_command('percentageProjectsWithInlineAssemblyByOther', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars +') FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars, '% percentage of other projects that use inline assembly', percentage=True),
+        query_command('AverageKLinesCodeByPopularity', 'SELECT cast((SUM(CLOC_LOC_C)+SUM(CLOC_LOC_H) * 1.0) / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars + ') / 1000 as int) FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars, '% average lines of code with the popularity gathering strategy'),
+        query_command('AverageKLinesCodeByOther', 'SELECT cast((SUM(CLOC_LOC_C)+SUM(CLOC_LOC_H) * 1.0) / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars + ') / 1000 as int) FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS <' + checked_down_to_stars, '% average lines of code with the other gathering strategy'),
+
+        report.text('\n%############ statistics about unchecked projects\n'),
+        query_command('numberProjectsNotAnalyzed', 'SELECT COUNT(*) FROM GithubProjectNotCompletelyAnalyzed', '% number of projects that we did not analyze because the contained too large/many inline assembly snippets (or we yet have to analyze)'),
+        query_command('percentageProjectsNotAnalyzed', 'SELECT COUNT(*) * 100.00 / (SELECT COUNT(*) FROM GithubProject) FROM GithubProjectNotCompletelyAnalyzed', '% percentage of all projects where we did NOT check the usage of inline assembly (but which contain inline assembly)', percentage=True),
+        query_command('percentageUncheckedProjectsWithInlineAsm', 'SELECT COUNT(*)*100.00 / (SELECT COUNT(*) FROM GithubProjectWithInlineAsm) FROM GithubProjectNotCompletelyAnalyzed', '% percentage of unchecked projects that have inline assembly sequences (checked + unchecked)', percentage=True),
+
+        report.text('\n%############ statistics about inline assembly frequences\n'),
+        query_command('avgNrInlineAssemblySnippets', 'SELECT AVG(number) FROM (SELECT SUM(NR_OCCURRENCES) as number FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID);', '\n% average number of inline assembly snippets computed over the set of projects that use inline assembly', roundn=True),
+        query_command('medianNrInlineAssemblySnippets', 'SELECT COUNT(DISTINCT ASM_SEQUENCE_ID) as number FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID ORDER BY number LIMIT 1 OFFSET (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) / 2 FROM UniqueSequencesPerProject)', '% median number of inline assembly snippets computed over the set of projects that use inline assembly'),
+        query_command('avgNrUniqueInlineAssemblySnippets', 'SELECT avg(count) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID)', '% average number of unique inline assembly snippets computed over the set of projects that use inline assembly', roundn=True),
+        query_command('nrInlineAssemblySnippets', 'SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects;', '% total number of inline assembly snippets'),
+        query_command('inlineAssemblyFragmentInEveryKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects))/1000 FROM GithubProjectCompletelyAnalyzed;', '% inline assembly fragment in every k LOC'),
+        query_command('inlineAssemblyFragmentInEveryPopularProjectKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects, GithubProjectCompletelyAnalyzed WHERE AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID = GithubProjectCompletelyAnalyzed.ID AND GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars + '))/1000 FROM GithubProjectCompletelyAnalyzed WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars, '% inline assembly fragment in every popular k LOC'),
+        query_command('inlineAssemblyFragmentInEveryKeywordProjectKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects, GithubProjectCompletelyAnalyzed WHERE AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID = GithubProjectCompletelyAnalyzed.ID AND GITHUB_NR_STARGAZERS <' + checked_down_to_stars + '))/1000 FROM GithubProjectCompletelyAnalyzed WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars, '% inline assembly fragment in every popular k LOC'),
+        query_command('uniqueInlineAssemblyFragmentInEveryKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT COUNT(*) FROM AsmSequencesInAnalyzedGithubProjects))/1000 FROM GithubProjectCompletelyAnalyzed;', '% unique inline assembly fragment in every k LOC'),
+        query_command('nrUniqueInlineAssemblySnippets', 'SELECT COUNT(DISTINCT ASM_SEQUENCE_ID) FROM AsmSequencesInAnalyzedGithubProjects;', '% total number of unique inline assembly snippets'),
+        query_command('nrUniqueInlineAssemblySnippetsPerProject', 'SELECT SUM(count) FROM (SELECT COUNT(DISTINCT ASM_SEQUENCE_ID) as count FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID)', '% total number of unique inline assembly snippets per project'),
+        query_command('nrFileUniqueInlineAssemblySnippets', 'SELECT COUNT(ASM_SEQUENCE_ID) FROM AsmSequencesInAnalyzedGithubProjects;', '% total number of file-unique inline assembly snippets'),
+        query_command('avgNrInlineAssemblyInstructionsPerSnippet', 'SELECT AVG(number_instructions) FROM UniqueSequencesPerProject', '% average number of inline assembly snippets per instruction', roundn=True),
+        query_command('medianInlineAssemblyInstructionsPerSnippet', 'SELECT number_instructions FROM UniqueSequencesPerProject ORDER BY number_instructions LIMIT 1  OFFSET (SELECT (COUNT(*) - 1)  / 2 FROM UniqueSequencesPerProject)', '% median number of inline assembly snippets per instruction'),
+        # CREATE VIEW UniqueSequencesPerProject AS SELECT GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, number_instructions FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID, ASM_SEQUENCE_ID
+        query_command('nrInlineAssemblySnippetsWithOnlyOneInstruction', 'SELECT COUNT(*) FROM UniqueSequencesPerProject WHERE number_instructions=1', '% number of inline assembly snippets with one instruction'),
+        query_command('percentageInlineAssemblySnippetsWithOnlyOneInstruction', 'SELECT 100.0 * COUNT(*) / (SELECT COUNT(*) From UniqueSequencesPerProject) FROM UniqueSequencesPerProject WHERE number_instructions=1', '% percentage of inline assembly snippets with one instruction', percentage=True),
+        query_command('percentageInlineAssemblySnippetsWithOnlyOneOrTwoInstruction', 'SELECT 100.0 * COUNT(*) / (SELECT COUNT(*) From UniqueSequencesPerProject) FROM UniqueSequencesPerProject WHERE number_instructions<=2', '% percentage of inline assembly snippets with one or two instructions', percentage=True),
+        query_command('percentageInlineAssemblyProjectsWithOneUniqueFragment', 'SELECT 100.0 * COUNT(count) / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM UniqueSequencesPerProject) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID HAVING count = 1)', '% percentage of inline assembly projects with only one unique inline assembly fragment', percentage=True),
+        query_command('percentageInlineAssemblyProjectsWithUpToTenUniqueFragments', 'SELECT 100.0 * COUNT(count) / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM UniqueSequencesPerProject) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID HAVING count <= 10)', '% percentage of inline assembly projects with up to ten unique inline assembly fragments', percentage=True),
+        query_command('nrInstructionsLargestInlineAssemblySnippet', 'SELECT MAX(number_instructions) FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects', '% inline assembly snippet with most instructions'),
+        query_command('maxNrInlineAssemblySnippetsInProject', 'SELECT MAX(nr_snippets) FROM (SELECT SUM(NR_OCCURRENCES) as nr_snippets FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID)', '% maximum number of inline assembly snippets in a project'),
+
+        report.text('\n%############ statistics about mnemonics\n'),
+        query_command('nrProjectsWithoutMnemonics', 'SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM AsmSequencesInAnalyzedGithubProjects WHERE MNEMONIC = 0', '% total number of projects that contain non-mnemonic instructions'),
+        query_command('percentageInlineSnippetsWithoutMnemonics', 'SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) * 100.0 / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM AsmSequencesInAnalyzedGithubProjects) FROM AsmSequencesInAnalyzedGithubProjects WHERE MNEMONIC = 0', '% percentage of projects with inline assembly snippets that contain at least one non-mnemonic instruction', percentage=True),
+        query_command('percentageProjectsAfterGithubLaunch', 'SELECT (SELECT COUNT(*) FROM GithubProject WHERE GIT_FIRST_COMMIT_DATE >= 2008) * 100.0 /  COUNT(*) FROM GithubProject', '% percentage of projects whose first commit was in 2008 or later', percentage=True),
+        # SELECT AsmInstruction.ID, AsmInstruction.INSTRUCTION, (SELECT COUNT(DISTINCT AsmSequencesInGithubProject.Github_PROJECT_ID) FROM AsmSequenceInstruction, AsmSequencesInGithubProject WHERE AsmSequenceInstruction.ASM_INSTRUCTION_ID = AsmInstruction.ID AND AsmSequencesInGithubProject.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID) FROM AsmInstruction;
+        # SELECT * FROM AsmSequenceInstruction WHERE AsmSequenceInstruction.ASM_INSTRUCTION_ID = 9
+        # SELECT COUNT(DISTINCT AsmSequencesInGithubProject.Github_PROJECT_ID) FROM AsmSequenceInstruction, AsmSequencesInGithubProject WHERE AsmSequenceInstruction.ASM_INSTRUCTION_ID = 7 AND AsmSequencesInGithubProject.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID
+
+        report.text('\n%########### statistics about instruction groups\n'),
+    ]
+    units.append(instruction_group_commands())
+
+    units += [
+        report.text('\n%########## statistics about macro assembly\n'),
+        query_command('nrProjectsWithMacroAssembly', 'SELECT COUNT(*) FROM GithubProject WHERE CLOC_LOC_ASSEMBLY > 0', '% total number of projects that contain macro assembler instructions'),
+        query_command('percentageProjectsWithMacroAssembly', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) From GithubProject) FROM GithubProject WHERE CLOC_LOC_ASSEMBLY > 0', '% percentage of projects with macro assembler instructions (projects with .S files)', percentage=True),
+        query_command('avgLocMacroAssembly', 'SELECT SUM(CLOC_LOC_ASSEMBLY) * 1.0 / (SELECT COUNT(*) From GithubProject) FROM GithubProject WHERE CLOC_LOC_ASSEMBLY > 0', '% avg number of macro assembly LOC in projects that use macro assembly', roundn=True),
+        query_command('percentageProjectsWithMacroAssemblyInlineAssemblyProjects', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) From GithubProjectWithInlineAsm) FROM GithubProjectWithInlineAsm WHERE CLOC_LOC_ASSEMBLY > 0', '% percentage of projects with inline assembler that also contain macro assembler instructions', percentage=True),
+
+        report.text('\n%########## implementation\n'),
+    ]
+    units.append(implementation_commands())
+    # SELECT INSTRUCTION, COUNT(GITHUB_PROJECT_ID) as count FROM AsmInstructionsInAnalyzedGithubProjects WHERE GITHUB_PROJECT_ID IN (SELECT GITHUB_PROJECT_ID FROM AsmInstructionsInAnalyzedGithubProjects WHERE INSTRUCTION NOT IN ('rdtsc', 'rdtscp', 'cpuid', 'xgetbv', '', 'prefetch', 'nop', 'int $0x03', 'pause', 'mfence', 'sfence', 'lfence', 'bsr', 'bsf', 'or', 'and', 'xor', 'neg', 'bswap', 'shl', 'rol', 'ror', 'shr', 'lock xchg', 'lock cmpxchg', 'lock xadd', 'crc32', 'mov') GROUP BY GITHUB_PROJECT_ID HAVING COUNT(ASM_INSTRUCTION_ID) =1) GROUP BY INSTRUCTION ORDER BY count DESC
+    return units
 
-def create_scatter_plot_data(output_dir):
-    sys.stdout = open(output_dir + '/scatterplot_git_commits.csv', 'w+')
-    print('nr_commits;nr_inline_snippets')
-    for row in c.execute('SELECT GIT_NR_COMMITS, SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
-        print('%d;%d' % row)
-    sys.stdout.close()
-
-    sys.stdout = open(output_dir + '/scatterplot_git_nr_committers.csv', 'w+')
-    print('nr_commiters;nr_inline_snippets')
-    for row in c.execute('SELECT GIT_NR_COMMITTERS, SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
-        print('%d;%d' % row)
-    sys.stdout.close()
-
-    sys.stdout = open(output_dir + '/scatterplot_git_stargazers.csv', 'w+')
-    print('github_stargazers;nr_inline_snippets')
-    for row in c.execute('SELECT GITHUB_NR_STARGAZERS, SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
-        print('%d;%d' % row)
-    sys.stdout.close()
-
-    sys.stdout = open(output_dir + '/scatterplot_first_commit_date.csv', 'w+')
-    print('first_commit_date;nr_inline_snippets')
-    for row in c.execute('SELECT GIT_FIRST_COMMIT_DATE, SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
-        print('%s;%d' % row)
-    sys.stdout.close()
-
-    sys.stdout = open(output_dir + '/scatterplot_macro_assembly.csv', 'w+')
-    print('macro_assembly_loc;nr_inline_snippets')
-    for row in c.execute('SELECT CLOC_LOC_ASSEMBLY, SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
-        print('%s;%d' % row)
-    sys.stdout.close()
-
-    sys.stdout = open(output_dir + '/scatterplot_github_nr_forks.csv', 'w+')
-    print('github_nr_forks;nr_inline_snippets')
-    for row in c.execute('SELECT GITHUB_NR_FORKS, SUM(NR_OCCURRENCES) AS nr FROM GithubProjectCompletelyAnalyzed, AsmSequencesInAnalyzedGithubProjects WHERE GithubProjectCompletelyAnalyzed.ID = AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID GROUP BY GITHUB_PROJECT_ID'):
-        print('%s;%d' % row)
-    sys.stdout.close()
-
-def show_stats(output_dir):
+def show_stats(session, output_dir, extra_metrics=[], backend='latex', use_cache=True, timings_file=None):
+    """ Writes the report (commands.tex, or commands.md/commands.json with the markdown/json backend), the scatter plot data,
+        and the cumulative distributions to output_dir. Report units whose tables did not change since the last run are
+        taken from the report cache. If timings_file is given, the seconds that each computed unit took are written to it.
+        If output_dir is None, the queries run without writing files (see explain_stats). """
     #print("Instruction count over all projects and sequences:")
     #for row in c.execute('SELECT AsmInstruction.ID, AsmInstruction.INSTRUCTION, SUM(AsmSequencesInGithubProject.NR_OCCURRENCES) total_count FROM AsmSequenceInstruction, AsmInstruction, AsmSequencesInGithubProject WHERE AsmInstruction.ID = AsmSequenceInstruction.ASM_INSTRUCTION_ID AND AsmSequencesInGithubProject.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID GROUP BY AsmInstruction.INSTRUCTION, AsmInstruction.ID ORDER BY total_count DESC'):
     #    print("{:<20} {:<10}".format(row[1], row[2]))
     #    print("'%s' \t %d" % (row[1], row[2]))
 
+    import profiler
+    import report
     print("Number of times an instruction is contained in different projects:")
-    for row in c.execute('SELECT * FROM InlineAssemblyInstructionsInProjects ORDER BY count desc;'):
-        print("{:<20} {:<10}".format(row[1], row[2]))
+    with profiler.phase('instruction frequencies'):
+        for row in session.cursor.execute('SELECT * FROM InlineAssemblyInstructionsInProjects ORDER BY count desc;'):
+            print("{:<20} {:<10}".format(row[1], row[2]))
 
     #max_commits = c.execute('SELECT MAX(GIT_NR_COMMITS) FROM GithubProjectWithInlineAsm').fetchone()[0]
     #nr_buckets = 20
@@ -580,372 +1146,728 @@ def show_stats(output_dir):
     #    print(str(lower) + ";" + str(upper) + ";" + str(count))
     #sys.stdout.close()
 
-    create_scatter_plot_data(output_dir)
-
-    sys.stdout = open(output_dir + '/commands.tex', 'w+')
-    print_instruction_table()
-    print_mnemonic_table()
-    print_domain_table()
-    print_lock_table()
-    print_set_byte_table()
-    print_control_flow_table()
-    print_rep_table()
-    print_arithmetic_table()
-    print_fence_table()
-    print_hash_table()
-    print_endianness_table()
-    print_timing_table()
-    print_move_data_table()
-    print_feature_detection_table()
-    print_most_common_files_table()
-
-    print('% how often an instruction appears in different projects')
-    for row in c.execute('SELECT * FROM InlineAssemblyInstructionsInProjects ORDER BY count desc;'):
-        instr_name = row[1].replace(' ', '')
-        replacements = {
-            '' : 'noInstr', # compiler/memory barrier
-            '#' : 'comment', # asm comment
-            'int$0x03' : 'intdebug', # debug interrupt
-            'int$0x80' : 'intsystemcall', # system call interrupt
-            'crc32' : 'crc',
-            'cvtsd2si' : 'cvtsdtosi',
-            'ud2' : 'ud',
-            '<name>' : 'declarativeName',
-            '<register>' : 'register'
-        }
-        instr_name = replacements.get(instr_name, instr_name)
-        print_as_command(instr_name + 'ProjectCount', row[2])
-    # SELECT COUNT(*) / (SELECT COUNT(*)*1.0 FROM GithubProject WHERE GITHUB_NR_STARGAZERS > 1000) FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS > 1000
-    print('% total LOC of .c and .h files')
-    print_query_as_command('mloc', 'SELECT SUM(CLOC_LOC_H+CLOC_LOC_C)/1000000 FROM GithubProject;')
-    print('% total number of projects')
-    print_query_as_command('nrProjects', 'SELECT COUNT(*) FROM GithubProject;')#
-    print('% total number of unique instructions')
-    print_query_as_command('nrUniqueInstructions', 'SELECT COUNT(*) FROM InstructionFrequencies WHERE percentage > 0')
-    checked_down_to_stars = '850'
-    print('% checked down to # stars')
-    print_query_as_command('githubStarsPopularity', 'SELECT ' + checked_down_to_stars)
-    print('% checked projects by popularity')
-    print_query_as_command('nrSelectedProjectsByPopularity', 'SELECT COUNT(*) FROM GithubProject WHERE GithubProject.GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars)
-    print('% checked projects by domain')
-    print_query_as_command('nrSelectedProjectsByDomain', 'SELECT COUNT(*) FROM GithubProject WHERE GithubProject.GITHUB_NR_STARGAZERS < ' + checked_down_to_stars)
-
-    print('\n%############ statistics about checked projects')
-    print('% number of projects where we checked the usage of inline assembly')
-    print_query_as_command('nrCheckedProjects', 'SELECT COUNT(*) FROM GithubProjectCompletelyAnalyzed')
-    print('% percentage of all projects where we checked the usage of inline assembly')
-    print_query_as_command('percentageCheckedProjects', 'SELECT COUNT(*) * 100.00 / (SELECT COUNT(*) FROM GithubProject) FROM GithubProjectCompletelyAnalyzed', percentage=True)
-    print('% number of projects projects that use inline assembly')
-    print_query_as_command('nrProjectsWithInlineAssembly', 'SELECT COUNT(*) FROM GithubProjectWithInlineAsm')
-    print('% number of checked projects (i.e., excluding those where we did not analyze the single instruction sequences) that use inline assembly')
-    print_query_as_command('nrCheckedProjectsWithInlineAssembly', 'SELECT COUNT(*) - ((SELECT COUNT(*) FROM GithubProjectNotCompletelyAnalyzed)) FROM GithubProjectWithInlineAsm')
-    print('% percentage of projects that contain one or more inline assembly sequences')
-    print_query_as_command('percentageProjectsWithInlineAsm', 'SELECT COUNT(*)*100.00 / (SELECT COUNT(*) FROM GithubProject) FROM GithubProjectWithInlineAsm', percentage=True)
-    print('% percentage of checked projects of projects that have inline assembly sequences (checked + unchecked)')
-    print_query_as_command('percentageCheckedProjectsWithInlineAsm', 'SELECT 100-COUNT(*)*100.00 / (SELECT COUNT(*) FROM GithubProjectWithInlineAsm) FROM GithubProjectNotCompletelyAnalyzed', percentage=True)
-    print('% percentage of popular projects that use inline assembly')
-    print_query_as_command('percentageProjectsWithInlineAssemblyByPopularity', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars +') FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars, percentage=True)
-    print('% percentage of other projects that use inline assembly')
-    print_query_as_command('percentageProjectsWithInlineAssemblyByOther', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars +') FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars, percentage=True)
-    print('% average lines of code with the popularity gathering strategy')
-    print_query_as_command('AverageKLinesCodeByPopularity', 'SELECT cast((SUM(CLOC_LOC_C)+SUM(CLOC_LOC_H) * 1.0) / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars + ') / 1000 as int) FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars)
-    print('% average lines of code with the other gathering strategy')
-    print_query_as_command('AverageKLinesCodeByOther', 'SELECT cast((SUM(CLOC_LOC_C)+SUM(CLOC_LOC_H) * 1.0) / (SELECT COUNT(*) FROM GithubProject WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars + ') / 1000 as int) FROM GithubProjectWithInlineAsm WHERE GITHUB_NR_STARGAZERS <' + checked_down_to_stars)
-
-    print('\n%############ statistics about unchecked projects')
-    print('% number of projects that we did not analyze because the contained too large/many inline assembly snippets (or we yet have to analyze)')
-    print_query_as_command('numberProjectsNotAnalyzed', 'SELECT COUNT(*) FROM GithubProjectNotCompletelyAnalyzed')
-    print('% percentage of all projects where we did NOT check the usage of inline assembly (but which contain inline assembly)')
-    print_query_as_command('percentageProjectsNotAnalyzed', 'SELECT COUNT(*) * 100.00 / (SELECT COUNT(*) FROM GithubProject) FROM GithubProjectNotCompletelyAnalyzed', percentage=True)
-    print('% percentage of unchecked projects that have inline assembly sequences (checked + unchecked)')
-    print_query_as_command('percentageUncheckedProjectsWithInlineAsm', 'SELECT COUNT(*)*100.00 / (SELECT COUNT(*) FROM GithubProjectWithInlineAsm) FROM GithubProjectNotCompletelyAnalyzed', percentage=True)
-
-
-    print('\n%############ statistics about inline assembly frequences')
-    print('\n% average number of inline assembly snippets computed over the set of projects that use inline assembly')
-    print_query_as_command('avgNrInlineAssemblySnippets', 'SELECT AVG(number) FROM (SELECT SUM(NR_OCCURRENCES) as number FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID);', roundn=True)
-    print('% median number of inline assembly snippets computed over the set of projects that use inline assembly')
-    print_query_as_command('medianNrInlineAssemblySnippets', 'SELECT COUNT(DISTINCT ASM_SEQUENCE_ID) as number FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID ORDER BY number LIMIT 1 OFFSET (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) / 2 FROM UniqueSequencesPerProject)')
-    print('% average number of unique inline assembly snippets computed over the set of projects that use inline assembly')
-    print_query_as_command('avgNrUniqueInlineAssemblySnippets', 'SELECT avg(count) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID)', roundn=True)
-    print('% total number of inline assembly snippets')
-    print_query_as_command('nrInlineAssemblySnippets', 'SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects;')
-    print('% inline assembly fragment in every k LOC')
-    print_query_as_command('inlineAssemblyFragmentInEveryKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects))/1000 FROM GithubProjectCompletelyAnalyzed;')
-    print('% inline assembly fragment in every popular k LOC')
-    print_query_as_command('inlineAssemblyFragmentInEveryPopularProjectKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects, GithubProjectCompletelyAnalyzed WHERE AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID = GithubProjectCompletelyAnalyzed.ID AND GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars + '))/1000 FROM GithubProjectCompletelyAnalyzed WHERE GITHUB_NR_STARGAZERS >= ' + checked_down_to_stars)
-    print('% inline assembly fragment in every popular k LOC')
-    print_query_as_command('inlineAssemblyFragmentInEveryKeywordProjectKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT SUM(NR_OCCURRENCES) FROM AsmSequencesInAnalyzedGithubProjects, GithubProjectCompletelyAnalyzed WHERE AsmSequencesInAnalyzedGithubProjects.GITHUB_PROJECT_ID = GithubProjectCompletelyAnalyzed.ID AND GITHUB_NR_STARGAZERS <' + checked_down_to_stars + '))/1000 FROM GithubProjectCompletelyAnalyzed WHERE GITHUB_NR_STARGAZERS < ' + checked_down_to_stars)
-    print('% unique inline assembly fragment in every k LOC')
-    print_query_as_command('uniqueInlineAssemblyFragmentInEveryKLoc', 'SELECT (SUM(CLOC_LOC_H+CLOC_LOC_C)/(SELECT COUNT(*) FROM AsmSequencesInAnalyzedGithubProjects))/1000 FROM GithubProjectCompletelyAnalyzed;')
-    print('% total number of unique inline assembly snippets')
-    print_query_as_command('nrUniqueInlineAssemblySnippets', 'SELECT COUNT(DISTINCT ASM_SEQUENCE_ID) FROM AsmSequencesInAnalyzedGithubProjects;')
-    print('% total number of unique inline assembly snippets per project')
-    print_query_as_command('nrUniqueInlineAssemblySnippetsPerProject', 'SELECT SUM(count) FROM (SELECT COUNT(DISTINCT ASM_SEQUENCE_ID) as count FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID)')
-    print('% total number of file-unique inline assembly snippets')
-    print_query_as_command('nrFileUniqueInlineAssemblySnippets', 'SELECT COUNT(ASM_SEQUENCE_ID) FROM AsmSequencesInAnalyzedGithubProjects;')
-    print('% average number of inline assembly snippets per instruction')
-    print_query_as_command('avgNrInlineAssemblyInstructionsPerSnippet', 'SELECT AVG(number_instructions) FROM UniqueSequencesPerProject', roundn=True)
-    print('% median number of inline assembly snippets per instruction')
-    print_query_as_command('medianInlineAssemblyInstructionsPerSnippet', 'SELECT number_instructions FROM UniqueSequencesPerProject ORDER BY number_instructions LIMIT 1  OFFSET (SELECT (COUNT(*) - 1)  / 2 FROM UniqueSequencesPerProject)')
-    print('% number of inline assembly snippets with one instruction')
-    # CREATE VIEW UniqueSequencesPerProject AS SELECT GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, number_instructions FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID, ASM_SEQUENCE_ID
-    print_query_as_command('nrInlineAssemblySnippetsWithOnlyOneInstruction', 'SELECT COUNT(*) FROM UniqueSequencesPerProject WHERE number_instructions=1')
-    print('% percentage of inline assembly snippets with one instruction')
-    print_query_as_command('percentageInlineAssemblySnippetsWithOnlyOneInstruction', 'SELECT 100.0 * COUNT(*) / (SELECT COUNT(*) From UniqueSequencesPerProject) FROM UniqueSequencesPerProject WHERE number_instructions=1', percentage=True)
-    print('% percentage of inline assembly snippets with one or two instructions')
-    print_query_as_command('percentageInlineAssemblySnippetsWithOnlyOneOrTwoInstruction', 'SELECT 100.0 * COUNT(*) / (SELECT COUNT(*) From UniqueSequencesPerProject) FROM UniqueSequencesPerProject WHERE number_instructions<=2', percentage=True)
-    print('% percentage of inline assembly projects with only one unique inline assembly fragment')
-    print_query_as_command('percentageInlineAssemblyProjectsWithOneUniqueFragment', 'SELECT 100.0 * COUNT(count) / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM UniqueSequencesPerProject) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID HAVING count = 1)', percentage=True)
-    print('% percentage of inline assembly projects with up to ten unique inline assembly fragments')
-    print_query_as_command('percentageInlineAssemblyProjectsWithUpToTenUniqueFragments', 'SELECT 100.0 * COUNT(count) / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM UniqueSequencesPerProject) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID HAVING count <= 10)', percentage=True)
-    print('% inline assembly snippet with most instructions')
-    print_query_as_command('nrInstructionsLargestInlineAssemblySnippet', 'SELECT MAX(number_instructions) FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects')
-    print('% maximum number of inline assembly snippets in a project')
-    print_query_as_command('maxNrInlineAssemblySnippetsInProject', 'SELECT MAX(nr_snippets) FROM (SELECT SUM(NR_OCCURRENCES) as nr_snippets FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID)')
-
-
-    print('\n%############ statistics about mnemonics')
-    print('% total number of projects that contain non-mnemonic instructions')
-    print_query_as_command('nrProjectsWithoutMnemonics', 'SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM AsmSequencesInAnalyzedGithubProjects WHERE MNEMONIC = 0')
-    print('% percentage of projects with inline assembly snippets that contain at least one non-mnemonic instruction')
-    print_query_as_command('percentageInlineSnippetsWithoutMnemonics', 'SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) * 100.0 / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM AsmSequencesInAnalyzedGithubProjects) FROM AsmSequencesInAnalyzedGithubProjects WHERE MNEMONIC = 0', percentage=True)
-    print('% percentage of projects whose first commit was in 2008 or later')
-    print_query_as_command('percentageProjectsAfterGithubLaunch', 'SELECT (SELECT COUNT(*) FROM GithubProject WHERE GIT_FIRST_COMMIT_DATE >= 2008) * 100.0 /  COUNT(*) FROM GithubProject', percentage=True)
-    # SELECT AsmInstruction.ID, AsmInstruction.INSTRUCTION, (SELECT COUNT(DISTINCT AsmSequencesInGithubProject.Github_PROJECT_ID) FROM AsmSequenceInstruction, AsmSequencesInGithubProject WHERE AsmSequenceInstruction.ASM_INSTRUCTION_ID = AsmInstruction.ID AND AsmSequencesInGithubProject.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID) FROM AsmInstruction;
-    # SELECT * FROM AsmSequenceInstruction WHERE AsmSequenceInstruction.ASM_INSTRUCTION_ID = 9
-    # SELECT COUNT(DISTINCT AsmSequencesInGithubProject.Github_PROJECT_ID) FROM AsmSequenceInstruction, AsmSequencesInGithubProject WHERE AsmSequenceInstruction.ASM_INSTRUCTION_ID = 7 AND AsmSequencesInGithubProject.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID
-
-
-    print('\n%########### statistics about instruction groups')
-    query = "SELECT 100.0 * COUNT(DISTINCT AsmSequencesInAnalyzedGithubProjects.Github_PROJECT_ID) / (SELECT COUNT(*) FROM GithubProjectWithCheckedInlineAsm) FROM AsmSequencesInAnalyzedGithubProjects, AsmInstruction, AsmSequenceInstruction WHERE AsmSequencesInAnalyzedGithubProjects.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID AND AsmSequenceInstruction.ASM_INSTRUCTION_ID = AsmInstruction.ID AND (AsmInstruction.INSTRUCTION %s)"
-    print_query_as_command('percentageProjectsWithControlFlowInstructions', query % 'LIKE "j%" OR AsmInstruction.INSTRUCTION IN ("cmp", "test")', percentage=True)
-    print_query_as_command('percentageProjectsWithFenceInstructions', query % "IN ('mfence', 'lfence', 'sfence')", percentage=True)
-    print_query_as_command('percentageBitScanInstructions', query % "IN ('bsr', 'bsf')", percentage=True)
-    print_query_as_command('percentageHashInstructions', query % "IN ('rol', 'ror', 'shl', 'crc32')", percentage=True)
-    print_query_as_command('percentageProjectsWithTimeInstructions', query % "IN ('cpuid', 'rdtsc', '')", percentage=True)
-    print_query_as_command('percentageProjectsWithAtomicInstructions', query % "LIKE 'lock%'", percentage=True)
-    print_query_as_command('percentageProjectsWithArithmeticInstructions', query % "IN ('xor', 'add', 'or', 'sub', 'and', 'inc', 'dec', 'mul', 'adc', 'dec', 'neg', 'lea')", percentage=True)
-    print_query_as_command('percentageProjectsWithPauseInstructions', query % "LIKE 'pause'", percentage=True)
-    print_query_as_command('percentageProjectsWithCompilerBarriers', query % "LIKE ''", percentage=True)
-    print_query_as_command('percentageProjectsWithEndiannessInstructions', query % "IN ('lock xchg', 'rol', 'ror', 'bswap')", percentage=True)
-    print_query_as_command('percentageProjectsWithPrefetch', query % "LIKE 'prefetch'", percentage=True)
-    print_query_as_command('percentageProjectsWithRandomNumber', query % "LIKE 'rdrand'", percentage=True)
-    print_query_as_command('percentageProjectsWithNop', query % "LIKE 'nop'", percentage=True)
-    print_query_as_command('percentageProjectsWithSet', query % "LIKE 'set%'", percentage=True)
-    print_query_as_command('percentageProjectsWithRep', query % "LIKE 'rep%' OR AsmInstruction.INSTRUCTION like 'cld'", percentage=True)
-    print_query_as_command('percentageProjectsWithFeatureDetection', query % "IN ('cpuid', 'xgetbv')", percentage=True)
-    print_query_as_command('percentageProjectsWithAES', query % "IN ('aesdec', 'aesdeclast', 'aesenc', 'aesenclast', 'aesimc', 'aeskeygena')", percentage=True)
-    print_query_as_command('percentageProjectsWithDebugInterrupt', query % "IS 'int $0x03'", percentage=True)
-    print_query_as_command('percentageProjectsWithSIMD', query % "IN ('pxor', 'movdqa', 'movdqu', 'psrlq', 'pclmulqdq', 'pshufd', 'pslldq', 'pslldq', 'psllq', 'psrldq')", percentage=True)
-    print_query_as_command('percentageProjectsWithMoves', query % "IN ('mov', 'push', 'pop', 'pushf', 'popf')", percentage=True)
-
-
-    print('\n%########## statistics about macro assembly')
-    print('% total number of projects that contain macro assembler instructions')
-    print_query_as_command('nrProjectsWithMacroAssembly', 'SELECT COUNT(*) FROM GithubProject WHERE CLOC_LOC_ASSEMBLY > 0')
-    print('% percentage of projects with macro assembler instructions (projects with .S files)')
-    print_query_as_command('percentageProjectsWithMacroAssembly', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) From GithubProject) FROM GithubProject WHERE CLOC_LOC_ASSEMBLY > 0', percentage=True)
-    print('% avg number of macro assembly LOC in projects that use macro assembly')
-    print_query_as_command('avgLocMacroAssembly', 'SELECT SUM(CLOC_LOC_ASSEMBLY) * 1.0 / (SELECT COUNT(*) From GithubProject) FROM GithubProject WHERE CLOC_LOC_ASSEMBLY > 0', roundn=True)
-    print('% percentage of projects with inline assembler that also contain macro assembler instructions')
-    print_query_as_command('percentageProjectsWithMacroAssemblyInlineAssemblyProjects', 'SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) From GithubProjectWithInlineAsm) FROM GithubProjectWithInlineAsm WHERE CLOC_LOC_ASSEMBLY > 0', percentage=True)
-    
-    print('\n%########## implementation')
-    query = 'SELECT 100-COUNT(DISTINCT GITHUB_PROJECT_ID) * 100.0 / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM AsmInstructionsInAnalyzedGithubProjects) FROM AsmInstructionsInAnalyzedGithubProjects WHERE INSTRUCTION NOT IN (%s)'
-    def make_list(name):
-        print('%', (','.join('"' + instr + '"' for instr in instructions)))
-        q = query % (','.join('"' + instr + '"' for instr in instructions))
-        print_query_as_command(name, q, percentage=True)
-    instructions = ()
-    make_list('percentageNoInstructionImplemented')
-    instructions = instructions + ('rdtsc', 'rdtscp')
-    make_list('percentageTimeInstructionsImplemented')
-    instructions = instructions + ('cpuid', 'xgetbv')
-    make_list('percentageFeatureInstructionsImplemented')
-    instructions = instructions + ('', 'prefetch', 'nop', 'int $0x03', 'pause', 'mfence', 'sfence', 'lfence', 'ud2')
-    make_list('percentageBarrierInstructionsImplemented')
-    instructions = instructions + ('bsr', 'bsf', 'or', 'xor', 'neg', 'bswap', 'shl', 'rol', 'ror')
-    make_list('percentageByteManipulationInstructionsImplemented')
-    instructions = instructions + ('lock xchg', 'lock cmpxchg', 'lock xadd', 'lock add', 'lock dec', 'lock inc')#('lock xchg', 'lock cmpxchg', 'lock xadd', 'lock add', 'lock dec', 'lock inc', 'lock xor', 'lock neg', 'lock btc', 'lock btr')
-    make_list('percentageLockInstructionsImplemented')
-    instructions = instructions + ('mov', 'push', 'pop')
-    make_list('percentageMovInstructionsImplemented')
-    instructions = instructions + ('crc32',)
-    make_list('percentageCrcInstructionsImplemented')
-    instructions = instructions + ('setz', 'setc', 'setnz', 'stc')
-    make_list('percentageSetInstructionsImplemented')
-    instructions = instructions + ('add', 'sub', 'mul', 'adc', 'lea', 'inc', 'dec', 'div', 'imul', 'sbb')
-    make_list('percentageArithmeticInstructionsImplemented')
-    instructions = instructions + ('rdrand',)
-    make_list('rdrandInstructionsImplemented')
-    instructions = instructions + ('jmp', 'jnc') #%, 'test', 'jz', 'jnz', 'jl', 'ja', 'jbe', 'je', 'jne', 'jb', 'jnc')
-    make_list('percentageControlFlowInstructionsImplemented')
-    instructions = instructions + ('rep movs', )
-    make_list('percentageStringInstructionsImplemented')
-    print_query_as_command('nrImplementedInstructions', 'SELECT ' + str(len(instructions)))
-    print_query_as_command('percentageImplementedTotal', 'SELECT 100-(SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) + (SELECT COUNT(*) FROM GithubProjectNotCompletelyAnalyzed) FROM AsmInstructionsInAnalyzedGithubProjects WHERE INSTRUCTION NOT IN (%s)) * 100.0 / COUNT(*) FROM GithubProjectWithInlineAsm' % (','.join('"' + instr + '"' for instr in instructions)), percentage=True)
-
-    sys.stdout.close()
-    # SELECT INSTRUCTION, COUNT(GITHUB_PROJECT_ID) as count FROM AsmInstructionsInAnalyzedGithubProjects WHERE GITHUB_PROJECT_ID IN (SELECT GITHUB_PROJECT_ID FROM AsmInstructionsInAnalyzedGithubProjects WHERE INSTRUCTION NOT IN ('rdtsc', 'rdtscp', 'cpuid', 'xgetbv', '', 'prefetch', 'nop', 'int $0x03', 'pause', 'mfence', 'sfence', 'lfence', 'bsr', 'bsf', 'or', 'and', 'xor', 'neg', 'bswap', 'shl', 'rol', 'ror', 'shr', 'lock xchg', 'lock cmpxchg', 'lock xadd', 'crc32', 'mov') GROUP BY GITHUB_PROJECT_ID HAVING COUNT(ASM_INSTRUCTION_ID) =1) GROUP BY INSTRUCTION ORDER BY count DESC
-
-    # number of unique snippets per project
-    sys.stdout = open(output_dir + '/nr_snippets.csv', 'w+')
-    print('nr_unique_snippets;percentage')
-    #max_nr_snippets = c.execute('SELECT MAX(nr_snippets) FROM (SELECT SUM(NR_OCCURRENCES) as nr_snippets FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID)').fetchone()[0]
-    max_nr_unique_snippets = c.execute('SELECT MAX(count) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID)').fetchone()[0]
-    for nr_snippets in range(1, max_nr_unique_snippets+1):
-        nr_occurrences = c.execute('SELECT 100.0 * COUNT(count) / (SELECT COUNT(DISTINCT GITHUB_PROJECT_ID) FROM UniqueSequencesPerProject) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID HAVING count <= ?)', (nr_snippets,)).fetchone()[0]
-        print(str(nr_snippets) + ';' + str(nr_occurrences))
-    sys.stdout.close()
-
-    # instruction length per snippet
-    sys.stdout = open(output_dir + '/instruction_lengths.csv', 'w+')
-    print('nr_instructions;percentage')
-    max_instructions_per_snippet = c.execute('SELECT MAX(number_instructions) FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects').fetchone()[0]
-    for nr_instructions in range(1, max_instructions_per_snippet+1):
-        nr_occurrences = c.execute('SELECT 100.0 * COUNT(*) / (SELECT COUNT(*) From UniqueSequencesPerProject) FROM UniqueSequencesPerProject WHERE number_instructions <= ?', (nr_instructions,)).fetchone()[0]
-        print(str(nr_instructions) + ';' + str(nr_occurrences))
-    sys.stdout.close()
-
-
-def add_keywords_to_project(url, keywords):
+    try:
+        with profiler.phase('materialize views'):
+            materialize_stats_views(session)
+        with profiler.phase('scatter plots'):
+            create_scatter_plot_data(session, output_dir, scatter_plot_metrics + extra_metrics)
+
+        units = report_units()
+        timings = {}
+        with profiler.phase('report'):
+            (text, nr_computed) = report.render(session.conn, units, backend, report.cache_path_for(session.database) if use_cache else None, timings)
+        if output_dir is not None:
+            with open(output_dir + '/commands' + report.extensions[backend], 'w+') as f:
+                f.write(text)
+        if timings_file is not None:
+            import json
+            with open(timings_file, 'w') as f:
+                json.dump(timings, f, indent=2)
+        print('computed %d of %d report units (the others were cached)' % (nr_computed, len([unit for unit in units if len(unit.inputs) != 0])))
+
+        # number of unique snippets per project
+        with profiler.phase('cumulative distributions'):
+            nr_snippets = cumulative_distribution(session, 'SELECT count, COUNT(*) FROM (SELECT COUNT(*) as count FROM UniqueSequencesPerProject GROUP BY GITHUB_PROJECT_ID) GROUP BY count')
+
+            # instruction length per snippet
+            max_instructions_per_snippet = session.cursor.execute('SELECT MAX(number_instructions) FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects').fetchone()[0]
+            instruction_lengths = cumulative_distribution(session, 'SELECT number_instructions, COUNT(*) FROM UniqueSequencesPerProject GROUP BY number_instructions', max_value=max_instructions_per_snippet)
+            if output_dir is not None:
+                write_cumulative_distribution(output_dir + '/nr_snippets.csv', 'nr_unique_snippets;percentage', nr_snippets)
+                write_cumulative_distribution(output_dir + '/instruction_lengths.csv', 'nr_instructions;percentage', instruction_lengths)
+    finally:
+        drop_stats_views(session)
+
+
+def add_keywords_to_project(session, url, keywords):
     keyword_tokens = keywords.split(',')
-    project_id = get_project_id(url)
+    project_id = get_project_id(session, url)
     for keyword in keyword_tokens:
-        keyword_id = insert_project_keyword(keyword)
-        existing_record = c.execute('SELECT * FROM ApplicationCategoriesPerProject WHERE ApplicationCategoryID = ? AND GithubProjectID = ?', (keyword_id, project_id))
+        keyword_id = insert_project_keyword(session, keyword)
+        existing_record = session.cursor.execute('SELECT * FROM ApplicationCategoriesPerProject WHERE ApplicationCategoryID = ? AND GithubProjectID = ?', (keyword_id, project_id))
         if project_id is not None:
-            c.execute('insert into ApplicationCategoriesPerProject(ApplicationCategoryID, GithubProjectID) VALUES(?, ?)', (keyword_id, project_id))
-    conn.commit()
-
-def insert_project_entry(dirname):
+            session.cursor.execute('insert into ApplicationCategoriesPerProject(ApplicationCategoryID, GithubProjectID) VALUES(?, ?)', (keyword_id, project_id))
+    commit(session)
+
+def read_bulk_records(file_name):
+    """ Yields (line number, record, error) for each record of a JSONL file (or of a CSV file with a header line). """
+    import csv
+    import json
+    with open(file_name, newline='') as f:
+        if file_name.endswith('.csv'):
+            for (number, row) in enumerate(csv.DictReader(f), 2):
+                yield (number, {key: value for (key, value) in row.items() if value not in (None, '')}, None)
+            return
+        for (number, line) in enumerate(f, 1):
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield (number, None, 'invalid JSON: ' + str(e))
+                continue
+            if not isinstance(record, dict):
+                yield (number, None, 'not a JSON object')
+                continue
+            yield (number, record, None)
+
+def bulk_record_type_error(record):
+    """ Returns why the fields of a bulk record have the wrong types, or None if they are valid. """
+    for field in ('project', 'file', 'instrs', 'usage_comment'):
+        if record.get(field) is not None and not isinstance(record[field], str):
+            return field + ' is not a string'
+    keywords = record.get('keywords')
+    if keywords is not None and not isinstance(keywords, str) and not (isinstance(keywords, list) and all(isinstance(keyword, str) for keyword in keywords)):
+        return 'keywords is neither a string nor a list of strings'
+    if record.get('has_fallback') is not None and not isinstance(record['has_fallback'], (int, str)):
+        return 'has_fallback is not a number'
+    return None
+
+def resolve_bulk_project(record, project_ids, directory_urls):
+    """ Returns (project ID, file relative to the project, error) of a bulk record. The project is given by its URL or,
+        as in add-project-asm-sequence, by a file path of the form projects/<project directory>/<file>. """
+    import gitmetrics
+    url = record.get('project')
+    project_file = record.get('file')
+    if project_file is not None and project_file.split(os.sep)[0] == 'projects':
+        splitted_path = project_file.split(os.sep)
+        if len(splitted_path) < 3:
+            return (None, None, 'file must be of the form projects/<project directory>/<file>')
+        if url is None:
+            if splitted_path[1] not in directory_urls:
+                directory_urls[splitted_path[1]] = gitmetrics.read_origin_url(os.path.join(project_dir, splitted_path[1]))
+            url = directory_urls[splitted_path[1]]
+        project_file = os.sep.join(splitted_path[2:])
+    if url is None:
+        return (None, None, 'no project')
+    if url not in project_ids:
+        return (None, None, 'unknown project ' + url)
+    return (project_ids[url], project_file, None)
+
+def write_bulk_rows(session, sequence_rows, fallback_rows, keyword_rows):
+    """ Inserts and commits the rows collected by bulk_import and empties the lists. Rows without HAS_FALLBACK keep the column default. """
+    session.cursor.executemany('insert into AsmSequencesInGithubProjectUnfiltered(IN_FILE, GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, USAGE_COMMENT) VALUES(?, ?, ?, ?)', sequence_rows)
+    session.cursor.executemany('insert into AsmSequencesInGithubProjectUnfiltered(IN_FILE, GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, USAGE_COMMENT, HAS_FALLBACK) VALUES(?, ?, ?, ?, ?)', fallback_rows)
+    session.cursor.executemany('insert into ApplicationCategoriesPerProject(ApplicationCategoryID, GithubProjectID) VALUES(?, ?)', keyword_rows)
+    commit(session)
+    del sequence_rows[:]
+    del fallback_rows[:]
+    del keyword_rows[:]
+
+def bulk_import(session, file_name, batch_size=10000):
+    """ Imports annotations from a JSONL or CSV file. Each record has a project (Github URL, see resolve_bulk_project) and
+        sequences in files (file, instrs, and optionally usage_comment and has_fallback) and/or keywords (comma-separated or a list).
+        Rows are inserted in batches of batch_size. Invalid records are reported and skipped. """
+    project_ids = dict(session.cursor.execute('SELECT GITHUB_URL, ID FROM GithubProjectUnfiltered'))
+    directory_urls = {}
+    keyword_ids = dict(session.cursor.execute('SELECT NAME, ID FROM ApplicationCategory'))
+    project_keywords = set(session.cursor.execute('SELECT ApplicationCategoryID, GithubProjectID FROM ApplicationCategoriesPerProject'))
+    sequence_rows = []
+    fallback_rows = []
+    keyword_rows = []
+    nr_records = 0
+    nr_errors = 0
+    for (number, record, error) in read_bulk_records(file_name):
+        nr_records += 1
+        if error is None:
+            error = bulk_record_type_error(record)
+        if error is None:
+            (project_id, project_file, error) = resolve_bulk_project(record, project_ids, directory_urls)
+        if error is None and record.get('instrs') is None and record.get('keywords') is None:
+            error = 'neither instrs nor keywords'
+        if error is None and record.get('instrs') is not None:
+            instr_list = record['instrs'].replace(',', ';').split(';')
+            reasons = [reason for reason in map(invalid_instruction_reason, instr_list) if reason is not None]
+            if project_file is None:
+                error = 'instrs without file'
+            elif len(reasons) != 0:
+                error = reasons[0].replace('\n', ' ')
+        if error is not None:
+            nr_errors += 1
+            print('%s:%d: %s' % (file_name, number, error))
+            continue
+        if record.get('instrs') is not None:
+            sequence_id = intern_sequence(session, record['instrs'], instr_list)
+            if record.get('has_fallback') is None:
+                sequence_rows.append((project_file, project_id, sequence_id, record.get('usage_comment')))
+            else:
+                fallback_rows.append((project_file, project_id, sequence_id, record.get('usage_comment'), record['has_fallback']))
+        keywords = record.get('keywords')
+        if keywords is not None:
+            for keyword in (keywords.split(',') if isinstance(keywords, str) else keywords):
+                if keyword not in keyword_ids:
+                    session.cursor.execute('insert into ApplicationCategory(NAME) VALUES (?)', (keyword, ))
+                    keyword_ids[keyword] = session.cursor.lastrowid
+                if (keyword_ids[keyword], project_id) not in project_keywords:
+                    project_keywords.add((keyword_ids[keyword], project_id))
+                    keyword_rows.append((keyword_ids[keyword], project_id))
+        if len(sequence_rows) + len(fallback_rows) + len(keyword_rows) >= batch_size:
+            write_bulk_rows(session, sequence_rows, fallback_rows, keyword_rows)
+    write_bulk_rows(session, sequence_rows, fallback_rows, keyword_rows)
+    print('imported %d of %d records (%d errors)' % (nr_records - nr_errors, nr_records, nr_errors))
+
+def insert_project_entry(session, dirname):
+    """ Inserts the project entry of a project directory and returns the inline assembly hits found while counting its lines of code. """
+    import profiler
+    with profiler.phase(dirname, 'project'):
+        (entry, hits) = collect_project_entry(session, dirname)
+        store_project_entry(session, entry)
+    return hits
+
+def collect_project_entry(session, dirname, scan_jobs=None):
+    """ Gathers the git, LOC, and Github information of a project directory. Returns a GithubProjectUnfiltered row and the inline assembly hits of the project. """
+    import datetime
+    import github_cache
+    import gitmetrics
+    import profiler
+    import scanner
     if not os.path.isdir(dirname):
-        print(dirname + " is not a directory!")
-        exit(-1)
+        raise InputError(dirname + " is not a directory!")
     dirs = dirname.rstrip(os.sep).split(os.sep)
-    github_url = get_git_url(dirname)
-    commit_count = get_git_commit_count(dirname)
-    committers_count = get_git_commiter_count(dirname)
-    (first_date, last_date) = get_first_last_commit_date(dirname)
+    with profiler.phase('git metrics'):
+        metrics = gitmetrics.collect(dirname)
+    github_url = check_github_url(metrics.url)
     (organization_name, project_name) = owner_project_from_github_url(github_url)
-    (c_loc, cpp_loc, h_loc, assembly_loc) = get_c_cpp_h_assembly_loc(dirname)
-    last_hash = get_last_commit_hash(dirname)
+    with profiler.phase('scan') as details:
+        tree = scanner.scan_tree(dirname, scan_jobs)
+        details['hits'] = len(tree.hits)
+    (c_loc, cpp_loc, h_loc, assembly_loc) = loc_columns(tree.loc)
     # retrieve information from Github
-    github_json_url = "https://api.github.com/repos/%s/%s" % (organization_name, project_name)
-    with urllib.request.urlopen(github_json_url) as url:
-        data = json.loads(url.read().decode())
-        stargazers = data['stargazers_count']
-        forks = data['forks_count']
-        open_issues = data['open_issues_count']
-        description = data['description']
-        subscribers = data['subscribers_count']
-        creation_date = datetime.datetime.strptime(data['created_at'], "%Y-%m-%dT%H:%M:%SZ").timestamp()
-        language = data['language']
-        query = """insert into GithubProjectUnfiltered(
-                GITHUB_PROJECT_NAME,
-                GITHUB_URL,
-                GITHUB_DESCRIPTION,
-                GITHUB_NR_STARGAZERS,
-                GITHUB_NR_SUBSCRIBERS,
-                GITHUB_NR_FORKS,
-                GITHUB_NR_OPEN_ISSUES,
-                GITHUB_REPO_CREATION_DATE,
-                GITHUB_LANGUAGE,
-
-                PULL_HASH,
-                PULL_DATE,
-
-                CLOC_LOC_C,
-                CLOC_LOC_H,
-                CLOC_LOC_ASSEMBLY,
-                CLOC_LOC_CPP,
-
-                GIT_NR_COMMITS,
-                GIT_NR_COMMITTERS,
-                GIT_FIRST_COMMIT_DATE,
-                GIT_LAST_COMMIT_DATE)
-
-                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-
-                """
-        c.execute(query,
-                (project_name,
-                github_url,
-                description,
-                stargazers,
-                subscribers,
-                forks,
-                open_issues,
-                datetime.datetime.fromtimestamp(creation_date).strftime('%Y-%m-%d'),
-                language,
-
-                last_hash,
-                datetime.datetime.now().strftime('%Y-%m-%d'),
-
-                c_loc,
-                h_loc,
-                assembly_loc,
-                cpp_loc,
-
-                commit_count,
-                committers_count,
-                datetime.datetime.fromtimestamp(first_date).strftime('%Y-%m-%d'),
-                datetime.datetime.fromtimestamp(last_date).strftime('%Y-%m-%d'))
-                )
-        conn.commit()
-
-def grep_project(url):
-    """ Executes the grep.sh script on the project directory. """
-    project = get_project_dir(url)
-    print(grep_exec + ' ' + project)
-    process = subprocess.Popen(['bash', grep_exec, project])
-    process.communicate()
-
-if args.command == 'categories':
-    display_application_cats()
-elif args.command == 'new-project-entry':
-    if args.file is None:
-        print("no --file arg")
-        exit(-1)
-    insert_project_entry(args.file)
-    grep_project(args.file)
-elif args.command == 'download-project':
-    if args.file is None:
-        print("no --file arg")
-        exit(-1)
-    download_project(args.file, args.keywords)
-    grep_project(args.file)
-elif args.command == 'add-asm-instruction':
-    if args.file is None:
-        print("no --file arg")
-        exit(-1)
-    if args.instr is None:
-        print("no --instr arg")
-        exit(-1)
-    add_asm_instruction(args.instr, args.file)
-elif args.command == 'add-asm-sequence':
-    if args.instr is None:
-        print("no --instr arg")
-        exit(-1)
-    add_asm_sequence(args.instr, args.file)
-elif args.command == 'add-project-asm-sequence':
-    if args.instr is None:
-        print("no --instr arg")
-        exit(-1)
-    add_asm_sequence_in_project(args.instr, args.file)
-elif args.command == 'add-project-keywords':
-    if args.file is None:
-        print("no --file arg")
-        exit(-1)
-    if args.keywords is None:
-        print("no --keywords arg")
-        exit(-1)
-    add_keywords_to_project(args.file, args.keywords)
-elif args.command == 'show-stats':
-    if args.file is None:
-        print("specify --file arg to specify the output directory")
+    data = github_cache.get_repository(github_cache.cache_path_for(session.database), organization_name, project_name, session.options.offline)
+    stargazers = data['stargazers_count']
+    forks = data['forks_count']
+    open_issues = data['open_issues_count']
+    description = data['description']
+    subscribers = data['subscribers_count']
+    creation_date = datetime.datetime.strptime(data['created_at'], "%Y-%m-%dT%H:%M:%SZ").timestamp()
+    language = data['language']
+    return ((project_name,
+            github_url,
+            description,
+            stargazers,
+            subscribers,
+            forks,
+            open_issues,
+            datetime.datetime.fromtimestamp(creation_date).strftime('%Y-%m-%d'),
+            language,
+
+            metrics.last_commit_hash,
+            datetime.datetime.now().strftime('%Y-%m-%d'),
+
+            c_loc,
+            h_loc,
+            assembly_loc,
+            cpp_loc,
+
+            metrics.commit_count,
+            metrics.committer_count,
+            datetime.datetime.fromtimestamp(metrics.first_commit_date).strftime('%Y-%m-%d'),
+            datetime.datetime.fromtimestamp(metrics.last_commit_date).strftime('%Y-%m-%d')),
+            tree.hits)
+
+def store_project_entry(session, entry):
+    """ Inserts a row gathered by collect_project_entry into GithubProjectUnfiltered. """
+    query = """insert into GithubProjectUnfiltered(
+            GITHUB_PROJECT_NAME,
+            GITHUB_URL,
+            GITHUB_DESCRIPTION,
+            GITHUB_NR_STARGAZERS,
+            GITHUB_NR_SUBSCRIBERS,
+            GITHUB_NR_FORKS,
+            GITHUB_NR_OPEN_ISSUES,
+            GITHUB_REPO_CREATION_DATE,
+            GITHUB_LANGUAGE,
+
+            PULL_HASH,
+            PULL_DATE,
+
+            CLOC_LOC_C,
+            CLOC_LOC_H,
+            CLOC_LOC_ASSEMBLY,
+            CLOC_LOC_CPP,
+
+            GIT_NR_COMMITS,
+            GIT_NR_COMMITTERS,
+            GIT_FIRST_COMMIT_DATE,
+            GIT_LAST_COMMIT_DATE)
+
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+
+            """
+    session.cursor.execute(query, entry)
+    commit(session)
+
+def run_git(path, arguments):
+    """ Runs a git command in path and returns its output, or None if the command failed. """
+    import profiler
+    with profiler.command(['git'] + arguments) as details:
+        process = subprocess.Popen(['git'] + arguments, cwd=path, stdout=subprocess.PIPE)
+        stdout, _ = process.communicate()
+        details['bytes'] = len(stdout)
+    if process.returncode != 0:
+        return None
+    return stdout.decode("ISO-8859-1")
+
+def read_blobs(path, objects):
+    """ Returns (object, contents) pairs of the given blobs (IDs or revision:file) that exist, read with a single git cat-file process. """
+    import profiler
+    with profiler.command(['git', 'cat-file', '--batch']) as details:
+        process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=path, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        stdout, _ = process.communicate(''.join(o + '\n' for o in objects).encode())
+        details['bytes'] = len(stdout)
+    blobs = []
+    pos = 0
+    for o in objects:
+        end = stdout.index(b'\n', pos)
+        header = stdout[pos:end].split()
+        pos = end + 1
+        if len(header) == 3 and header[1] == b'blob':
+            size = int(header[2])
+            blobs.append((o, stdout[pos:pos + size]))
+            pos += size + 1
+        elif len(header) == 3:
+            pos += int(header[2]) + 1
+    return blobs
+
+def counted_blobs(path, revision):
+    """ Returns a dictionary that maps the IDs of the blobs of the counted files in a revision to the name of one of these
+        files. As files with identical contents have the same blob, each content is counted once, as in scanner.scan_tree. """
+    import linecount
+    import scanner
+    blobs = {}
+    for entry in run_git(path, ['ls-tree', '-r', '-z', revision]).split('\0'):
+        if entry == '':
+            continue
+        (info, name) = entry.split('\t', 1)
+        (mode, type, blob) = info.split()
+        # symbolic links and submodules are not counted
+        if type == 'blob' and mode != '120000' and linecount.language_of(name) is not None and not any(part in scanner.EXCLUDED_DIRS for part in name.split('/')[:-1]):
+            blobs.setdefault(blob, name)
+    return blobs
+
+def count_changed_loc(path, old_revision, new_revision):
+    """ Returns the difference of the LOC (C, C++, header, assembly) of two revisions: the lines of the file contents that
+        are only in the new revision minus those that are only in the old one. """
+    import linecount
+    old = counted_blobs(path, old_revision)
+    new = counted_blobs(path, new_revision)
+    def count(names):
+        return loc_columns(linecount.count_blobs((names[blob], data) for (blob, data) in read_blobs(path, sorted(names))))
+    added = count(dict((blob, name) for (blob, name) in new.items() if blob not in old))
+    removed = count(dict((blob, name) for (blob, name) in old.items() if blob not in new))
+    return tuple(a - r for (r, a) in zip(removed, added))
+
+def refresh_project(session, project_id, url, pull_hash):
+    """ Fetches a project and, if its HEAD changed since PULL_HASH, updates its GithubProjectUnfiltered row and re-scans the changed files.
+        The LOC counts are adjusted by the difference of the file contents of both revisions (see count_changed_loc) instead of counting
+        the whole project again. """
+    import datetime
+    import gitmetrics
+    import scanner
+    dirname = get_project_dir(url)
+    if not os.path.isdir(dirname):
+        print(url + ': skipped (not downloaded)')
+        return
+    if run_git(dirname, ['fetch', '--quiet', 'origin', 'HEAD']) is None:
+        print(url + ': skipped (fetch failed)')
+        return
+    new_hash = run_git(dirname, ['rev-parse', 'FETCH_HEAD']).strip()
+    if new_hash == pull_hash:
+        print(url + ': unchanged')
+        return
+    # without rename detection, the old path of a renamed file is listed as well, so that its sequences are removed
+    changed = None if not pull_hash else run_git(dirname, ['diff', '--name-only', '--no-renames', '-z', pull_hash, new_hash])
+    if run_git(dirname, ['checkout', '--quiet', '--detach', new_hash]) is None:
+        print(url + ': skipped (checkout failed)')
+        return
+    if changed is None:
+        # PULL_HASH is missing or not part of the local history, count and scan everything again
+        tree = scanner.scan_tree(dirname)
+        (c_loc, cpp_loc, h_loc, assembly_loc) = loc_columns(tree.loc)
+        session.cursor.execute('UPDATE GithubProjectUnfiltered SET CLOC_LOC_C = ?, CLOC_LOC_CPP = ?, CLOC_LOC_H = ?, CLOC_LOC_ASSEMBLY = ? WHERE ID = ?', (c_loc, cpp_loc, h_loc, assembly_loc, project_id))
+        sequences = sequences_from_hits(dirname, tree.hits)
+        changed_files = None
+    else:
+        changed_files = [f for f in changed.split('\0') if f != '']
+        (c_loc, cpp_loc, h_loc, assembly_loc) = count_changed_loc(dirname, pull_hash, new_hash)
+        session.cursor.execute('UPDATE GithubProjectUnfiltered SET CLOC_LOC_C = CLOC_LOC_C + ?, CLOC_LOC_CPP = CLOC_LOC_CPP + ?, CLOC_LOC_H = CLOC_LOC_H + ?, CLOC_LOC_ASSEMBLY = CLOC_LOC_ASSEMBLY + ? WHERE ID = ?', (c_loc, cpp_loc, h_loc, assembly_loc, project_id))
+        changed_files = [f for f in changed_files if scanner.is_source_file(os.path.basename(f))]
+        sequences = collect_project_sequences(dirname, changed_files)
+    metrics = gitmetrics.collect(dirname)
+    session.cursor.execute('UPDATE GithubProjectUnfiltered SET PULL_HASH = ?, PULL_DATE = ?, GIT_NR_COMMITS = ?, GIT_NR_COMMITTERS = ?, GIT_FIRST_COMMIT_DATE = ?, GIT_LAST_COMMIT_DATE = ? WHERE ID = ?',
+            (new_hash,
+            datetime.datetime.now().strftime('%Y-%m-%d'),
+            metrics.commit_count,
+            metrics.committer_count,
+            datetime.datetime.fromtimestamp(metrics.first_commit_date).strftime('%Y-%m-%d'),
+            datetime.datetime.fromtimestamp(metrics.last_commit_date).strftime('%Y-%m-%d'),
+            project_id))
+    store_project_sequences(session, project_id, sequences, changed_files)
+    print('%s: updated to %s (%s changed files)' % (url, new_hash, 'all' if changed is None else len(changed.split('\0')) - 1))
+
+def refresh_projects(session, url=None):
+    """ Refreshes all downloaded projects (or only the one with the given URL), see refresh_project. """
+    import profiler
+    if url is None:
+        projects = session.cursor.execute('SELECT ID, GITHUB_URL, PULL_HASH FROM GithubProjectUnfiltered').fetchall()
+    else:
+        projects = session.cursor.execute('SELECT ID, GITHUB_URL, PULL_HASH FROM GithubProjectUnfiltered WHERE GITHUB_URL = ?', (url, )).fetchall()
+    for (project_id, project_url, pull_hash) in projects:
+        with profiler.phase(project_url, 'project'):
+            refresh_project(session, project_id, project_url, pull_hash)
+
+def plan_coverage(session, ordering_file=None):
+    """ Prints the number and percentage of analyzed projects whose instructions are all implemented after each instruction of
+        an ordering (read from ordering_file, or computed greedily if it is None). """
+    import plancoverage
+    incidence = plancoverage.load_incidence(session.conn)
+    ordering = plancoverage.greedy_order(incidence) if ordering_file is None else plancoverage.read_ordering(ordering_file)
+    for instruction in ordering:
+        if instruction not in incidence.index:
+            print('"%s" is not used by any analyzed project' % instruction)
+    start = time.perf_counter()
+    counts = plancoverage.evaluate(incidence, ordering)
+    elapsed = time.perf_counter() - start
+    nr_projects = len(incidence.project_masks)
+    print('instruction;covered_projects;percentage')
+    for (instruction, count) in zip(ordering, counts):
+        print('%s;%d;%.1f' % (instruction, count, 100.0 * count / nr_projects if nr_projects != 0 else 0))
+    print('%d of %d projects covered by %d instructions (evaluated in %.3f ms)' % (counts[-1] if len(counts) != 0 else 0, nr_projects, len(ordering), elapsed * 1000))
+
+def verify_test_cases(session, jobs=4):
+    """ Compiles the test cases of all instructions and sequences (see testcases.py) and checks that their disassembly contains
+        the instructions. Data directives cannot be found in a disassembly and are not checked. Raises InputError if a test
+        case does not compile or lacks an instruction. """
+    import testcases
+    cases = [('instruction "%s"' % instruction, [instruction], test_case) for (instruction, test_case) in session.cursor.execute("SELECT INSTRUCTION, TEST_CASE FROM AsmInstruction WHERE TEST_CASE != '' ORDER BY ID")]
+    cases += [('sequence "%s"' % instructions, instructions.split(';'), testcases.test_case_source(test_case)) for (instructions, test_case) in session.cursor.execute("SELECT INSTRUCTIONS, COMPOUND_TEST_CASE FROM AsmSequence WHERE COMPOUND_TEST_CASE != '' ORDER BY ID")]
+    (results, nr_built) = testcases.build_all([source for (_, _, source) in cases], testcases.cache_path_for(session.database), jobs)
+    nr_failed = 0
+    for (name, instructions, source) in cases:
+        result = results[source]
+        if 'error' in result:
+            print('%s: does not compile: %s' % (name, result['error']))
+            nr_failed += 1
+            continue
+        found = set(normalize_instructions(result['mnemonics']))
+        expected = [instr for instr in normalize_instructions(instructions) if instr != '' and not instr.startswith('.')]
+        missing = [instr for instr in expected if instr not in found]
+        if len(missing) != 0:
+            print('%s: %s not found in the disassembly' % (name, ', '.join(missing)))
+            nr_failed += 1
+    print('%d of %d test cases verified (%d built, the others were cached)' % (len(cases) - nr_failed, len(cases), nr_built))
+    if nr_failed != 0:
+        raise InputError('%d test cases failed' % nr_failed)
+
+def format_scan(project, hits):
+    """ Formats the inline assembly hits of a project as the project directory followed by one file:line:statement line per hit. """
+    import scanner
+    return project + '\n' + ''.join(scanner.format_hit(hit) + '\n' for hit in hits)
+
+def check_choice(option, value, choices):
+    """ Checks the value of an option whose choices are defined by a module that is only imported by the commands that use it. """
+    if value is not None and value not in choices:
+        raise InputError('invalid %s: %s (choose from %s)' % (option, value, ', '.join(choices)))
+
+def check_output_path(option, path, directory=False):
+    """ Checks that the output directory given by an option exists (or, for an output file, its directory), so that a command
+        fails before it runs its queries rather than when it writes its files. """
+    if not os.path.isdir(path if directory else os.path.dirname(os.path.abspath(path))):
+        raise InputError('%s: %s does not exist' % (option, path if directory else os.path.dirname(path)))
+
+def check_clone_strategy(args):
+    import gitclone
+    check_choice('--clone', args.clone, gitclone.STRATEGIES)
+
+def run_command(session, args):
+    """ Runs a command given by its parsed command line arguments (see argument_parser). """
+    import profiler
+    if args.command == 'categories':
+        import categorytree
+        check_choice('--hierarchy', args.hierarchy, sorted(categorytree.HIERARCHIES))
+        display_categories(session, args.hierarchy, args.counts)
+    elif args.command == 'new-project-entry':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        check_clone_strategy(args)
+        print(format_scan(args.file, insert_project_entry(session, args.file)), end='')
+    elif args.command == 'download-project':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        check_clone_strategy(args)
+        print(format_scan(get_project_dir(args.file), download_project(session, args.file, args.keywords)), end='')
+    elif args.command == 'download-projects':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        check_clone_strategy(args)
+        download_projects(session, args.file, args.jobs, args.keywords)
+    elif args.command == 'add-asm-instruction':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        if args.instr is None:
+            print("no --instr arg")
+            exit(-1)
+        add_asm_instruction(session, args.instr, args.file)
+    elif args.command == 'add-asm-sequence':
+        if args.instr is None:
+            print("no --instr arg")
+            exit(-1)
+        add_asm_sequence(session, args.instr, args.file)
+    elif args.command == 'add-project-asm-sequence':
+        if args.instr is None:
+            print("no --instr arg")
+            exit(-1)
+        add_asm_sequence_in_project(session, args.instr, args.file)
+    elif args.command == 'add-project-keywords':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        if args.keywords is None:
+            print("no --keywords arg")
+            exit(-1)
+        add_keywords_to_project(session, args.file, args.keywords)
+    elif args.command == 'analyze-project':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        analyze_project(session, args.file)
+    elif args.command == 'refresh-projects':
+        refresh_projects(session, args.file)
+    elif args.command == 'show-stats':
+        if args.file is None:
+            print("specify --file arg to specify the output directory")
+            exit(-1)
+        import report
+        check_choice('--report', args.report, report.BACKENDS)
+        check_output_path('--file', args.file, True)
+        if args.report_timings is not None:
+            check_output_path('--report-timings', args.report_timings)
+        with profiler.phase('integrity tests'):
+            database_integrity_tests(session)
+        show_stats(session, args.file, [] if args.metrics is None else parse_scatter_plot_metrics(session, args.metrics), args.report, not args.no_report_cache, args.report_timings)
+    elif args.command == 'bulk-import':
+        if args.file is None:
+            print("no --file arg")
+            exit(-1)
+        bulk_import(session, args.file)
+    elif args.command == 'export':
+        if args.file is None:
+            print("specify --file arg to specify the output directory")
+            exit(-1)
+        import export
+        check_choice('--format', args.format, export.FORMATS)
+        try:
+            written = export.export(session.conn, args.file, args.format, args.dictionary)
+        except ImportError as e:
+            print(str(e))
+            exit(-1)
+        for (path, nr_rows) in written:
+            print('%s: %d rows' % (path, nr_rows))
+    elif args.command == 'plan-coverage':
+        plan_coverage(session, args.file)
+    elif args.command == 'verify-test-cases':
+        verify_test_cases(session, args.jobs)
+    elif args.command == 'explain-stats':
+        explain_stats(session)
+    elif args.command == 'serve':
+        serve(session, args)
+
+# commands that can be run by the batch command
+batch_commands = ['new-project-entry', 'download-project', 'add-asm-instruction', 'add-asm-sequence', 'add-project-asm-sequence', 'add-project-keywords', 'analyze-project', 'bulk-import']
+
+def read_batch(batch_file):
+    """ Reads the commands of a batch, one per line, either in command line syntax (e.g., add-asm-sequence --instr="rdtsc")
+        or as JSON objects (e.g., {"command": "add-asm-sequence", "instr": "rdtsc"}, with true and false for flags). Empty lines and lines starting with # are skipped. """
+    import json
+    import shlex
+    f = sys.stdin if batch_file is None else open(batch_file)
+    commands = []
+    with f:
+        for line in f:
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                argv = [record.pop('command')]
+                for (key, value) in record.items():
+                    # true is a flag that is given, false one that is not
+                    if value is True:
+                        argv.append('--' + key)
+                    elif value is not False:
+                        argv.append('--%s=%s' % (key, value))
+            else:
+                argv = shlex.split(line)
+            commands.append((line, argv))
+    return commands
+
+def run_batch(session, batch_args):
+    """ Runs the commands of a batch (see read_batch) in a single transaction. If a command fails, the whole batch is rolled back.
+        The options of the batch command (e.g., --offline) apply to all commands unless they specify them. """
+    import argparse
+    import profiler
+    parser = argument_parser()
+    commands = read_batch(batch_args.file)
+    session.state['in_batch'] = True
+    try:
+        for (line, argv) in commands:
+            defaults = argparse.Namespace(**vars(batch_args))
+            defaults.file = defaults.instr = defaults.keywords = None
+            try:
+                args = parser.parse_args([batch_args.database] + argv, namespace=defaults)
+                if args.command not in batch_commands:
+                    print(args.command + ' cannot be run in a batch')
+                    exit(-1)
+                with profiler.phase(line, 'batch'):
+                    run_command(session._replace(options=Options(args.offline, args.clone, args.reference)), args)
+            except (Exception, SystemExit) as e:
+                rollback(session)
+                if isinstance(e, InputError):
+                    print(e)
+                print('batch failed at: ' + line)
+                if isinstance(e, (SystemExit, InputError)):
+                    exit(-1)
+                raise
+    finally:
+        session.state['in_batch'] = False
+    commit(session)
+    print('%d commands committed' % len(commands))
+
+def serve_request(session, server_args, parser, request):
+    """ Runs the command of a request of asmc.py and returns its output (stdout and stderr) and exit status. The options of
+        the serve command apply to the command unless it specifies them. A failed command is rolled back, and the temporary
+        tables that it left behind are dropped. """
+    import argparse
+    import profiler
+    import traceback
+    output = io.StringIO()
+    status = 0
+    cwd = os.getcwd()
+    stdin = sys.stdin
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            os.chdir(request['cwd'])
+            sys.stdin = io.StringIO(request.get('stdin', ''))
+            invalidate_stale_caches(session)
+            defaults = argparse.Namespace(**vars(server_args))
+            defaults.file = defaults.instr = defaults.keywords = None
+            args = parser.parse_args([session.database] + request['argv'], namespace=defaults)
+            if args.command == 'serve':
+                print('the database is already served')
+                exit(-1)
+            with profiler.phase(' '.join(request['argv']), 'request'):
+                command_session = session._replace(options=Options(args.offline, args.clone, args.reference))
+                if args.command == 'batch':
+                    run_batch(command_session, args)
+                else:
+                    run_command(command_session, args)
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            status = e.code or 0
+        else:
+            output.write(str(e.code) + '\n')
+            status = 1
+        rollback(session)
+        drop_stats_views(session)
+    except (InputError, OSError) as e:
+        # invalid input and file errors (e.g., a missing file of the request) are returned as a message, not a traceback
+        output.write(str(e) + '\n')
+        status = -1
+        rollback(session)
+        drop_stats_views(session)
+    except Exception:
+        output.write(traceback.format_exc())
+        status = 1
+        rollback(session)
+        drop_stats_views(session)
+    finally:
+        sys.stdin = stdin
+        os.chdir(cwd)
+    return {'output': output.getvalue(), 'status': status}
+
+def serve(session, server_args):
+    """ Runs the commands that asmc.py sends to a Unix socket (the --file argument, or database.sock) one after another on the
+        connection of the session, until the server is interrupted or terminated. The ID caches of the session (see
+        reset_id_caches) are kept between commands unless another process changes the database (see invalidate_stale_caches). """
+    import asmc
+    import signal
+    import socket
+    socket_path = server_args.file if server_args.file is not None else asmc.socket_path_for(session.database)
+    if asmc.connect(socket_path) is not None:
+        raise InputError(socket_path + ' is already served')
+    if os.path.exists(socket_path):
+        # left behind by a server that was killed
+        os.unlink(socket_path)
+    parser = argument_parser()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    # stop like on an interrupt, which is not caught by serve_request
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print('serving %s on %s' % (session.database, socket_path), flush=True)
+    try:
+        while True:
+            (connection, _) = server.accept()
+            with connection, connection.makefile('rwb') as f:
+                request = asmc.receive(f)
+                if request is not None:
+                    asmc.send(f, serve_request(session, server_args, parser, request))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+def argument_parser():
+    """ Returns the parser of the command line arguments of main (and of the commands of a batch). """
+    import argparse
+    parser = argparse.ArgumentParser(description='Manipulate the inline assembler database.')
+    parser.add_argument('database', metavar='database', help="path to the sqlite3 database")
+    parser.add_argument('command', choices=['categories', 'new-project-entry', 'download-project', 'download-projects', 'add-asm-instruction', 'add-asm-sequence', 'add-project-asm-sequence', 'add-project-keywords', 'analyze-project', 'refresh-projects', 'show-stats', 'explain-stats', 'batch', 'bulk-import', 'export', 'plan-coverage', 'verify-test-cases', 'serve'])
+    parser.add_argument('--file',help='a file argument')
+    parser.add_argument('--instr',help='an instruction argument')
+    parser.add_argument('--keywords',help='specify keywords')
+    parser.add_argument('--jobs',type=int,default=4,help='number of parallel workers')
+    parser.add_argument('--offline',action='store_true',help='only use cached Github metadata')
+    parser.add_argument('--clone',default='full',help='how projects are cloned: full or partial (see gitclone.py)')
+    parser.add_argument('--format',help='format of export: parquet, arrow, or csv (parquet if pyarrow is installed, csv otherwise)')
+    parser.add_argument('--dictionary',action='store_true',help='export instructions by ID instead of by name')
+    parser.add_argument('--metrics',help='additional project columns to write scatter plot data for in show-stats (comma-separated)')
+    parser.add_argument('--report',default='latex',help='format of the show-stats report: latex, markdown, or json (commands.tex, commands.md, or commands.json)')
+    parser.add_argument('--no-report-cache',action='store_true',help='compute all units of the show-stats report instead of using the report cache')
+    parser.add_argument('--report-timings',help='JSON file to which show-stats writes the seconds that each computed report unit took')
+    parser.add_argument('--hierarchy',default='application',help='category hierarchy that the categories command displays: application or usage')
+    parser.add_argument('--counts',action='store_true',help='display the number of projects in each category and its subcategories')
+    parser.add_argument('--reference',help='directory with local mirrors of the projects to clone')
+    parser.add_argument('--profile',metavar='TRACE_FILE',help='record the time of the phases, subprocesses, and SQL statements of the command, write them to TRACE_FILE (Chrome trace format), and print a summary')
+    return parser
+
+def main(argv=None):
+    """ Runs the command given by the command line arguments argv (by default, those of the process). """
+    import profiler
+    args = argument_parser().parse_args(argv)
+    if args.profile is not None:
+        profiler.enable()
+    session = open_session(args.database, args.offline, args.clone, args.reference)
+    try:
+        with profiler.phase(args.command, 'command'):
+            if args.command == 'batch':
+                run_batch(session, args)
+            else:
+                run_command(session, args)
+    except InputError as e:
+        print(e)
         exit(-1)
-    database_integrity_tests()
-    show_stats(args.file)
-
+    finally:
+        if args.profile is not None:
+            profiler.write_trace(args.profile)
+            print(profiler.summary(), end='', file=sys.stderr)
+        session.conn.close()
+
+if __name__ == '__main__':
+    main()
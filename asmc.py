@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" Runs a command of asm.py on the server of its database (see the serve
+    command of asm.py), so that the command neither starts the modules of
+    asm.py nor opens the database, and uses the caches of the server. The
+    command line is the same as that of asm.py, with the database as the first
+    argument:
+
+        ./asmc.py database.db add-project-asm-sequence --instr="rdtsc" --file="projects/mattsta-crcspeed/main.c"
+
+    Without a server, the command is run by asm.py. A request is a JSON line
+    with the arguments after the database, the working directory, and the
+    standard input of a batch without --file; the server answers with a JSON
+    line with the output and the exit status of the command.
+"""
+
+import json
+import os
+import socket
+import sys
+
+asm_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'asm.py')
+
+def socket_path_for(database):
+    return database + '.sock'
+
+def send(f, message):
+    f.write(json.dumps(message).encode() + b'\n')
+    f.flush()
+
+def receive(f):
+    """ Returns the next message of a connection, or None if it was closed. """
+    line = f.readline()
+    return json.loads(line.decode()) if line else None
+
+def connect(socket_path):
+    """ Returns a connection to the server on socket_path, or None if no server is running. """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+def request(connection, argv, stdin=''):
+    """ Runs a command (the arguments of asm.py after the database) on the server of a connection and returns its output and
+        exit status. Closes the connection. """
+    with connection, connection.makefile('rwb') as f:
+        send(f, {'argv': argv, 'cwd': os.getcwd(), 'stdin': stdin})
+        response = receive(f)
+    if response is None:
+        return ('the server closed the connection\n', -1)
+    return (response['output'], response['status'])
+
+def main(argv):
+    connection = connect(socket_path_for(argv[0])) if len(argv) >= 2 and argv[1] != 'serve' else None
+    if connection is None:
+        os.execv(sys.executable, [sys.executable, asm_path] + argv)
+    stdin = sys.stdin.read() if argv[1] == 'batch' and not any(argument.startswith('--file') for argument in argv) else ''
+    (output, status) = request(connection, argv[1:], stdin)
+    sys.stdout.write(output)
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
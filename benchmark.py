@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+""" Benchmarks asm.py on synthetic data.
+
+    For each scale, a database is created from schema.sql (with the tables
+    renamed and the views added as in the databases in use) and filled with
+    projects, sequences, and instructions whose popularity follows a Zipf
+    distribution. Local Git repositories with inline assembly are generated as
+    well, and their Github metadata is stored in the Github cache, so that they
+    can be ingested offline. The following commands are timed as separate
+    processes: show-stats (with and without the report cache, including the
+    time of each report unit), add-asm-sequence (single commands and a batch),
+    and new-project-entry and analyze-project for the generated repositories.
+    The results are written as JSON.
+
+    Usage: benchmark.py [--scales=1,4,16] [--projects=250] [--sequences=500] [--instructions=120] [--skew=1.1] [--output=results.json]
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import github_cache
+import migrations
+import report
+
+directory = os.path.dirname(os.path.realpath(__file__))
+
+# the databases in use store the rows in the Unfiltered tables and filter them with views
+production_tables = [
+    'ALTER TABLE GithubProject RENAME TO GithubProjectUnfiltered',
+    'ALTER TABLE AsmSequencesInGithubProject RENAME TO AsmSequencesInGithubProjectUnfiltered',
+    'ALTER TABLE AsmSequencesInGithubProjectUnfiltered ADD COLUMN CODE TEXT',
+    'ALTER TABLE AsmSequencesInGithubProjectUnfiltered ADD COLUMN MNEMONIC INTEGER DEFAULT 1',
+    'ALTER TABLE AsmSequencesInGithubProjectUnfiltered ADD COLUMN NR_OCCURRENCES INTEGER DEFAULT 1',
+    'ALTER TABLE AsmInstruction ADD COLUMN CONTROL_FLOW INTEGER DEFAULT 0',
+]
+
+production_views = [
+    'CREATE VIEW GithubProject AS SELECT * FROM GithubProjectUnfiltered',
+    'CREATE VIEW AsmSequencesInGithubProject AS SELECT * FROM AsmSequencesInGithubProjectUnfiltered',
+    "CREATE VIEW GithubProjectWithInlineAsm AS SELECT GithubProject.*, IFNULL((SELECT NAME FROM ApplicationCategory, ApplicationCategoriesPerProject WHERE ApplicationCategory.ID = ApplicationCategoryID AND GithubProjectID = GithubProject.ID AND SUPER_ID IS NULL ORDER BY ApplicationCategory.ID LIMIT 1), 'TODO') AS MAIN_CATEGORY FROM GithubProject WHERE ID IN (SELECT GITHUB_PROJECT_ID FROM AsmSequencesInGithubProjectUnfiltered)",
+    'CREATE VIEW GithubProjectCompletelyAnalyzed AS SELECT * FROM GithubProject WHERE ANALYZED_FOR_INLINE_ASM = 1',
+    'CREATE VIEW GithubProjectNotCompletelyAnalyzed AS SELECT * FROM GithubProjectWithInlineAsm WHERE ANALYZED_FOR_INLINE_ASM = 0',
+    'CREATE VIEW GithubProjectWithCheckedInlineAsm AS SELECT * FROM GithubProjectWithInlineAsm WHERE ANALYZED_FOR_INLINE_ASM = 1',
+    'CREATE VIEW AsmSequencesInAnalyzedGithubProjects AS SELECT AsmSequencesInGithubProjectUnfiltered.* FROM AsmSequencesInGithubProjectUnfiltered, GithubProjectCompletelyAnalyzed WHERE GITHUB_PROJECT_ID = GithubProjectCompletelyAnalyzed.ID',
+    'CREATE VIEW AsmInstructionsInAnalyzedGithubProjects AS SELECT DISTINCT GITHUB_PROJECT_ID, AsmInstruction.ID AS ASM_INSTRUCTION_ID, INSTRUCTION FROM AsmSequencesInAnalyzedGithubProjects, AsmSequenceInstruction, AsmInstruction WHERE AsmSequencesInAnalyzedGithubProjects.ASM_SEQUENCE_ID = AsmSequenceInstruction.ASM_SEQUENCE_ID AND AsmSequenceInstruction.ASM_INSTRUCTION_ID = AsmInstruction.ID',
+    'CREATE VIEW InstructionFrequencies AS SELECT AsmInstruction.ID, AsmInstruction.INSTRUCTION, COUNT(DISTINCT GITHUB_PROJECT_ID) AS count, COUNT(DISTINCT GITHUB_PROJECT_ID) * 100.0 / (SELECT COUNT(*) FROM GithubProjectWithCheckedInlineAsm) AS percentage FROM AsmInstruction LEFT JOIN AsmInstructionsInAnalyzedGithubProjects ON AsmInstruction.ID = AsmInstructionsInAnalyzedGithubProjects.ASM_INSTRUCTION_ID GROUP BY AsmInstruction.ID',
+    'CREATE VIEW InlineAssemblyInstructionsInProjects AS SELECT * FROM InstructionFrequencies',
+    'CREATE VIEW AsmSequencesWithInstructionCountsInAnalyzedGithubProjects AS SELECT AsmSequencesInAnalyzedGithubProjects.*, (SELECT COUNT(*) FROM AsmSequenceInstruction WHERE AsmSequenceInstruction.ASM_SEQUENCE_ID = AsmSequencesInAnalyzedGithubProjects.ASM_SEQUENCE_ID) AS number_instructions FROM AsmSequencesInAnalyzedGithubProjects',
+    'CREATE VIEW UniqueSequencesPerProject AS SELECT GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, number_instructions FROM AsmSequencesWithInstructionCountsInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID, ASM_SEQUENCE_ID',
+    "CREATE VIEW FileNamesWithInlineAssembly AS SELECT replace(IN_FILE, rtrim(IN_FILE, replace(IN_FILE, '/', '')), '') AS file_name, GITHUB_PROJECT_ID, SUM(NR_OCCURRENCES) AS inline_assembly_count FROM AsmSequencesInAnalyzedGithubProjects GROUP BY GITHUB_PROJECT_ID, IN_FILE",
+]
+
+# instructions of the synthetic databases by decreasing popularity; further instructions are named insn<n>
+common_instructions = ['rdtsc', 'cpuid', 'pause', 'mfence', 'lock xadd', 'bswap', 'lock cmpxchg', 'nop', 'xor', 'mov', 'bsr', 'rdtscp',
+    'xgetbv', 'lfence', 'sfence', 'lock xchg', 'bsf', 'crc32', 'rol', 'ror', 'shl', 'add', 'sub', 'or', 'and', 'int $0x03', 'ud2',
+    'prefetch', 'push', 'pop', 'pushf', 'popf', 'lock add', 'lock inc', 'lock dec', 'adc', 'mul', 'imul', 'div', 'lea', 'inc', 'dec',
+    'neg', 'sbb', 'setz', 'setc', 'setnz', 'cmp', 'test', 'jmp', 'jz', 'jnz', 'jc', 'rep movs', 'rep stos', 'cld', 'rdrand', 'stc',
+    'aesenc', 'pxor', 'movdqa']
+
+# (file name, relative weight) of the files that sequences are found in
+file_names = [('src/atomic.h', 8), ('src/timer.c', 5), ('src/cpu.c', 4), ('src/hash.c', 3), ('include/arch.h', 2), ('src/util.c', 1)]
+
+application_categories = [('crypto', None), ('networking', None), ('media', None), ('database', None), ('hash', 1), ('sha', 5), ('codec', 3)]
+usage_categories = [('timing', None), ('atomics', None), ('feature detection', None), ('spin lock', 2)]
+
+# (function, statement) of the inline assembly in the generated repositories by decreasing popularity
+repository_statements = [
+    ('static inline unsigned long long read_tsc(void) {\n    unsigned int lo, hi;\n', '    __asm__ __volatile__("rdtsc" : "=a"(lo), "=d"(hi));\n    return ((unsigned long long) hi << 32) | lo;\n}\n'),
+    ('static inline void cpu_relax(void) {\n', '    __asm__ volatile("pause");\n}\n'),
+    ('static inline void full_barrier(void) {\n', '    __asm__ volatile("mfence" ::: "memory");\n}\n'),
+    ('static inline int fetch_add(int *p, int v) {\n', '    __asm__ volatile("lock; xaddl %0, %1" : "+r"(v), "+m"(*p) : : "memory");\n    return v;\n}\n'),
+    ('static inline void cpuid(unsigned int leaf, unsigned int *r) {\n', '    __asm__ volatile("cpuid" : "=a"(r[0]), "=b"(r[1]), "=c"(r[2]), "=d"(r[3]) : "a"(leaf));\n}\n'),
+    ('static inline unsigned int byte_swap(unsigned int x) {\n', '    __asm__("bswap %0" : "+r"(x));\n    return x;\n}\n'),
+    ('static inline int highest_bit(unsigned int x) {\n    int r;\n', '    __asm__("bsrl %1, %0" : "=r"(r) : "r"(x));\n    return r;\n}\n'),
+    ('static inline unsigned int crc_byte(unsigned int crc, unsigned char b) {\n', '    __asm__("crc32b %1, %0" : "+r"(crc) : "rm"(b));\n    return crc;\n}\n'),
+    ('static inline unsigned int rotate(unsigned int x) {\n', '    __asm__("roll $8, %0" : "+r"(x));\n    return x;\n}\n'),
+    ('static inline void serialize(void) {\n    unsigned int a = 0;\n', '    __asm__ volatile("xorl %%eax, %%eax\\n\\tcpuid" : "+a"(a) : : "ebx", "ecx", "edx");\n}\n'),
+]
+
+def zipf_weights(n, skew):
+    """ Returns the cumulative weights of the ranks 1..n of a Zipf distribution with the given skew. """
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+def choose(rng, values, cumulative_weights):
+    return values[bisect.bisect(cumulative_weights, rng.random() * cumulative_weights[-1])]
+
+def instruction_names(nr_instructions):
+    return common_instructions[:nr_instructions] + ['insn%d' % i for i in range(nr_instructions - len(common_instructions))]
+
+def random_sequences(rng, instructions, nr_sequences, skew):
+    """ Returns distinct instruction sequences (most of them with one or two instructions) with Zipf-distributed instructions. """
+    weights = zipf_weights(len(instructions), skew)
+    length_weights = zipf_weights(8, 1.5)
+    sequences = []
+    seen = set()
+    for _ in range(nr_sequences * 20):
+        if len(sequences) == nr_sequences:
+            break
+        sequence = [choose(rng, instructions, weights) for _ in range(choose(rng, range(1, 9), length_weights))]
+        key = ';'.join(sequence)
+        if key not in seen:
+            seen.add(key)
+            sequences.append(sequence)
+    return sequences
+
+def create_database(path, nr_projects, nr_sequences, nr_instructions, skew, seed=0, inline_asm_ratio=0.6, analyzed_ratio=0.8):
+    """ Creates a synthetic database with nr_projects projects, of which inline_asm_ratio contain Zipf-distributed sequences
+        (and analyzed_ratio are completely analyzed). Returns the instructions. """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    with open(os.path.join(directory, 'schema.sql')) as f:
+        conn.executescript(f.read())
+    for statement in production_tables + production_views:
+        conn.execute(statement)
+    # the indexes are created by the migrations as in the databases in use
+    conn.execute('PRAGMA user_version = 0')
+    instructions = instruction_names(nr_instructions)
+    conn.executemany('INSERT INTO AsmInstruction(ID, INSTRUCTION, TEST_CASE, CONTROL_FLOW) VALUES(?, ?, ?, ?)',
+            [(i + 1, instruction, '', 1 if instruction.startswith('j') else 0) for (i, instruction) in enumerate(instructions)])
+    instruction_ids = dict((instruction, i + 1) for (i, instruction) in enumerate(instructions))
+    sequences = random_sequences(rng, instructions, nr_sequences, skew)
+    conn.executemany('INSERT INTO AsmSequence(ID, COMPOUND_TEST_CASE, NOTE, INSTRUCTIONS) VALUES(?, ?, ?, ?)',
+            [(i + 1, '', '', ';'.join(sequence)) for (i, sequence) in enumerate(sequences)])
+    conn.executemany('INSERT INTO AsmSequenceInstruction(INSTRUCTION_NUMBER, ASM_SEQUENCE_ID, ASM_INSTRUCTION_ID) VALUES(?, ?, ?)',
+            [(number, i + 1, instruction_ids[instruction]) for (i, sequence) in enumerate(sequences) for (number, instruction) in enumerate(sequence)])
+    conn.executemany('INSERT INTO ApplicationCategory(ID, NAME, SUPER_ID) VALUES(?, ?, ?)', [(i + 1, name, super_id) for (i, (name, super_id)) in enumerate(application_categories)])
+    conn.executemany('INSERT INTO AsmUsageCategory(ID, NAME, SUPER_ID) VALUES(?, ?, ?)', [(i + 1, name, super_id) for (i, (name, super_id)) in enumerate(usage_categories)])
+    conn.executemany('INSERT INTO AsmUsageCategoryPerSequence(ASM_USAGE_CATEGORY_ID, ASM_SEQUENCE_ID) VALUES(?, ?)',
+            [(rng.randint(1, len(usage_categories)), i + 1) for i in range(len(sequences)) if rng.random() < 0.3])
+    sequence_weights = zipf_weights(len(sequences), skew)
+    file_weights = list(itertools.accumulate(weight for (_, weight) in file_names))
+    projects = []
+    occurrences = []
+    categories = []
+    for project_id in range(1, nr_projects + 1):
+        first_year = rng.randint(1995, 2017)
+        projects.append((project_id, 'project%d' % project_id, 'https://github.com/synthetic/project%d' % project_id, 'synthetic project',
+                int(rng.paretovariate(0.8) * 20), rng.randint(1, 500), int(rng.paretovariate(1.0) * 5), rng.randint(0, 300),
+                '%d-01-01' % max(first_year, 2008), 'C', '%040x' % rng.getrandbits(160), '2017-10-01',
+                rng.randint(100, 10 ** 6), rng.randint(10, 10 ** 5), rng.randint(0, 1000) if rng.random() < 0.3 else 0, rng.randint(0, 1000),
+                int(rng.paretovariate(0.7) * 10), rng.randint(1, 300), '%d-01-01' % first_year, '2017-10-01',
+                0, 1 if rng.random() < analyzed_ratio else 0))
+        if rng.random() < inline_asm_ratio:
+            for _ in range(int(rng.paretovariate(1.2))):
+                sequence_id = bisect.bisect(sequence_weights, rng.random() * sequence_weights[-1]) + 1
+                in_file = choose(rng, file_names, file_weights)[0]
+                occurrences.append((in_file, project_id, sequence_id, 'asm volatile("...")', 1 if rng.random() < 0.95 else 0, rng.randint(1, 4)))
+        if rng.random() < 0.7:
+            categories.append((rng.randint(1, len(application_categories)), project_id))
+    conn.executemany('INSERT INTO GithubProjectUnfiltered VALUES(%s)' % ', '.join('?' * 22), projects)
+    conn.executemany('INSERT INTO AsmSequencesInGithubProjectUnfiltered(IN_FILE, GITHUB_PROJECT_ID, ASM_SEQUENCE_ID, CODE, MNEMONIC, NR_OCCURRENCES) VALUES(?, ?, ?, ?, ?, ?)', occurrences)
+    conn.executemany('INSERT INTO ApplicationCategoriesPerProject(ApplicationCategoryID, GithubProjectID) VALUES(?, ?)', categories)
+    conn.commit()
+    migrations.migrate(conn)
+    conn.close()
+    return instructions
+
+def git(arguments, cwd, date=None, author='bench'):
+    env = dict(os.environ, GIT_AUTHOR_NAME=author, GIT_AUTHOR_EMAIL=author + '@example.com', GIT_COMMITTER_NAME=author, GIT_COMMITTER_EMAIL=author + '@example.com')
+    if date is not None:
+        env['GIT_AUTHOR_DATE'] = env['GIT_COMMITTER_DATE'] = date
+    subprocess.run(['git', '-c', 'init.defaultBranch=master', '-c', 'commit.gpgsign=false'] + arguments, cwd=cwd, env=env, check=True,
+            stdout=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+
+def create_repositories(parent, nr_repositories, nr_files, skew, seed=0, nr_commits=3):
+    """ Creates Git repositories with C files that contain Zipf-distributed inline assembly statements (and a .S file) in
+        parent. Returns the (directory, Github URL) of each repository. """
+    rng = random.Random(seed)
+    weights = zipf_weights(len(repository_statements), skew)
+    repositories = []
+    for number in range(1, nr_repositories + 1):
+        path = os.path.join(parent, 'bench-repository%d' % number)
+        os.makedirs(os.path.join(path, 'src'))
+        git(['init', '--quiet'], path)
+        url = 'https://github.com/bench/repository%d' % number
+        git(['remote', 'add', 'origin', url], path)
+        for commit in range(nr_commits):
+            for i in range(commit, nr_files, nr_commits):
+                with open(os.path.join(path, 'src', 'file%d.c' % i), 'w') as f:
+                    f.write('/* generated by benchmark.py */\n')
+                    for k in range(rng.randint(1, 6)):
+                        (function, statement) = choose(rng, repository_statements, weights)
+                        f.write(function.replace('(', '%d(' % k, 1) + statement + '\n')
+                    f.write(''.join('int filler%d_%d(int x) {\n    return x * %d;\n}\n' % (i, k, k) for k in range(rng.randint(10, 100))))
+            if commit == 0:
+                with open(os.path.join(path, 'src', 'copy.S'), 'w') as f:
+                    f.write('.globl copy\ncopy:\n    movq %rdi, %rax\n    ret\n')
+            git(['add', '.'], path)
+            git(['commit', '--quiet', '-m', 'commit %d' % commit], path, '2017-0%d-01T12:00:00Z' % (commit % 9 + 1), 'developer%d' % (commit % 2))
+        repositories.append((path, url))
+    return repositories
+
+def cache_repository_metadata(database, repositories):
+    """ Stores Github metadata of the generated repositories in the Github cache of a database (see github_cache.py). """
+    conn = github_cache.open_cache(github_cache.cache_path_for(database))
+    for (_, url) in repositories:
+        (owner, project) = url.split('/')[-2:]
+        body = {'stargazers_count': 42, 'forks_count': 7, 'open_issues_count': 3, 'description': 'generated by benchmark.py',
+                'subscribers_count': 5, 'created_at': '2012-01-01T00:00:00Z', 'language': 'C'}
+        conn.execute('INSERT OR REPLACE INTO GithubApiCache(URL, ETAG, LAST_MODIFIED, BODY, FETCHED) VALUES(?, ?, ?, ?, ?)',
+                ('%s/repos/%s/%s' % (github_cache.api_url, owner, project), None, None, json.dumps(body), time.time()))
+    conn.commit()
+    conn.close()
+
+def run_asm(database, arguments, stdin=None):
+    """ Runs asm.py on a database and returns the seconds that it took. Exits if the command fails. """
+    command = [sys.executable, os.path.join(directory, 'asm.py'), database] + arguments
+    start = time.perf_counter()
+    process = subprocess.run(command, input=stdin, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        print(' '.join(command) + ' failed:')
+        print(process.stdout)
+        exit(-1)
+    return seconds
+
+def summary(seconds):
+    """ Returns the statistics of the durations of several runs of a command. """
+    ordered = sorted(seconds)
+    return {'runs': len(ordered), 'total_seconds': sum(ordered), 'mean_seconds': sum(ordered) / len(ordered),
+            'median_seconds': ordered[len(ordered) // 2], 'min_seconds': ordered[0], 'max_seconds': ordered[-1]}
+
+def benchmark_show_stats(database, work_dir):
+    """ Times show-stats without the report cache (recording the time of each report unit), to fill the cache, and with a
+        filled cache. """
+    output_dir = os.path.join(work_dir, 'stats')
+    os.makedirs(output_dir, exist_ok=True)
+    timings_file = os.path.join(work_dir, 'report_timings.json')
+    uncached = run_asm(database, ['show-stats', '--file=' + output_dir, '--no-report-cache', '--report=json', '--report-timings=' + timings_file])
+    with open(timings_file) as f:
+        unit_seconds = json.load(f)
+    with open(os.path.join(output_dir, 'commands.json')) as f:
+        tables = [name for (name, data) in json.load(f).items() if report.is_table(data)]
+    if os.path.exists(report.cache_path_for(database)):
+        os.remove(report.cache_path_for(database))
+    filling = run_asm(database, ['show-stats', '--file=' + output_dir])
+    cached = run_asm(database, ['show-stats', '--file=' + output_dir])
+    return {'uncached_seconds': uncached, 'filling_cache_seconds': filling, 'cached_seconds': cached,
+            'tables': dict((name, unit_seconds[name]) for name in tables),
+            'units': unit_seconds}
+
+def benchmark_add_asm_sequence(database, instructions, nr_commands, skew, seed):
+    """ Times nr_commands add-asm-sequence commands with new sequences as separate processes and as one batch. """
+    conn = sqlite3.connect(database)
+    existing = set(row[0] for row in conn.execute('SELECT INSTRUCTIONS FROM AsmSequence'))
+    conn.close()
+    # a different seed than for the database, so that most sequences are new
+    rng = random.Random(seed + 1)
+    new_sequences = [';'.join(sequence) for sequence in random_sequences(rng, instructions, nr_commands * 11 + len(existing), skew) if ';'.join(sequence) not in existing]
+    single = [run_asm(database, ['add-asm-sequence', '--instr=' + sequence]) for sequence in new_sequences[:nr_commands]]
+    batch = new_sequences[nr_commands:nr_commands * 11]
+    batch_seconds = run_asm(database, ['batch'], ''.join('add-asm-sequence --instr="%s"\n' % sequence for sequence in batch))
+    return {'single': summary(single), 'batch': {'commands': len(batch), 'seconds': batch_seconds}}
+
+def benchmark_ingestion(database, repositories):
+    """ Times new-project-entry and analyze-project (offline) for each generated repository. """
+    cache_repository_metadata(database, repositories)
+    entries = [run_asm(database, ['new-project-entry', '--file=' + path, '--offline']) for (path, _) in repositories]
+    analyses = [run_asm(database, ['analyze-project', '--file=' + path, '--offline']) for (path, _) in repositories]
+    return {'new-project-entry': summary(entries), 'analyze-project': summary(analyses)}
+
+def benchmark(scale, options, work_dir):
+    """ Creates the database and repositories of a scale in work_dir and times the commands on them. """
+    nr_projects = options.projects * scale
+    nr_sequences = options.sequences * scale
+    database = os.path.join(work_dir, 'benchmark.db')
+    start = time.perf_counter()
+    instructions = create_database(database, nr_projects, nr_sequences, options.instructions, options.skew, options.seed)
+    repositories = create_repositories(work_dir, options.repositories, options.files, options.skew, options.seed)
+    generation_seconds = time.perf_counter() - start
+    conn = sqlite3.connect(database)
+    sizes = {
+        'projects': conn.execute('SELECT COUNT(*) FROM GithubProjectUnfiltered').fetchone()[0],
+        'sequences': conn.execute('SELECT COUNT(*) FROM AsmSequence').fetchone()[0],
+        'instructions': conn.execute('SELECT COUNT(*) FROM AsmInstruction').fetchone()[0],
+        'project_sequences': conn.execute('SELECT COUNT(*) FROM AsmSequencesInGithubProjectUnfiltered').fetchone()[0],
+    }
+    conn.close()
+    # show-stats runs first, so that it reads the generated data only
+    result = {'scale': scale, 'sizes': sizes, 'generation_seconds': generation_seconds}
+    result['show-stats'] = benchmark_show_stats(database, work_dir)
+    result['add-asm-sequence'] = benchmark_add_asm_sequence(database, instructions, options.commands, options.skew, options.seed)
+    result.update(benchmark_ingestion(database, repositories))
+    return result
+
+def parse_scales(scales):
+    try:
+        parsed = [int(scale) for scale in scales.split(',')]
+    except ValueError:
+        parsed = []
+    if len(parsed) == 0 or min(parsed) < 1:
+        print('--scales must be a comma-separated list of positive integers: ' + scales)
+        exit(-1)
+    return parsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks asm.py on synthetic databases and repositories.')
+    parser.add_argument('--scales', default='1,4,16', help='comma-separated factors by which the numbers of projects and sequences are multiplied')
+    parser.add_argument('--projects', type=int, default=250, help='number of projects at scale 1')
+    parser.add_argument('--sequences', type=int, default=500, help='number of distinct instruction sequences at scale 1')
+    parser.add_argument('--instructions', type=int, default=120, help='number of distinct instructions')
+    parser.add_argument('--skew', type=float, default=1.1, help='skew of the Zipf distribution of the popularity of instructions and sequences')
+    parser.add_argument('--repositories', type=int, default=3, help='number of generated Git repositories that are ingested')
+    parser.add_argument('--files', type=int, default=20, help='number of C files per generated repository')
+    parser.add_argument('--commands', type=int, default=5, help='number of add-asm-sequence processes (the batch has ten times as many commands)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random number generator')
+    parser.add_argument('--output', help='file to which the JSON results are written (stdout otherwise)')
+    parser.add_argument('--keep', help='directory in which the databases and repositories of each scale are kept (deleted otherwise)')
+    options = parser.parse_args()
+    results = []
+    for scale in parse_scales(options.scales):
+        if options.keep is None:
+            work_dir = tempfile.mkdtemp(prefix='asm-benchmark-')
+        else:
+            work_dir = os.path.join(options.keep, 'scale%d' % scale)
+            if os.path.exists(work_dir):
+                shutil.rmtree(work_dir)
+            os.makedirs(work_dir)
+        try:
+            print('benchmarking scale %d in %s' % (scale, work_dir), file=sys.stderr)
+            results.append(benchmark(scale, options, work_dir))
+        finally:
+            if options.keep is None:
+                shutil.rmtree(work_dir)
+    output = json.dumps({'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'parameters': vars(options), 'results': results}, indent=2) + '\n'
+    if options.output is None:
+        print(output, end='')
+    else:
+        with open(options.output, 'w') as f:
+            f.write(output)
@@ -0,0 +1,85 @@
+""" Loads the category hierarchies (the application categories of projects
+    and the usage categories of inline assembly sequences) with a single query
+    each and works on them in memory, so that the number of queries does not
+    depend on the depth of a hierarchy.
+"""
+
+import collections
+
+import dbschema
+
+# (category table, query of the (category, project) pairs that are counted in subtree_counts) of each hierarchy; %(sequences)s
+# is AsmSequencesInGithubProject, or the table it is a view of in databases that lack it
+HIERARCHIES = {
+    'application': ('ApplicationCategory', 'SELECT ApplicationCategoryID, GithubProjectID FROM ApplicationCategoriesPerProject'),
+    'usage': ('AsmUsageCategory', 'SELECT AsmUsageCategoryPerSequence.ASM_USAGE_CATEGORY_ID, Sequences.GITHUB_PROJECT_ID FROM AsmUsageCategoryPerSequence, %(sequences)s AS Sequences WHERE AsmUsageCategoryPerSequence.ASM_SEQUENCE_ID = Sequences.ASM_SEQUENCE_ID'),
+}
+
+# names: ID -> name, parents: ID -> SUPER_ID (None for top-level categories), children: ID -> IDs of the subcategories,
+# roots: IDs of the top-level categories (all in ID order)
+Tree = collections.namedtuple('Tree', ['names', 'parents', 'children', 'roots'])
+
+def load(conn, hierarchy='application'):
+    table = HIERARCHIES[hierarchy][0]
+    names = {}
+    parents = {}
+    children = {}
+    roots = []
+    for (category_id, name, super_id) in conn.execute('SELECT ID, NAME, SUPER_ID FROM %s ORDER BY ID' % table):
+        super_id = None if super_id is None else int(super_id)
+        names[category_id] = name
+        parents[category_id] = super_id
+        if super_id is None:
+            roots.append(category_id)
+        else:
+            children.setdefault(super_id, []).append(category_id)
+    return Tree(names, parents, children, roots)
+
+def walk(tree):
+    """ Yields (ID, depth) of the categories that are reachable from the top-level categories in pre-order. """
+    stack = [(root, 0) for root in reversed(tree.roots)]
+    seen = set()
+    while len(stack) != 0:
+        (category_id, depth) = stack.pop()
+        if category_id in seen:
+            continue
+        seen.add(category_id)
+        yield (category_id, depth)
+        stack += [(child, depth + 1) for child in reversed(tree.children.get(category_id, []))]
+
+def find_cycles(tree):
+    """ Returns the cycles of SUPER_ID references as lists of IDs (starting with the smallest ID). Categories in a cycle (and
+        their subcategories) are not reachable from the top-level categories. """
+    cycles = []
+    done = set()
+    for start in tree.names:
+        path = []
+        on_path = {}
+        category_id = start
+        while category_id is not None and category_id in tree.names and category_id not in done:
+            if category_id in on_path:
+                cycle = path[on_path[category_id]:]
+                smallest = cycle.index(min(cycle))
+                cycles.append(cycle[smallest:] + cycle[:smallest])
+                break
+            on_path[category_id] = len(path)
+            path.append(category_id)
+            category_id = tree.parents[category_id]
+        done.update(path)
+    return sorted(cycles)
+
+def subtree_counts(conn, tree, hierarchy='application'):
+    """ Returns a dictionary that maps the ID of each reachable category to the number of distinct projects that are in the
+        category or in one of its subcategories. """
+    members = {}
+    sequences = dbschema.first_existing(conn, ['AsmSequencesInGithubProject', 'AsmSequencesInGithubProjectUnfiltered'])
+    for (category_id, project_id) in conn.execute(HIERARCHIES[hierarchy][1] % {'sequences': sequences}):
+        members.setdefault(category_id, set()).add(project_id)
+    subtrees = {}
+    # subcategories follow their category in pre-order, so they are done first in reverse pre-order
+    for (category_id, _) in reversed(list(walk(tree))):
+        projects = set(members.get(category_id, ()))
+        for child in tree.children.get(category_id, []):
+            projects |= subtrees.get(child, set())
+        subtrees[category_id] = projects
+    return dict((category_id, len(projects)) for (category_id, projects) in subtrees.items())
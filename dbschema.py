@@ -0,0 +1,11 @@
+""" Helpers for the modules that read databases whose schema differs from
+    schema.sql (e.g., databases in which AsmSequencesInGithubProject is a view
+    over AsmSequencesInGithubProjectUnfiltered, or in which it is missing).
+"""
+
+def first_existing(conn, names):
+    """ Returns the first of the given tables or views that exists in the database. """
+    for name in names:
+        if conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (name, )).fetchone()[0] != 0:
+            return name
+    raise LookupError('none of %s exists' % ', '.join(names))
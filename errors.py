@@ -0,0 +1,5 @@
+""" The exception of the modules of asm.py for invalid arguments and input. """
+
+class InputError(ValueError):
+    """ Raised for an argument or input that is not in the format that a module expects. asm.py's main prints its message
+        and exits. """
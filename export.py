@@ -0,0 +1,153 @@
+""" Exports the projects, instructions, sequences, and the instructions of all
+    sequences in projects (occurrences) to files for analyses outside SQLite.
+
+    Rows are streamed in chunks, so memory does not grow with the size of the
+    database. Parquet and Arrow IPC files are written if pyarrow is installed;
+    CSV files are written otherwise (or on request). With dictionary encoding,
+    the occurrences refer to instructions by ID (see instructions.<format>)
+    instead of repeating the instruction names.
+"""
+
+import csv
+import os
+
+import dbschema
+import errors
+
+FORMATS = ['parquet', 'arrow', 'csv']
+
+def has_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+def columns_of(conn, source):
+    """ Returns the (name, declared type, default) of the columns of a table or view. """
+    return [(row[1], row[2].upper(), row[4]) for row in conn.execute('PRAGMA table_info(%s)' % source)]
+
+def exported_source(conn, names):
+    """ Returns the first of the given tables or views that exists (see dbschema.first_existing). """
+    try:
+        return dbschema.first_existing(conn, names)
+    except LookupError as e:
+        raise errors.InputError('cannot export: ' + str(e))
+
+def exported_columns(conn, source, required, optional=()):
+    """ Returns the columns (see columns_of) of a table or view that are required or optional, in the order of the table.
+        Raises InputError if a required column is missing. """
+    columns = [column for column in columns_of(conn, source) if column[0] in required or column[0] in optional]
+    missing = [name for name in required if name not in [column[0] for column in columns]]
+    if len(missing) != 0:
+        raise errors.InputError('cannot export: %s lacks %s' % (source, ', '.join(missing)))
+    return columns
+
+def occurrence_query(conn, dictionary):
+    """ Returns the query of the instructions of all sequences in projects (one row per instruction of a sequence in a file)
+        and its source columns (see columns_of). Columns that older databases lack (e.g., NR_OCCURRENCES) are omitted. """
+    source = exported_source(conn, ['AsmSequencesInGithubProject', 'AsmSequencesInGithubProjectUnfiltered'])
+    sequence_columns = exported_columns(conn, source, ('GITHUB_PROJECT_ID', 'IN_FILE', 'ASM_SEQUENCE_ID'), ('MNEMONIC', 'NR_OCCURRENCES', 'HAS_FALLBACK'))
+    instruction_number = ('INSTRUCTION_NUMBER', 'INTEGER', None)
+    if dictionary:
+        instruction_column = ('ASM_INSTRUCTION_ID', 'INTEGER', None)
+        joins = ''
+        select = 'AsmSequenceInstruction.ASM_INSTRUCTION_ID'
+    else:
+        instruction_column = ('INSTRUCTION', 'TEXT', None)
+        joins = ' JOIN AsmInstruction ON AsmInstruction.ID = AsmSequenceInstruction.ASM_INSTRUCTION_ID'
+        select = 'AsmInstruction.INSTRUCTION'
+    query = 'SELECT %s, AsmSequenceInstruction.INSTRUCTION_NUMBER, %s FROM %s AS Sequences JOIN AsmSequenceInstruction ON AsmSequenceInstruction.ASM_SEQUENCE_ID = Sequences.ASM_SEQUENCE_ID%s' % (
+            ', '.join('Sequences.' + column[0] for column in sequence_columns), select, source, joins)
+    return (query, sequence_columns + [instruction_number, instruction_column])
+
+def chunks(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if len(rows) == 0:
+            return
+        yield rows
+
+def arrow_type(column):
+    """ Maps a declared SQLite column type to an Arrow type. Columns with a text default (e.g., HAS_FALLBACK) are strings. """
+    import pyarrow
+    (_, declared, default) = column
+    if default is not None and default.startswith("'"):
+        return pyarrow.string()
+    if 'INT' in declared:
+        return pyarrow.int64()
+    if 'REAL' in declared or 'FLOA' in declared or 'DOUB' in declared:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+def write_csv(path, columns, row_chunks):
+    nr_rows = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([column[0] for column in columns])
+        for rows in row_chunks:
+            writer.writerows(rows)
+            nr_rows += len(rows)
+    return nr_rows
+
+def arrow_batches(schema, row_chunks):
+    import pyarrow
+    for rows in row_chunks:
+        arrays = []
+        for (field, values) in zip(schema, zip(*rows)):
+            if pyarrow.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+def write_parquet(path, columns, row_chunks):
+    import pyarrow
+    import pyarrow.parquet
+    schema = pyarrow.schema([(column[0], arrow_type(column)) for column in columns])
+    nr_rows = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for batch in arrow_batches(schema, row_chunks):
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+            nr_rows += batch.num_rows
+    return nr_rows
+
+def write_arrow(path, columns, row_chunks):
+    import pyarrow
+    import pyarrow.ipc
+    schema = pyarrow.schema([(column[0], arrow_type(column)) for column in columns])
+    nr_rows = 0
+    with pyarrow.OSFile(path, 'wb') as sink:
+        with pyarrow.ipc.new_file(sink, schema) as writer:
+            for batch in arrow_batches(schema, row_chunks):
+                writer.write_batch(batch)
+                nr_rows += batch.num_rows
+    return nr_rows
+
+writers = {'parquet': write_parquet, 'arrow': write_arrow, 'csv': write_csv}
+
+def export(conn, output_dir, format=None, dictionary=False, chunk_size=65536):
+    """ Exports the dataset to output_dir in the given format (parquet if pyarrow is installed and csv otherwise by default).
+        Returns (file, number of rows) of the written files. Raises InputError if the database lacks a table or column that
+        is exported. """
+    if format is None:
+        format = 'parquet' if has_pyarrow() else 'csv'
+    if format != 'csv' and not has_pyarrow():
+        raise ImportError('the %s format requires pyarrow' % format)
+    os.makedirs(output_dir, exist_ok=True)
+    projects = exported_source(conn, ['GithubProject', 'GithubProjectUnfiltered'])
+    project_columns = columns_of(conn, projects)
+    sequence_columns = exported_columns(conn, 'AsmSequence', ('ID', 'INSTRUCTIONS'))
+    instruction_columns = exported_columns(conn, 'AsmInstruction', ('ID', 'INSTRUCTION'))
+    (occurrences, occurrence_columns) = occurrence_query(conn, dictionary)
+    exports = [
+        ('projects', 'SELECT * FROM ' + projects, project_columns),
+        ('instructions', 'SELECT ID, INSTRUCTION FROM AsmInstruction', instruction_columns),
+        ('sequences', 'SELECT ID, INSTRUCTIONS FROM AsmSequence', sequence_columns),
+        ('occurrences', occurrences, occurrence_columns),
+    ]
+    written = []
+    for (name, query, columns) in exports:
+        path = os.path.join(output_dir, name + '.' + format)
+        cursor = conn.execute(query)
+        written.append((path, writers[format](path, columns, chunks(cursor, chunk_size))))
+    return written
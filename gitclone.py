@@ -0,0 +1,68 @@
+""" Clones Github projects with one of several strategies:
+
+    full     a plain git clone
+    partial  only the blobs of C/C++/assembly files (and .mailmap) are
+             downloaded and checked out (--filter=blob:none and a sparse
+             checkout); the complete commit history is available, as every
+             project entry stores metrics of all commits (see gitmetrics.py)
+
+    If a reference directory is given, a local mirror <owner>-<project>.git
+    (or <owner>-<project>) in it is used as an alternate object store. The
+    strategy is recorded in the asm.clonestrategy option of the clone.
+"""
+
+import os
+import subprocess
+
+import linecount
+import profiler
+import scanner
+
+STRATEGIES = ['full', 'partial']
+
+def sparse_patterns():
+    """ Returns the sparse checkout patterns of the files that we scan or count. """
+    extensions = set(scanner.SOURCE_EXTENSIONS) | set(linecount.extensions) | set(('.C', ))
+    return ['.mailmap'] + ['*' + extension for extension in sorted(extensions)]
+
+def reference_for(reference_dir, name):
+    if reference_dir is None:
+        return None
+    for candidate in (name + '.git', name):
+        path = os.path.join(reference_dir, candidate)
+        if os.path.isdir(path):
+            return path
+    return None
+
+def git(arguments, cwd, quiet):
+    with profiler.command(['git'] + arguments):
+        process = subprocess.Popen(['git'] + arguments, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL if quiet else None)
+        process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError('git %s failed with exit code %d' % (arguments[0], process.returncode))
+
+def clone(url, path, strategy='full', reference_dir=None, quiet=True):
+    """ Clones url into path using the given strategy. """
+    if strategy not in STRATEGIES:
+        raise ValueError('unknown clone strategy ' + strategy)
+    arguments = ['clone', '-c', 'asm.clonestrategy=' + strategy]
+    if quiet:
+        arguments.append('--quiet')
+    reference = reference_for(reference_dir, os.path.basename(path))
+    if reference is not None:
+        arguments += ['--reference', reference]
+    if strategy != 'full':
+        arguments += ['--filter=blob:none', '--no-checkout']
+    git(arguments + [url, path], os.path.dirname(path) or '.', quiet)
+    if strategy != 'full':
+        git(['sparse-checkout', 'set', '--no-cone'] + sparse_patterns(), path, quiet)
+        git(['checkout', '--quiet'], path, quiet)
+
+def clone_strategy(path):
+    """ Returns the strategy with which a project directory was cloned (full for clones that do not record it). """
+    with profiler.command(['git', 'config', '--get', 'asm.clonestrategy']) as details:
+        process = subprocess.Popen(['git', 'config', '--get', 'asm.clonestrategy'], cwd=path, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+        stdout, _ = process.communicate()
+        details['bytes'] = len(stdout)
+    strategy = stdout.decode().strip()
+    return strategy if strategy != '' else 'full'
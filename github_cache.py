@@ -0,0 +1,100 @@
+""" Cached access to the Github REST API.
+
+    Responses are stored with their ETag and Last-Modified headers in a SQLite
+    file next to the database. Cached entries are revalidated with conditional
+    requests (which do not count against the rate limit), and requests wait
+    until X-RateLimit-Reset once X-RateLimit-Remaining drops to zero. In offline
+    mode, only the cache is used.
+
+    The API endpoint can be changed with the GITHUB_API_URL environment variable
+    (e.g., to test against a local server); GITHUB_TOKEN is sent as a token if set.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import profiler
+
+api_url = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+
+lock = threading.Lock()
+# UNIX time before which no further request should be sent
+rate_limit_reset = 0
+
+def cache_path_for(database):
+    return database + '.github-cache'
+
+def open_cache(cache_path):
+    conn = sqlite3.connect(cache_path, timeout=60)
+    conn.execute('CREATE TABLE IF NOT EXISTS GithubApiCache(URL TEXT PRIMARY KEY, ETAG TEXT, LAST_MODIFIED TEXT, BODY TEXT NOT NULL, FETCHED REAL NOT NULL)')
+    return conn
+
+def wait_for_rate_limit():
+    with lock:
+        reset = rate_limit_reset
+    delay = reset - time.time()
+    if delay > 0:
+        print('Github rate limit reached, waiting %d seconds' % delay)
+        time.sleep(delay)
+
+def update_rate_limit(headers):
+    """ Records when requests can be sent again based on the rate limit headers of a response. """
+    global rate_limit_reset
+    if headers is None:
+        return
+    reset = None
+    if headers.get('Retry-After') is not None:
+        reset = time.time() + int(headers.get('Retry-After'))
+    elif headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset') is not None:
+        reset = int(headers.get('X-RateLimit-Reset')) + 1
+    if reset is not None:
+        with lock:
+            rate_limit_reset = max(rate_limit_reset, reset)
+
+def get_json(cache_path, url, offline=False, max_retries=3):
+    """ Returns the decoded JSON of a Github API URL, using and updating the cache. """
+    conn = open_cache(cache_path)
+    try:
+        cached = conn.execute('SELECT ETAG, LAST_MODIFIED, BODY FROM GithubApiCache WHERE URL = ?', (url, )).fetchone()
+        if offline:
+            if cached is None:
+                raise LookupError(url + ' is not cached (offline mode)')
+            return json.loads(cached[2])
+        headers = {'Accept': 'application/vnd.github.v3+json', 'User-Agent': 'asm.py'}
+        if os.environ.get('GITHUB_TOKEN') is not None:
+            headers['Authorization'] = 'token ' + os.environ.get('GITHUB_TOKEN')
+        if cached is not None and cached[0] is not None:
+            headers['If-None-Match'] = cached[0]
+        if cached is not None and cached[1] is not None:
+            headers['If-Modified-Since'] = cached[1]
+        for attempt in range(max_retries + 1):
+            wait_for_rate_limit()
+            try:
+                with profiler.phase('request', 'github', url=url) as details, urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+                    update_rate_limit(response.headers)
+                    body = response.read().decode()
+                    details['bytes'] = len(body)
+                    conn.execute('INSERT OR REPLACE INTO GithubApiCache(URL, ETAG, LAST_MODIFIED, BODY, FETCHED) VALUES(?, ?, ?, ?, ?)',
+                            (url, response.headers.get('ETag'), response.headers.get('Last-Modified'), body, time.time()))
+                    conn.commit()
+                    return json.loads(body)
+            except urllib.error.HTTPError as e:
+                update_rate_limit(e.headers)
+                if e.code == 304 and cached is not None:
+                    conn.execute('UPDATE GithubApiCache SET FETCHED = ? WHERE URL = ?', (time.time(), url))
+                    conn.commit()
+                    return json.loads(cached[2])
+                rate_limited = e.code == 429 or (e.code == 403 and (e.headers.get('X-RateLimit-Remaining') == '0' or e.headers.get('Retry-After') is not None))
+                if not rate_limited or attempt == max_retries:
+                    raise
+    finally:
+        conn.close()
+
+def get_repository(cache_path, owner, project, offline=False):
+    """ Returns the metadata of a Github repository (see https://developer.github.com/v3/repos/#get). """
+    return get_json(cache_path, '%s/repos/%s/%s' % (api_url, owner, project), offline)
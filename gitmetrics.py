@@ -0,0 +1,62 @@
+""" Collects the metrics of a Git repository that we store per project from a
+    single streamed git log pass. """
+
+import collections
+import configparser
+import os
+import subprocess
+
+import profiler
+
+# url: origin URL, commit_count: number of commits without merges,
+# committer_count: see committer_count_of, first_commit_date and
+# last_commit_date: author UNIX timestamps, last_commit_hash: hash of HEAD
+RepoMetrics = collections.namedtuple('RepoMetrics', ['url', 'commit_count', 'committer_count', 'first_commit_date', 'last_commit_date', 'last_commit_hash'])
+
+def read_origin_url(path):
+    """ Returns the origin URL of a repository by reading .git/config (falling back to git config, e.g., for worktrees). """
+    config_file = os.path.join(path, '.git', 'config')
+    if os.path.isfile(config_file):
+        config = configparser.ConfigParser(strict=False, interpolation=None)
+        try:
+            config.read(config_file)
+            return config.get('remote "origin"', 'url').strip()
+        except (configparser.Error, UnicodeDecodeError):
+            pass
+    with profiler.command(['git', 'config', '--get', 'remote.origin.url']) as details:
+        process = subprocess.Popen(['git', 'config', '--get', 'remote.origin.url'], cwd=path, stdout=subprocess.PIPE)
+        stdout, _ = process.communicate()
+        details['bytes'] = len(stdout)
+    return stdout.decode().strip("\n")
+
+def committer_count_of(authors):
+    # git shortlog -sn printed one line per author plus a trailing newline that
+    # was counted as well; keep the value comparable with existing rows
+    return len(authors) + 1
+
+def collect(path):
+    """ Returns the RepoMetrics of a repository. git log is read line by line, so memory does not grow with the number of commits. """
+    arguments = ['git', 'log', '--format=%H%x09%at%x09%P%x09%aN', 'HEAD']
+    commit_count = 0
+    authors = set()
+    last_hash = None
+    last_date = None
+    first_date = None
+    with profiler.command(arguments) as details:
+        process = subprocess.Popen(arguments, cwd=path, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+        output_bytes = 0
+        for line in process.stdout:
+            output_bytes += len(line)
+            (commit_hash, timestamp, parents, author) = line.decode('ISO-8859-1').rstrip('\n').split('\t', 3)
+            if last_hash is None:
+                last_hash = commit_hash
+                last_date = int(timestamp)
+            first_date = int(timestamp)
+            if len(parents.split()) <= 1:
+                commit_count += 1
+            authors.add(author)
+        process.wait()
+        details['bytes'] = output_bytes
+    if process.returncode != 0 or last_hash is None:
+        raise RuntimeError('git log failed in ' + path)
+    return RepoMetrics(read_origin_url(path), commit_count, committer_count_of(authors), first_date, last_date, last_hash)
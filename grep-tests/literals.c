@@ -0,0 +1,9 @@
+int main() {
+	int result, x;
+	puts("src/*");
+	__asm__("bswap %0" : "=r" (result) : "0" (x));
+	puts("http://x"); asm("nop");
+	char quote = '"'; asm("nop");
+	puts("asm(\"nop\")"); /* asm("nop"); */
+	// asm("nop");
+}
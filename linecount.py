@@ -0,0 +1,68 @@
+""" Counts lines of code like cloc (https://github.com/AlDanial/cloc) for the
+    languages that we report: C, C/C++ Header, C++, and Assembly.
+
+    A line is a code line if it is not blank after removing comments. As in
+    cloc, files with identical contents are only counted once per tree.
+"""
+
+import collections
+import hashlib
+import os
+import re
+
+C = 'C'
+HEADER = 'C/C++ Header'
+CPP = 'C++'
+ASSEMBLY = 'Assembly'
+
+# file extensions as assigned by cloc (case-sensitive, e.g., .C is C++ and .H is a header)
+extensions = {
+    '.c': C, '.cats': C, '.ec': C, '.idc': C, '.pgc': C,
+    '.h': HEADER, '.H': HEADER, '.hh': HEADER, '.hpp': HEADER, '.hxx': HEADER,
+    '.C': CPP, '.c++': CPP, '.cc': CPP, '.CPP': CPP, '.cpp': CPP, '.cxx': CPP, '.h++': CPP, '.inl': CPP, '.ipp': CPP, '.pcc': CPP, '.tcc': CPP, '.tpp': CPP,
+    '.s': ASSEMBLY, '.S': ASSEMBLY, '.asm': ASSEMBLY, '.a51': ASSEMBLY, '.nasm': ASSEMBLY,
+}
+
+# matches comments as well as string and character literals (so that comment markers within them are ignored)
+c_comment_regex = re.compile(rb'//(?:[^\n\\]|\\.)*|/\*.*?(?:\*/|\Z)|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'', re.S)
+# lines that cloc considers to be comments in assembly files
+assembly_comment_regex = re.compile(rb'^\s*(?:#|;|@|\||!|--)')
+
+def language_of(name):
+    """ Returns the language of a file name, or None if it is not counted. """
+    return extensions.get(os.path.splitext(name)[1])
+
+def strip_c_comments(data):
+    def replace(match):
+        text = match.group()
+        if text[:1] == b'/':
+            return b'\n' * text.count(b'\n')
+        return text
+    return c_comment_regex.sub(replace, data)
+
+def count_code_lines(language, data):
+    """ Returns the number of code lines in the bytes of a file written in the given language. """
+    lines = strip_c_comments(data).split(b'\n')
+    if language == ASSEMBLY:
+        return sum(1 for line in lines if line.strip() != b'' and not assembly_comment_regex.match(line))
+    return sum(1 for line in lines if line.strip() != b'')
+
+def digest(data):
+    return hashlib.md5(data).digest()
+
+def add_counts(counts, seen, language, lines, file_digest):
+    """ Adds the lines of a file to a language->lines counter unless a file with the same digest has been counted before. """
+    if file_digest in seen:
+        return
+    seen.add(file_digest)
+    counts[language] += lines
+
+def count_blobs(blobs):
+    """ Counts the code lines per language of (file name, bytes) pairs. """
+    counts = collections.Counter()
+    seen = set()
+    for (name, data) in blobs:
+        language = language_of(name)
+        if language is not None:
+            add_counts(counts, seen, language, count_code_lines(language, data), digest(data))
+    return counts
@@ -0,0 +1,60 @@
+""" Schema migrations of the inline assembly database.
+
+    PRAGMA user_version stores the number of migrations that have been applied
+    to a database; migrate applies the remaining ones in order. As the
+    databases in use differ from schema.sql (e.g., AsmSequencesInGithubProject
+    is a view over AsmSequencesInGithubProjectUnfiltered), migrations skip the
+    tables that do not exist.
+"""
+
+# (index name, table, columns) of the columns that are used in lookups and joins
+lookup_indexes = [
+    ('AsmInstructionInstruction', 'AsmInstruction', ['INSTRUCTION']),
+    ('AsmSequenceInstructions', 'AsmSequence', ['INSTRUCTIONS']),
+    ('AsmSequenceInstructionSequence', 'AsmSequenceInstruction', ['ASM_SEQUENCE_ID', 'ASM_INSTRUCTION_ID']),
+    ('AsmSequenceInstructionInstruction', 'AsmSequenceInstruction', ['ASM_INSTRUCTION_ID', 'ASM_SEQUENCE_ID']),
+    ('AsmSequencesInGithubProjectProject', 'AsmSequencesInGithubProject', ['GITHUB_PROJECT_ID', 'ASM_SEQUENCE_ID']),
+    ('AsmSequencesInGithubProjectSequence', 'AsmSequencesInGithubProject', ['ASM_SEQUENCE_ID']),
+    ('AsmSequencesInGithubProjectUnfilteredProject', 'AsmSequencesInGithubProjectUnfiltered', ['GITHUB_PROJECT_ID', 'ASM_SEQUENCE_ID']),
+    ('AsmSequencesInGithubProjectUnfilteredSequence', 'AsmSequencesInGithubProjectUnfiltered', ['ASM_SEQUENCE_ID']),
+    ('GithubProjectUnfilteredUrl', 'GithubProjectUnfiltered', ['GITHUB_URL']),
+    ('ApplicationCategoriesPerProjectProject', 'ApplicationCategoriesPerProject', ['GithubProjectID', 'ApplicationCategoryID']),
+    ('ApplicationCategoriesPerProjectCategory', 'ApplicationCategoriesPerProject', ['ApplicationCategoryID']),
+    ('ApplicationCategorySuper', 'ApplicationCategory', ['SUPER_ID']),
+    ('AsmUsageCategoryPerSequenceSequence', 'AsmUsageCategoryPerSequence', ['ASM_SEQUENCE_ID', 'ASM_USAGE_CATEGORY_ID']),
+    ('AsmUsageCategorySuper', 'AsmUsageCategory', ['SUPER_ID']),
+]
+
+def table_exists(conn, table):
+    return conn.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table, )).fetchone()[0] != 0
+
+def has_index(conn, table, columns):
+    """ Returns whether an existing index of a table starts with the given columns. """
+    for index in conn.execute('PRAGMA main.index_list(%s)' % table).fetchall():
+        indexed = [row[2] for row in conn.execute('PRAGMA main.index_info(%s)' % index[1]).fetchall()]
+        if indexed[:len(columns)] == columns:
+            return True
+    return False
+
+def add_lookup_indexes(conn):
+    for (name, table, columns) in lookup_indexes:
+        if table_exists(conn, table) and not has_index(conn, table, columns):
+            conn.execute('CREATE INDEX IF NOT EXISTS main.%s ON %s(%s)' % (name, table, ', '.join(columns)))
+    conn.execute('ANALYZE main')
+
+def add_table_versions(conn):
+    """ Creates TableVersion, which counts the transactions of asm.py that wrote each table (see asm.count_table_versions),
+        so that the report cache can tell whether a table changed without reading it (see report.table_digest). """
+    conn.execute('CREATE TABLE IF NOT EXISTS main.TableVersion(NAME TEXT NOT NULL COLLATE NOCASE, VERSION INTEGER NOT NULL, PRIMARY KEY(NAME))')
+
+migrations = [add_lookup_indexes, add_table_versions]
+
+def migrate(conn):
+    """ Applies the migrations that have not been applied to a database yet. Empty databases are not touched. """
+    if conn.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE type = 'table'").fetchone()[0] == 0:
+        return
+    version = conn.execute('PRAGMA main.user_version').fetchone()[0]
+    for (number, migration) in enumerate(migrations[version:], version + 1):
+        migration(conn)
+        conn.execute('PRAGMA main.user_version = %d' % number)
+        conn.commit()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# vim:set ts=8 sts=8 sw=8 tw=80 cc=80 noet:
+""" Turns inline assembly templates into lists of instruction mnemonics.
+    Prints the mnemonics of the templates read from stdin, one template per
+    line with ; between its instructions:
+
+        echo 'lock; cmpxchgl %2, %1' | ./mnemonics.py
+"""
+
+import re
+import sys
+
+MULTI = set(("lock", "rep", "repe", "repz", "repne", "repnz"))
+
+WITH_SUFFIX = set(("bswap", "cmova", "cmovae", "cmovb", "cmovbe", "cmovc",
+    "cmove", "cmovg", "cmovge", "cmovl", "cmovle", "cmovna", "cmovnae",
+    "cmovnb", "cmovnbe", "cmovnc", "cmovne", "cmovng", "cmovnge", "cmovnl",
+    "cmovnle", "cmovno", "cmovnp", "cmovns", "cmovnz", "cmovo", "cmovp",
+    "cmovpe", "cmovpo", "cmovs", "cmovz", "cmpxchg", "mov", "movabs",
+    "movsb", "movzb", "pop", "push", "xadd", "xchg", "adc", "add", "cmp",
+    "dec", "div", "idiv", "imul", "inc", "mul", "neg", "sbb", "sub", "and",
+    "not", "or", "xor", "rcl", "rcr", "rol", "ror", "sal", "sar", "shl",
+    "shld", "shr", "shrd", "bsf", "bsr", "bt", "btc", "btr", "bts", "test",
+    "bound", "cmps", "lods", "movs", "scas", "stos", "ins", "outs", "pushf",
+    "popf", "lds", "les", "lfs", "lgs", "lss", "lea", "crc32"))
+
+# mnemonics whose first operand is part of the instruction
+WITH_OPERAND = set(("int",))
+
+label_regex = re.compile(r'^\s*[\w.$]+:(?!:)')
+
+def strip_labels(asm):
+    out = ""
+    for line in asm.splitlines():
+        l = label_regex.sub('', line, count=1)
+        if ".align" in l:
+            l = ""
+        out += l.strip() + "\n"
+    return out
+
+def get_mnemonics(asm):
+    out = []
+    for line in asm.splitlines():
+        tokens = line.split()
+        if len(tokens) > 0:
+            mnemonic = tokens[0]
+            if len(mnemonic) > 0:
+                if mnemonic in MULTI or mnemonic in WITH_OPERAND:
+                    out += [ " ".join(tokens[0:2]) ]
+                else:
+                    out += [ mnemonic ]
+    return out
+
+def get_instructions(asm):
+    """ Strips the operand size suffixes (e.g., movl -> mov, lock cmpxchgq ->
+        lock cmpxchg). """
+    out = []
+    for insn in asm:
+        prefix, _, mnemonic = insn.rpartition(" ")
+        if mnemonic not in WITH_SUFFIX and mnemonic[-1:] in "bwlq" and \
+                mnemonic[:-1] in WITH_SUFFIX:
+            mnemonic = mnemonic[:-1]
+        out += [ (prefix + " " + mnemonic).lstrip() ]
+    return out
+
+def template_mnemonics(template):
+    """ Returns the mnemonics of an assembly template (as extracted by scanner.py) in order. """
+    asm = template.lower().replace(";", "\n")
+    return get_instructions(get_mnemonics(strip_labels(asm)))
+
+if __name__ == "__main__":
+    for line in sys.stdin:
+        print(";".join(template_mnemonics(line)))
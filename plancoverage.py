@@ -0,0 +1,119 @@
+""" Plans in which order instructions should be implemented (e.g., in an
+    emulator) to support as many of the analyzed projects as early as possible.
+
+    The project x instruction incidence matrix is loaded once. A project is
+    covered when all of its instructions are implemented. evaluate computes
+    the number of covered projects after each instruction of an ordering by
+    updating the number of missing instructions of the projects that use the
+    added instruction, so that trying many orderings is cheap. greedy_order
+    repeatedly adds the missing instructions of the uncovered projects that
+    cover the most projects per added instruction.
+"""
+
+import collections
+import csv
+
+# instructions: names of the instructions, index: maps names to indexes, project_masks: the instructions of each project as
+# bitmask over the indexes, instruction_projects: the indexes of the projects that use each instruction
+Incidence = collections.namedtuple('Incidence', ['instructions', 'index', 'project_masks', 'instruction_projects'])
+
+def load_incidence(conn):
+    """ Loads the instructions of the completely analyzed projects. """
+    instructions = []
+    index = {}
+    projects = {}
+    for (project_id, instruction) in conn.execute('SELECT GITHUB_PROJECT_ID, INSTRUCTION FROM AsmInstructionsInAnalyzedGithubProjects ORDER BY GITHUB_PROJECT_ID'):
+        if instruction not in index:
+            index[instruction] = len(instructions)
+            instructions.append(instruction)
+        projects[project_id] = projects.get(project_id, 0) | (1 << index[instruction])
+    project_masks = list(projects.values())
+    instruction_projects = [[] for _ in instructions]
+    for (project, mask) in enumerate(project_masks):
+        for instruction in bits(mask):
+            instruction_projects[instruction].append(project)
+    return Incidence(instructions, index, project_masks, instruction_projects)
+
+def bits(mask):
+    bit = 0
+    while mask != 0:
+        if mask & 1:
+            yield bit
+        mask >>= 1
+        bit += 1
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+def evaluate(incidence, ordering):
+    """ Returns the number of covered projects after each instruction (name) of an ordering. Unknown and repeated
+        instructions cover no further projects. """
+    missing = [popcount(mask) for mask in incidence.project_masks]
+    covered = 0
+    added = set()
+    counts = []
+    for instruction in ordering:
+        index = incidence.index.get(instruction)
+        if index is not None and index not in added:
+            added.add(index)
+            for project in incidence.instruction_projects[index]:
+                missing[project] -= 1
+                if missing[project] == 0:
+                    covered += 1
+        counts.append(covered)
+    return counts
+
+def best_missing_set(missing):
+    """ Returns the missing instructions (a bitmask) that cover the most uncovered projects per instruction, given the numbers
+        of uncovered projects per missing bitmask. Ties are broken by more covered projects. """
+    candidates = sorted((popcount(mask), mask, count) for (mask, count) in missing.items())
+    nr_uncovered = sum(missing.values())
+    # number of uncovered projects that miss at most as many instructions as each candidate
+    nr_up_to = []
+    for (size, _, count) in candidates:
+        nr_up_to.append((nr_up_to[-1] if len(nr_up_to) != 0 else 0) + count)
+    for i in range(len(candidates) - 2, -1, -1):
+        if candidates[i][0] == candidates[i + 1][0]:
+            nr_up_to[i] = nr_up_to[i + 1]
+    best = None
+    for (i, (size, mask, _)) in enumerate(candidates):
+        if best is not None:
+            # no candidate of this size (or larger) can cover more projects than are uncovered
+            if nr_uncovered * best[1] < best[0] * size:
+                break
+            if nr_up_to[i] * best[1] < best[0] * size:
+                continue
+        if 1 << size <= nr_up_to[i]:
+            # enumerate the subsets of the candidate
+            gain = 0
+            subset = mask
+            while subset != 0:
+                gain += missing.get(subset, 0)
+                subset = (subset - 1) & mask
+        else:
+            gain = sum(count for (other_size, other, count) in candidates if other_size <= size and other & ~mask == 0)
+        # compare gain / size with best_gain / best_size
+        if best is None or gain * best[1] > best[0] * size or (gain * best[1] == best[0] * size and gain > best[0]):
+            best = (gain, size, mask)
+    return best[2]
+
+def greedy_order(incidence):
+    """ Returns an ordering of all instructions. Each step adds the missing instructions of the uncovered projects that cover the
+        most projects per added instruction; within a step, instructions that more projects use come first. """
+    implemented = 0
+    ordering = []
+    uncovered = collections.Counter(incidence.project_masks)
+    while len(uncovered) != 0:
+        missing = collections.Counter()
+        for (mask, count) in uncovered.items():
+            missing[mask & ~implemented] += count
+        added = best_missing_set(missing)
+        ordering += sorted((incidence.instructions[index] for index in bits(added)), key=lambda instruction: (-len(incidence.instruction_projects[incidence.index[instruction]]), instruction))
+        implemented |= added
+        uncovered = collections.Counter(dict((mask, count) for (mask, count) in uncovered.items() if mask & ~implemented != 0))
+    return ordering
+
+def read_ordering(file_name):
+    """ Reads an ordering from a CSV file with any number of instructions per line (e.g., "rdtsc","rdtscp",""). """
+    with open(file_name, newline='') as f:
+        return [instruction for row in csv.reader(f) for instruction in row]
@@ -0,0 +1,184 @@
+""" Records where the time of a command goes (see the --profile option of
+    asm.py).
+
+    Phases (e.g., scanning a project or computing a report unit) are recorded
+    with phase, subprocesses with command. The SQL statements of a connection
+    are recorded with watch, which installs the trace callback of sqlite3
+    (called when a statement starts) and a progress handler (called every
+    progress_steps virtual machine instructions). As there is no callback when
+    a statement ends, a statement is timed until the next statement of the
+    connection starts or a phase ends, so its time includes fetching and
+    processing its rows. Its rows are the rows that it changed. Statements
+    that differ only in their literals are aggregated.
+
+    Until enable is called, nothing is recorded and phase and command only
+    yield a dictionary. write_trace writes the events in the Chrome trace event
+    format (e.g., for chrome://tracing or https://ui.perfetto.dev), summary
+    returns the slowest phases, subprocesses, statements, and projects.
+"""
+
+import collections
+import contextlib
+import os
+import re
+import threading
+import time
+
+# number of virtual machine instructions between two calls of the progress handler
+progress_steps = 1000
+# statements that take less time are only aggregated, not written to the trace
+min_statement_event_seconds = 0.0005
+# (category, title) of the sections of the summary that aggregate events by name
+summary_sections = [('command', 'commands'), ('phase', 'phases'), ('report unit', 'report units'), ('github', 'Github requests'), ('subprocess', 'subprocesses')]
+# categories of the events that are listed individually as the slowest projects
+project_categories = ['project', 'batch', 'request']
+
+literal_regex = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|(?<![A-Za-z0-9_])-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?")
+whitespace_regex = re.compile(r'\s+')
+
+enabled = False
+origin = time.perf_counter()
+lock = threading.Lock()
+events = []
+thread_names = {}
+# normalized statement -> [executions, seconds, seconds of the slowest execution, slowest execution, changed rows, VM instructions]
+statements = {}
+# the watched connection, the thread that uses it, its trace callback, and [statement, start, progress handler calls, total
+# changes at start] of the statement that runs on it
+watched = None
+watched_thread = None
+watched_trace = None
+current = None
+
+def enable():
+    global enabled, origin
+    enabled = True
+    origin = time.perf_counter()
+
+def add_event(name, category, start, end, details):
+    thread = threading.current_thread()
+    with lock:
+        thread_names[thread.ident] = thread.name
+        events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': (start - origin) * 1e6, 'dur': (end - start) * 1e6,
+                'pid': os.getpid(), 'tid': thread.ident, 'args': details})
+
+@contextlib.contextmanager
+def phase(name, category='phase', **details):
+    """ Records the time of a with block. The yielded dictionary is stored with the event, so that the block can add details
+        (e.g., the number of rows or bytes). """
+    if not enabled:
+        yield details
+        return
+    start = time.perf_counter()
+    try:
+        yield details
+    finally:
+        end_statement()
+        add_event(name, category, start, time.perf_counter(), details)
+
+def command(arguments):
+    """ Records a subprocess given by its arguments; the block stores the number of bytes that it read from the subprocess
+        as 'bytes'. """
+    return phase(' '.join(arguments[:2]), 'subprocess', command=' '.join(arguments))
+
+def normalize(statement):
+    return whitespace_regex.sub(' ', literal_regex.sub('?', statement)).strip()
+
+def end_statement():
+    """ Records the statement that runs on the watched connection as finished (if called on the thread that uses it). """
+    global current
+    if current is None or threading.get_ident() != watched_thread:
+        return
+    (statement, start, nr_progress_calls, total_changes) = current
+    current = None
+    end = time.perf_counter()
+    rows = watched.total_changes - total_changes
+    instructions = nr_progress_calls * progress_steps
+    key = normalize(statement)
+    if key not in statements:
+        statements[key] = [0, 0.0, 0.0, statement, 0, 0]
+    entry = statements[key]
+    entry[0] += 1
+    entry[1] += end - start
+    if end - start >= entry[2]:
+        entry[2] = end - start
+        entry[3] = statement
+    entry[4] += rows
+    entry[5] += instructions
+    if end - start >= min_statement_event_seconds:
+        add_event(key[:80], 'sql', start, end, {'sql': statement, 'rows': rows, 'vm_instructions': instructions})
+
+def watch(conn):
+    """ Records the statements of a connection (from the thread that calls watch). """
+    global watched, watched_thread, watched_trace
+    watched = conn
+    watched_thread = threading.get_ident()
+    def trace(statement):
+        global current
+        end_statement()
+        current = [statement, time.perf_counter(), 0, conn.total_changes]
+    def progress():
+        if current is not None:
+            current[2] += 1
+        return 0
+    watched_trace = trace
+    conn.set_trace_callback(trace)
+    conn.set_progress_handler(progress, progress_steps)
+
+def trace_callback(conn):
+    """ Returns the trace callback that watch installed on a connection, or None. As sqlite3 cannot return the callback of a
+        connection, code that installs its own callback uses this one to chain and restore it. """
+    return watched_trace if watched is conn else None
+
+def write_trace(file_name):
+    import json
+    end_statement()
+    with lock:
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident, 'args': {'name': name}} for (ident, name) in thread_names.items()]
+        trace = {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+    with open(file_name, 'w') as f:
+        json.dump(trace, f)
+
+def format_milliseconds(seconds):
+    return '%10.3f' % (seconds * 1000)
+
+def summary(limit=10):
+    """ Returns the events of each category of summary_sections aggregated by name, the slowest statements, and the slowest
+        projects, batch commands, and requests of the serve command as text (at most limit lines per section). """
+    end_statement()
+    out = []
+    with lock:
+        recorded = list(events)
+    for (category, title) in summary_sections:
+        totals = collections.OrderedDict()
+        for event in recorded:
+            if event['cat'] != category:
+                continue
+            if event['name'] not in totals:
+                totals[event['name']] = [0, 0.0, 0.0, collections.Counter()]
+            entry = totals[event['name']]
+            entry[0] += 1
+            entry[1] += event['dur'] / 1e6
+            entry[2] = max(entry[2], event['dur'] / 1e6)
+            entry[3].update(dict((key, value) for (key, value) in event['args'].items() if isinstance(value, int) and not isinstance(value, bool)))
+        if len(totals) == 0:
+            continue
+        columns = sorted(set(key for entry in totals.values() for key in entry[3]))
+        out.append('%s (%d, slowest first):\n' % (title, len(totals)))
+        out.append('%7s %10s %10s %s %s\n' % ('calls', 'total ms', 'max ms', ''.join('%12s ' % column for column in columns), 'name'))
+        for (name, (calls, seconds, slowest, sums)) in sorted(totals.items(), key=lambda item: -item[1][1])[:limit]:
+            out.append('%7d %s %s %s %s\n' % (calls, format_milliseconds(seconds), format_milliseconds(slowest), ''.join('%12d ' % sums[column] for column in columns), name))
+        out.append('\n')
+    if len(statements) != 0:
+        out.append('SQL statements (%d, slowest first, with their slowest execution):\n' % len(statements))
+        out.append('%7s %10s %10s %9s %14s %s\n' % ('calls', 'total ms', 'max ms', 'rows', 'VM instrs', 'statement'))
+        for (calls, seconds, slowest, statement, rows, instructions) in sorted(statements.values(), key=lambda entry: -entry[1])[:limit]:
+            out.append('%7d %s %s %9d %14d %s\n' % (calls, format_milliseconds(seconds), format_milliseconds(slowest), rows, instructions, whitespace_regex.sub(' ', statement).strip()[:200]))
+        out.append('\n')
+    projects = sorted((event for event in recorded if event['cat'] in project_categories), key=lambda event: -event['dur'])
+    if len(projects) != 0:
+        out.append('slowest projects, batch commands, and requests (%d, in ms):\n' % len(projects))
+        for event in projects[:limit]:
+            out.append('%s %s\n' % (format_milliseconds(event['dur'] / 1e6), event['name']))
+        out.append('\n')
+    return ''.join(out)
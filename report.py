@@ -0,0 +1,206 @@
+""" Renders reports that consist of units (LaTeX commands, tables, or static
+    text) to LaTeX, Markdown, or JSON.
+
+    Each unit declares its inputs (SQL queries or names of tables and views).
+    The data that a unit computes is cached in a SQLite file next to the
+    database under a hash of the unit's definition and of the contents of the
+    tables that its inputs refer to (views are resolved to their tables). Only
+    units whose tables changed are computed again.
+"""
+
+import collections
+import contextlib
+import hashlib
+import io
+import re
+import sqlite3
+import time
+import types
+
+import profiler
+
+# name: identifies the unit in the cache and in JSON output (None for static text), inputs: SQL queries or table/view names
+# (empty for static text), compute: function(cursor) -> JSON-serializable data, latex: function(data) -> LaTeX text,
+# title: description used by the Markdown backend
+Unit = collections.namedtuple('Unit', ['name', 'inputs', 'compute', 'latex', 'title'])
+
+BACKENDS = ['latex', 'markdown', 'json']
+
+identifier_regex = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+def cache_path_for(database):
+    return database + '.report-cache'
+
+def open_cache(cache_path):
+    conn = sqlite3.connect(cache_path, timeout=60)
+    conn.execute('CREATE TABLE IF NOT EXISTS ReportCache(KEY TEXT PRIMARY KEY, DATA TEXT NOT NULL)')
+    return conn
+
+def text(latex, title=None):
+    """ Returns a unit for static text (e.g., a section comment), which is also its title by default. """
+    return Unit(None, [], lambda cursor: None, lambda data: latex, latex if title is None else title)
+
+def printed(print_function):
+    """ Turns a function that prints the LaTeX of some data into a function that returns it. """
+    def latex(data):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            print_function(data)
+        return out.getvalue()
+    return latex
+
+def relations(conn):
+    """ Returns a dictionary that maps the lowercase names of the tables and views of the main database to (type, SQL). """
+    return dict((name.lower(), (type, sql)) for (name, type, sql) in conn.execute("SELECT name, type, sql FROM main.sqlite_master WHERE type IN ('table', 'view')"))
+
+def base_tables(all_relations, inputs):
+    """ Returns the tables that the given queries or names refer to, resolving views to the tables they read. """
+    tables = set()
+    seen = set()
+    stack = [identifier.lower() for text in inputs for identifier in identifier_regex.findall(text)]
+    while len(stack) != 0:
+        name = stack.pop()
+        if name in seen or name not in all_relations:
+            continue
+        seen.add(name)
+        (type, sql) = all_relations[name]
+        if type == 'table':
+            tables.add(name)
+        else:
+            stack += [identifier.lower() for identifier in identifier_regex.findall(sql)]
+    return tables
+
+def table_digest(conn, table):
+    """ Returns a value that changes when a table changes: its number of rows, its largest rowid, and its VERSION in
+        TableVersion (see asm.count_table_versions), which is 0 for tables that asm.py has not written since the table was
+        added. The number of rows and the largest rowid also notice most changes by other programs. In databases without
+        TableVersion, the table is hashed row by row. """
+    try:
+        version = conn.execute('SELECT VERSION FROM main.TableVersion WHERE NAME = ?', (table, )).fetchone()
+    except sqlite3.OperationalError:
+        digest = hashlib.md5()
+        for row in conn.execute('SELECT * FROM main."%s"' % table):
+            digest.update(repr(row).encode())
+        return digest.hexdigest()
+    return repr(conn.execute('SELECT COUNT(*), MAX(rowid) FROM main."%s"' % table).fetchone() + (version or (0, )))
+
+def fingerprint(function, digest=None, seen=None):
+    """ Hashes the code of a function together with its constants, closure values, the plain data globals it uses, and the
+        global functions it calls (recursively), so that changing the definition of a unit or of a helper that it calls
+        invalidates its cached data. """
+    if digest is None:
+        digest = hashlib.md5()
+    if seen is None:
+        seen = set()
+    seen.add(function)
+    names = []
+    def add_code(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            if hasattr(const, 'co_code'):
+                add_code(const)
+            else:
+                digest.update(repr(const).encode())
+        digest.update(repr(code.co_names).encode())
+        names.extend(code.co_names)
+    add_code(function.__code__)
+    for cell in function.__closure__ or ():
+        value = cell.cell_contents
+        if hasattr(value, '__code__'):
+            if value not in seen:
+                fingerprint(value, digest, seen)
+        else:
+            digest.update(repr(value).encode())
+    for name in names:
+        value = function.__globals__.get(name)
+        if isinstance(value, types.FunctionType):
+            if value not in seen:
+                fingerprint(value, digest, seen)
+        elif isinstance(value, (dict, list, tuple, str, int, float)):
+            digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+def compute(conn, units, cache_path=None, timings=None):
+    """ Returns a list of (unit, data) and the number of units that were computed (rather than taken from the cache). If
+        timings is a dictionary, the seconds that each computed unit took are stored in it under the unit's name. """
+    import json
+    cursor = conn.cursor()
+    all_relations = relations(conn)
+    digests = {}
+    cache = None if cache_path is None else open_cache(cache_path)
+    results = []
+    nr_computed = 0
+    try:
+        for unit in units:
+            if len(unit.inputs) == 0:
+                results.append((unit, unit.compute(cursor)))
+                continue
+            key = hashlib.md5(unit.name.encode())
+            key.update(fingerprint(unit.compute).encode())
+            for table in sorted(base_tables(all_relations, unit.inputs)):
+                if table not in digests:
+                    digests[table] = table_digest(conn, table)
+                key.update((table + digests[table]).encode())
+            key = key.hexdigest()
+            cached = None if cache is None else cache.execute('SELECT DATA FROM ReportCache WHERE KEY = ?', (key, )).fetchone()
+            if cached is None:
+                start = time.perf_counter()
+                with profiler.phase(unit.name, 'report unit') as details:
+                    computed = unit.compute(cursor)
+                    if is_table(computed):
+                        details['rows'] = len(computed['rows'])
+                data = json.dumps(computed)
+                if timings is not None:
+                    timings[unit.name] = time.perf_counter() - start
+                nr_computed += 1
+                if cache is not None:
+                    cache.execute('INSERT OR REPLACE INTO ReportCache(KEY, DATA) VALUES(?, ?)', (key, data))
+            else:
+                data = cached[0]
+            # cached and computed data are rendered alike
+            results.append((unit, json.loads(data)))
+        if cache is not None:
+            cache.commit()
+    finally:
+        if cache is not None:
+            cache.close()
+    return (results, nr_computed)
+
+def is_table(data):
+    return isinstance(data, dict) and 'columns' in data and 'rows' in data
+
+def render_latex(results):
+    return ''.join(unit.latex(data) for (unit, data) in results)
+
+def markdown_cell(value):
+    return ('%.1f' % value if isinstance(value, float) else str(value)).replace('|', '\\|')
+
+def render_markdown(results):
+    out = []
+    for (unit, data) in results:
+        title = None if unit.title is None else unit.title.strip().lstrip('%#').strip()
+        if unit.name is None:
+            if title:
+                out.append('\n## ' + title + '\n\n')
+        elif is_table(data):
+            out.append('\n### ' + (data.get('caption') or title or unit.name) + '\n\n')
+            out.append('| ' + ' | '.join(data['columns']) + ' |\n')
+            out.append('|' + '---|' * len(data['columns']) + '\n')
+            for row in data['rows']:
+                out.append('| ' + ' | '.join(markdown_cell(value) for value in row) + ' |\n')
+            out.append('\n')
+        else:
+            out.append('- `%s`: %s%s\n' % (unit.name, markdown_cell(data), ' (' + title + ')' if title else ''))
+    return ''.join(out).lstrip('\n')
+
+def render_json(results):
+    import json
+    return json.dumps(collections.OrderedDict((unit.name, data) for (unit, data) in results if unit.name is not None), indent=2) + '\n'
+
+renderers = {'latex': render_latex, 'markdown': render_markdown, 'json': render_json}
+extensions = {'latex': '.tex', 'markdown': '.md', 'json': '.json'}
+
+def render(conn, units, backend='latex', cache_path=None, timings=None):
+    """ Computes (or loads from the cache) the data of all units and renders it with a backend. Returns the text and the
+        number of computed units. """
+    (results, nr_computed) = compute(conn, units, cache_path, timings)
+    return (renderers[backend](results), nr_computed)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+""" Finds inline assembly statements in C/C++ source trees.
+
+    Every source file is memory-mapped and searched for the asm, __asm, and
+    __asm__ keywords. For each statement found, the complete statement (which
+    may span several lines) and its assembly template are extracted. Files are
+    scanned in parallel on a process pool. scan_tree additionally counts the
+    lines of code of each file (see linecount.py) while the file is mapped.
+
+    Usage: scanner.py <directory or file>...
+"""
+
+import collections
+import mmap
+import os
+import re
+import sys
+
+import linecount
+
+SOURCE_EXTENSIONS = set(('.c', '.h', '.cc', '.cp', '.cpp', '.cxx', '.c++', '.hh', '.hpp', '.hxx', '.h++', '.inl', '.ino', '.ipp', '.tcc'))
+EXCLUDED_DIRS = set(('.git', '.hg', '.svn'))
+
+QUALIFIERS = set((b'volatile', b'__volatile__', b'__volatile', b'goto', b'inline', b'__inline', b'__inline__'))
+
+keyword_regex = re.compile(rb'(?<![A-Za-z0-9_$])(?:__asm__|__asm|asm)(?![A-Za-z0-9_$])')
+identifier_regex = re.compile(rb'[A-Za-z_][A-Za-z0-9_]*')
+lexeme_regex = re.compile(rb'["\']|//|/\*')
+
+# file: path of the source file, line: line number of the asm keyword,
+# code: the statement with collapsed whitespace, template: the assembly template
+Hit = collections.namedtuple('Hit', ['file', 'line', 'code', 'template'])
+# hits: list of Hit, loc: language -> code lines (see linecount.py)
+TreeScan = collections.namedtuple('TreeScan', ['hits', 'loc'])
+
+escapes = {
+    ord('n'): '\n',
+    ord('t'): '\t',
+    ord('r'): '\r',
+    ord('"'): '"',
+    ord("'"): "'",
+    ord('\\'): '\\',
+    ord('0'): '\0',
+}
+
+def is_source_file(name):
+    return os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS or name.endswith('.C')
+
+def is_counted_file(name):
+    return is_source_file(name) or linecount.language_of(name) is not None
+
+def walk(path, accept=is_source_file):
+    """ Yields the C/C++ source files (or the files accepted by accept) in a directory tree (or the path itself if it is a file). """
+    if not os.path.isdir(path):
+        yield path
+        return
+    stack = [path]
+    while len(stack) != 0:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in EXCLUDED_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file() and accept(entry.name):
+                    yield entry.path
+
+def skip_space(buf, pos, end):
+    """ Skips whitespace, comments, and line continuations. """
+    while pos < end:
+        ch = buf[pos:pos + 1]
+        if ch in b' \t\r\n\f\v\\':
+            pos += 1
+        elif buf[pos:pos + 2] == b'//':
+            newline = buf.find(b'\n', pos)
+            pos = end if newline == -1 else newline + 1
+        elif buf[pos:pos + 2] == b'/*':
+            close = buf.find(b'*/', pos + 2)
+            pos = end if close == -1 else close + 2
+        else:
+            break
+    return pos
+
+def skip_literal(buf, pos, end):
+    """ Returns the position after the string or character literal starting at pos. """
+    quote = buf[pos]
+    pos += 1
+    while pos < end:
+        ch = buf[pos]
+        if ch == 0x5c: # backslash
+            pos += 2
+        elif ch == quote or ch == 0x0a:
+            return pos + 1
+        else:
+            pos += 1
+    return end
+
+def find_closing(buf, pos, end, opening, closing):
+    """ Returns the position after the bracket that closes the one at pos, skipping literals and comments. """
+    depth = 0
+    while pos < end:
+        ch = buf[pos]
+        if ch == 0x22 or ch == 0x27: # " and '
+            pos = skip_literal(buf, pos, end)
+            continue
+        if ch == 0x2f and buf[pos + 1:pos + 2] in (b'/', b'*'):
+            pos = skip_space(buf, pos, end)
+            continue
+        if ch == opening:
+            depth += 1
+        elif ch == closing:
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+    return -1
+
+def unescape(literal):
+    out = []
+    i = 0
+    while i < len(literal):
+        ch = literal[i]
+        if ch == 0x5c and i + 1 < len(literal):
+            out.append(escapes.get(literal[i + 1], '\\' + chr(literal[i + 1])))
+            i += 2
+        else:
+            out.append(chr(ch))
+            i += 1
+    return ''.join(out)
+
+def extract_template(statement):
+    """ Concatenates the string literals of an asm statement up to the first top-level colon (i.e., the assembly template). """
+    template = []
+    pos = statement.find(b'(') + 1
+    end = len(statement)
+    depth = 0
+    while pos < end:
+        ch = statement[pos]
+        if ch == 0x22:
+            after = skip_literal(statement, pos, end)
+            template.append(unescape(statement[pos + 1:after - 1]))
+            pos = after
+            continue
+        if ch == 0x28:
+            depth += 1
+        elif ch == 0x29:
+            if depth == 0:
+                break
+            depth -= 1
+        elif ch == 0x3a and depth == 0:
+            break
+        pos += 1
+    return ''.join(template)
+
+def advance(buf, pos, target, end):
+    """ Advances from pos, which is in code, to target, skipping literals and comments. Returns target if it is in code,
+        or else the position after the literal or comment that contains it. """
+    while True:
+        lexeme = lexeme_regex.search(buf, pos, target)
+        if lexeme is None:
+            return target
+        if lexeme.group() == b'//':
+            newline = buf.find(b'\n', lexeme.start())
+            pos = end if newline == -1 else newline + 1
+        elif lexeme.group() == b'/*':
+            close = buf.find(b'*/', lexeme.start() + 2)
+            pos = end if close == -1 else close + 2
+        else:
+            pos = skip_literal(buf, lexeme.start(), end)
+        if pos > target:
+            return pos
+
+def scan_buffer(path, buf):
+    """ Returns the hits in a bytes-like buffer. """
+    hits = []
+    end = len(buf)
+    line = 1
+    line_pos = 0
+    # position up to which buf has been lexed; it is always in code
+    lexed = 0
+    for match in keyword_regex.finditer(buf):
+        start = match.start()
+        if start < lexed:
+            continue
+        lexed = advance(buf, lexed, start, end)
+        if lexed != start:
+            continue
+        pos = skip_space(buf, match.end(), end)
+        qualifier = identifier_regex.match(buf, pos)
+        while qualifier is not None and qualifier.group() in QUALIFIERS:
+            pos = skip_space(buf, qualifier.end(), end)
+            qualifier = identifier_regex.match(buf, pos)
+        ch = buf[pos:pos + 1]
+        if ch == b'(':
+            stop = find_closing(buf, pos, end, 0x28, 0x29)
+            if stop == -1:
+                continue
+            statement = bytes(buf[start:stop])
+            template = extract_template(statement)
+        elif ch == b'{' and match.group() != b'asm':
+            # Microsoft-style __asm { ... } block
+            stop = find_closing(buf, pos, end, 0x7b, 0x7d)
+            if stop == -1:
+                continue
+            statement = bytes(buf[start:stop])
+            template = bytes(buf[pos + 1:stop - 1]).decode('ISO-8859-1').strip()
+        elif qualifier is not None and match.group() == b'__asm' and buf.find(b'\n', start, pos) == -1:
+            # Microsoft-style single-line __asm mov eax, ebx
+            stop = buf.find(b'\n', pos)
+            stop = end if stop == -1 else stop
+            statement = bytes(buf[start:stop]).rstrip()
+            template = bytes(buf[pos:stop]).decode('ISO-8859-1').strip()
+        else:
+            continue
+        lexed = stop
+        line += buf[line_pos:start].count(b'\n')
+        line_pos = start
+        code = ' '.join(statement.decode('ISO-8859-1').split())
+        hits.append(Hit(path, line, code, template))
+    return hits
+
+def scan_file(path):
+    """ Returns the inline assembly hits of a single file. """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if buf.find(b'asm') == -1:
+                    return []
+                return scan_buffer(path, buf)
+    except OSError:
+        return []
+
+def analyze_file(path):
+    """ Maps a file once and returns (language, code lines, digest, hits) for it. """
+    name = os.path.basename(path)
+    language = linecount.language_of(name)
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return (language, 0, linecount.digest(b''), [])
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                hits = []
+                if is_source_file(name) and buf.find(b'asm') != -1:
+                    hits = scan_buffer(path, buf)
+                if language is None:
+                    return (None, 0, None, hits)
+                return (language, linecount.count_code_lines(language, buf), linecount.digest(buf), hits)
+    except OSError:
+        return (None, 0, None, [])
+
+def scan_tree(path, jobs=None):
+    """ Returns the inline assembly hits and the lines of code of all files below path, reading every file only once. """
+    files = list(walk(path, is_counted_file))
+    if jobs == 1 or len(files) < 64:
+        results = list(map(analyze_file, files))
+    else:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(analyze_file, files, chunksize=32))
+    hits = []
+    loc = collections.Counter()
+    seen = set()
+    for (language, lines, digest, file_hits) in results:
+        hits += file_hits
+        if language is not None:
+            linecount.add_counts(loc, seen, language, lines, digest)
+    return TreeScan(hits, loc)
+
+def scan(path, jobs=None):
+    """ Yields the inline assembly hits of all C/C++ source files below path. jobs limits the number of worker processes. """
+    files = list(walk(path))
+    if jobs == 1 or len(files) < 64:
+        for f in files:
+            for hit in scan_file(f):
+                yield hit
+        return
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        for hits in executor.map(scan_file, files, chunksize=32):
+            for hit in hits:
+                yield hit
+
+def format_hit(hit):
+    return '%s:%d:%s' % (hit.file, hit.line, hit.code)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__.strip().split('\n')[-1])
+        exit(-1)
+    for path in sys.argv[1:]:
+        for hit in scan(path):
+            print(format_hit(hit))
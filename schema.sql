@@ -79,3 +79,13 @@ CREATE TABLE "AsmSequence" (
 	`INSTRUCTIONS`	TEXT UNIQUE,
 	PRIMARY KEY(`ID`)
 );
+CREATE INDEX `AsmSequenceInstructionSequence` ON `AsmSequenceInstruction` (`ASM_SEQUENCE_ID`, `ASM_INSTRUCTION_ID`);
+CREATE INDEX `AsmSequenceInstructionInstruction` ON `AsmSequenceInstruction` (`ASM_INSTRUCTION_ID`, `ASM_SEQUENCE_ID`);
+CREATE INDEX `AsmSequencesInGithubProjectProject` ON `AsmSequencesInGithubProject` (`GITHUB_PROJECT_ID`, `ASM_SEQUENCE_ID`);
+CREATE INDEX `AsmSequencesInGithubProjectSequence` ON `AsmSequencesInGithubProject` (`ASM_SEQUENCE_ID`);
+CREATE INDEX `ApplicationCategoriesPerProjectProject` ON `ApplicationCategoriesPerProject` (`GithubProjectID`, `ApplicationCategoryID`);
+CREATE INDEX `ApplicationCategoriesPerProjectCategory` ON `ApplicationCategoriesPerProject` (`ApplicationCategoryID`);
+CREATE INDEX `ApplicationCategorySuper` ON `ApplicationCategory` (`SUPER_ID`);
+CREATE INDEX `AsmUsageCategoryPerSequenceSequence` ON `AsmUsageCategoryPerSequence` (`ASM_SEQUENCE_ID`, `ASM_USAGE_CATEGORY_ID`);
+CREATE INDEX `AsmUsageCategorySuper` ON `AsmUsageCategory` (`SUPER_ID`);
+PRAGMA user_version = 1;
@@ -1,7 +1,59 @@
-RET_VAL=`./grep.sh grep-tests/ | wc -l`
-EXPECTED_MATCHES=9
+RET_VAL=`./scanner.py grep-tests/ | wc -l`
+EXPECTED_MATCHES=12
 if [ ${RET_VAL} != ${EXPECTED_MATCHES} ];
 then
     echo ${RET_VAL} is an unexpected return value
     exit -1
 fi
+
+# JSON commands of a batch with boolean flags
+BATCH_DB=`mktemp -d`/batch.db
+python3 -c "import sqlite3, sys; sqlite3.connect(sys.argv[1]).executescript(open('schema.sql').read())" ${BATCH_DB}
+printf '%s\n' '{"command": "add-asm-sequence", "instr": "rdtsc", "offline": true}' '{"command": "add-asm-sequence", "instr": "cpuid", "offline": false}' | ./asm.py ${BATCH_DB} batch > /dev/null
+RET_VAL=`python3 -c "import sqlite3, sys; print(sqlite3.connect(sys.argv[1]).execute('SELECT COUNT(*) FROM AsmInstruction').fetchone()[0])" ${BATCH_DB}`
+if [ ${RET_VAL} != 2 ];
+then
+    echo ${RET_VAL} instructions after a batch with boolean flags instead of 2
+    exit -1
+fi
+
+# mnemonics of assembly templates (see mnemonics.py)
+if ! ./mnemonics.py < mnemonic-tests/templates.txt | diff mnemonic-tests/expected.txt -;
+then
+    echo unexpected mnemonics of mnemonic-tests/templates.txt
+    exit -1
+fi
+
+# refresh-projects after renaming a file and copying it (the copy is counted once, as in scanner.scan_tree)
+REFRESH_DIR=`mktemp -d`
+REFRESH_PROJECT=projects/asm-test-refresh
+rm -rf ${REFRESH_PROJECT}
+git init -q ${REFRESH_DIR}/origin
+printf 'void f(void) {\n\tasm("rdtsc");\n}\n' > ${REFRESH_DIR}/origin/a.c
+git -C ${REFRESH_DIR}/origin add a.c
+git -C ${REFRESH_DIR}/origin -c user.name=test -c user.email=test@test commit -q -m first
+git clone -q ${REFRESH_DIR}/origin ${REFRESH_PROJECT}
+python3 -c "
+import benchmark, sqlite3, sys
+conn = sqlite3.connect(sys.argv[1])
+conn.executescript(open('schema.sql').read())
+for statement in benchmark.production_tables:
+    conn.execute(statement)
+conn.execute(\"INSERT INTO GithubProjectUnfiltered VALUES (1, 'refresh', 'https://github.com/asm-test/refresh', '', 0, 0, 0, 0, '', 'C', '', '', 0, 0, 0, 0, 0, 0, '', '', 0, 0)\")
+conn.commit()" ${REFRESH_DIR}/refresh.db
+./asm.py ${REFRESH_DIR}/refresh.db refresh-projects --file=https://github.com/asm-test/refresh > /dev/null
+git -C ${REFRESH_DIR}/origin mv a.c b.c
+cp ${REFRESH_DIR}/origin/b.c ${REFRESH_DIR}/origin/c.c
+git -C ${REFRESH_DIR}/origin add c.c
+git -C ${REFRESH_DIR}/origin -c user.name=test -c user.email=test@test commit -q -m rename
+./asm.py ${REFRESH_DIR}/refresh.db refresh-projects --file=https://github.com/asm-test/refresh > /dev/null
+RET_VAL=`python3 -c "
+import sqlite3, sys
+conn = sqlite3.connect(sys.argv[1])
+print(conn.execute('SELECT CLOC_LOC_C FROM GithubProjectUnfiltered').fetchone()[0], ','.join(row[0] for row in conn.execute('SELECT DISTINCT IN_FILE FROM AsmSequencesInGithubProjectUnfiltered ORDER BY IN_FILE')))" ${REFRESH_DIR}/refresh.db`
+rm -rf ${REFRESH_PROJECT}
+if [ "${RET_VAL}" != "3 b.c,c.c" ];
+then
+    echo "${RET_VAL} (C lines and files with sequences) after refreshing a renamed and copied file instead of 3 b.c,c.c"
+    exit -1
+fi
@@ -0,0 +1,147 @@
+""" Builds the C test cases of instructions and sequences and lists the
+    instructions that they contain.
+
+    Each test case is compiled with the local C compiler (CC, or cc) and its
+    object file is disassembled with objdump on a process pool. The mnemonics
+    of the disassembly (see mnemonics.py) are cached in a SQLite file next to
+    the database under a hash of the test case and of the versions of the
+    compiler and objdump, so that only new or edited test cases are built
+    again. Test cases that do not compile are cached with their error. The
+    output of clang-format is cached in the same file under a hash of the
+    formatted file.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import tempfile
+
+import errors
+import mnemonics
+import profiler
+
+compile_flags = ['-c', '-O0', '-w', '-x', 'c']
+format_command = ['clang-format-3.6', '--style=LLVM']
+
+# instruction lines of objdump -d --no-show-raw-insn, e.g., "   4:	rdtsc"
+instruction_line_regex = re.compile(r'^\s*[0-9a-f]+:\t(.*)$')
+
+def cache_path_for(database):
+    return database + '.test-case-cache'
+
+def open_cache(cache_path):
+    conn = sqlite3.connect(cache_path, timeout=60)
+    conn.execute('CREATE TABLE IF NOT EXISTS TestCaseCache(KEY TEXT PRIMARY KEY, DATA TEXT NOT NULL)')
+    return conn
+
+def content_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def compiler():
+    return os.environ.get('CC', 'cc')
+
+def first_output_line(arguments):
+    try:
+        process = subprocess.Popen(arguments, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+    except OSError:
+        return None
+    stdout, _ = process.communicate()
+    return stdout.decode(errors='replace').split('\n')[0] if process.returncode == 0 else None
+
+def toolchain():
+    """ Returns the versions of the compiler and objdump, which are part of the cache keys. Raises InputError if one of them
+        is missing. """
+    versions = [first_output_line([compiler(), '--version']), first_output_line(['objdump', '--version'])]
+    if None in versions:
+        raise errors.InputError('verify-test-cases needs a C compiler (%s, set CC to use another one) and objdump' % compiler())
+    return ' '.join([compiler()] + compile_flags) + '\n' + '\n'.join(versions)
+
+def test_case_source(test_case):
+    """ Returns the C code of a test case, which is either the code itself or the path of a file with the code (as stored by
+        add-asm-sequence). """
+    if '\n' not in test_case and os.path.isfile(test_case):
+        with open(test_case) as f:
+            return f.read()
+    return test_case
+
+def disassembled_mnemonics(disassembly):
+    """ Returns the mnemonics of the instruction lines of objdump -d output (without operand size suffixes). """
+    instructions = []
+    for line in disassembly.split('\n'):
+        match = instruction_line_regex.match(line)
+        if match is not None:
+            instructions.append(match.group(1).split('#')[0])
+    return mnemonics.template_mnemonics('\n'.join(instructions))
+
+def build(source):
+    """ Compiles a test case and disassembles its object file. Returns {'mnemonics': [...]} or {'error': message}. Runs on
+        the workers of build_all. """
+    with tempfile.TemporaryDirectory(prefix='asm-test-case-') as directory:
+        object_file = os.path.join(directory, 'test.o')
+        process = subprocess.Popen([compiler()] + compile_flags + ['-', '-o', object_file], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = process.communicate(source.encode())
+        if process.returncode != 0:
+            errors = [line for line in output.decode(errors='replace').split('\n') if 'error' in line]
+            return {'error': (errors[0] if len(errors) != 0 else 'exit code %d' % process.returncode).replace('<stdin>:', '')}
+        process = subprocess.Popen(['objdump', '-d', '--no-show-raw-insn', object_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            return {'error': 'objdump failed: ' + output.decode(errors='replace').strip()}
+        return {'mnemonics': sorted(set(disassembled_mnemonics(output.decode(errors='replace'))))}
+
+def build_all(sources, cache_path, jobs=4):
+    """ Returns a dictionary that maps each source to its result (see build), and the number of sources that were built
+        (rather than taken from the cache). """
+    versions = toolchain()
+    keys = dict((source, content_key(versions, source)) for source in set(sources))
+    results = {}
+    cache = open_cache(cache_path)
+    try:
+        for (source, key) in keys.items():
+            cached = cache.execute('SELECT DATA FROM TestCaseCache WHERE KEY = ?', (key, )).fetchone()
+            if cached is not None:
+                results[source] = json.loads(cached[0])
+        missing = [source for source in keys if source not in results]
+        with profiler.phase('build test cases') as details:
+            details['test_cases'] = len(missing)
+            if len(missing) > 1 and jobs != 1:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                    built = list(executor.map(build, missing))
+            else:
+                built = [build(source) for source in missing]
+        for (source, result) in zip(missing, built):
+            results[source] = result
+            cache.execute('INSERT OR REPLACE INTO TestCaseCache(KEY, DATA) VALUES(?, ?)', (keys[source], json.dumps(result)))
+        cache.commit()
+    finally:
+        cache.close()
+    return (results, len(missing))
+
+def format_file(file_name, cache_path):
+    """ Returns a test case file formatted with clang-format, which only runs if the contents of the file are not cached. """
+    with open(file_name, 'rb') as f:
+        key = content_key(' '.join(format_command), f.read())
+    cache = open_cache(cache_path)
+    try:
+        cached = cache.execute('SELECT DATA FROM TestCaseCache WHERE KEY = ?', (key, )).fetchone()
+        if cached is not None:
+            return cached[0]
+        with profiler.command(format_command + [file_name]) as details:
+            process = subprocess.Popen(format_command + [file_name], stdout=subprocess.PIPE)
+            stdout, _ = process.communicate()
+            details['bytes'] = len(stdout)
+        formatted = stdout.decode()
+        if process.returncode == 0:
+            cache.execute('INSERT OR REPLACE INTO TestCaseCache(KEY, DATA) VALUES(?, ?)', (key, formatted))
+            cache.commit()
+        return formatted
+    finally:
+        cache.close()